@@ -0,0 +1,145 @@
+"""Admission control for upstream generations."""
+
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Optional
+
+from .tracing import span
+
+# Lanes in priority order: interactive chat first, bulk batch jobs last
+INTERACTIVE = "interactive"
+STANDARD = "standard"
+BULK = "bulk"
+
+
+class AdmissionRejected(Exception):
+    """The lane's wait queue is full; the client should retry later."""
+
+    def __init__(self, lane: str, retry_after: float):
+        super().__init__(f"Server busy ({lane} queue full), retry in {math.ceil(retry_after)}s")
+        self.lane = lane
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """An admitted slot; `release()` is idempotent."""
+
+    __slots__ = ("controller", "granted_at", "released")
+
+    def __init__(self, controller: "AdmissionController"):
+        self.controller = controller
+        self.granted_at = time.monotonic()
+        self.released = False
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.controller._release(time.monotonic() - self.granted_at)
+
+
+class AdmissionController:
+    """
+    Caps in-flight upstream generations with prioritized wait queues.
+
+    Up to `max_in_flight` generations run at once. Further requests wait in
+    a bounded FIFO queue for their lane; a freed slot always goes to the
+    highest-priority lane with a waiter. A request arriving at a full queue
+    is rejected immediately with a Retry-After estimate derived from the
+    observed (EWMA) service time and the work queued ahead of it.
+
+    Args:
+        max_in_flight: Concurrent generations allowed upstream
+        queue_limits: Lane name to max queued requests, in priority order
+    """
+
+    def __init__(self, max_in_flight: int, queue_limits: Dict[str, int], ewma_alpha: float = 0.2):
+        self.max_in_flight = max_in_flight
+        self.queue_limits = dict(queue_limits)
+        self.lanes = list(queue_limits)
+        self.ewma_alpha = ewma_alpha
+        self.in_flight = 0
+        self.service_time: Optional[float] = None
+        self._queues: Dict[str, Deque[asyncio.Future]] = {lane: deque() for lane in self.lanes}
+        self.admitted = {lane: 0 for lane in self.lanes}
+        self.rejected = {lane: 0 for lane in self.lanes}
+
+    def queued(self, lane: str) -> int:
+        return len(self._queues[lane])
+
+    def _queued_ahead(self, lane: str) -> int:
+        """Requests that would be served before a new arrival in `lane`."""
+        index = self.lanes.index(lane)
+        return sum(len(self._queues[name]) for name in self.lanes[:index + 1])
+
+    def retry_after(self, lane: str) -> float:
+        service_time = self.service_time or 1.0
+        waves = (self._queued_ahead(lane) + 1) / self.max_in_flight
+        return max(1.0, service_time * math.ceil(waves))
+
+    async def acquire(self, lane: str) -> Ticket:
+        """Wait for a slot in `lane`, or raise `AdmissionRejected`."""
+        with span("admission", lane=lane):
+            return await self._acquire(lane)
+
+    async def _acquire(self, lane: str) -> Ticket:
+        if self.in_flight < self.max_in_flight and self._queued_ahead(lane) == 0:
+            self.in_flight += 1
+            self.admitted[lane] += 1
+            return Ticket(self)
+
+        queue = self._queues[lane]
+        if len(queue) >= self.queue_limits[lane]:
+            self.rejected[lane] += 1
+            raise AdmissionRejected(lane, self.retry_after(lane))
+
+        waiter = asyncio.get_running_loop().create_future()
+        queue.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we were cancelled; pass it on
+                self._release(None)
+            elif waiter in queue:
+                # A release may already have popped it (and skipped it as cancelled)
+                queue.remove(waiter)
+            raise
+        self.admitted[lane] += 1
+        return Ticket(self)
+
+    def _release(self, service_time: Optional[float]):
+        if service_time is not None:
+            if self.service_time is None:
+                self.service_time = service_time
+            else:
+                self.service_time += self.ewma_alpha * (service_time - self.service_time)
+        # Hand the slot straight to the highest-priority waiter
+        for lane in self.lanes:
+            queue = self._queues[lane]
+            while queue:
+                waiter = queue.popleft()
+                if not waiter.done():
+                    waiter.set_result(None)
+                    return
+        self.in_flight -= 1
+
+    @asynccontextmanager
+    async def slot(self, lane: str):
+        ticket = await self.acquire(lane)
+        try:
+            yield ticket
+        finally:
+            ticket.release()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "service_time_s": self.service_time,
+            "queued": {lane: self.queued(lane) for lane in self.lanes},
+            "admitted": dict(self.admitted),
+            "rejected": dict(self.rejected),
+        }
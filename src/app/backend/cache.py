@@ -0,0 +1,185 @@
+"""Response caching for deterministic (fixed-seed) recipe generations."""
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional
+
+
+def canonical_ingredients(ingredients: Iterable[str]) -> List[str]:
+    """Sorted, lower-cased, de-duplicated ingredient names."""
+    return sorted({item.strip().lower() for item in ingredients if item and item.strip()})
+
+
+def recipe_cache_key(request, model_id: str, seed: int) -> str:
+    """
+    Build the cache key for a recipe request.
+
+    Two requests share a key when they would produce the same completion:
+    same canonical ingredient set, instructions, sampling parameters, model
+    and seed.
+    """
+    payload = {
+        "ingredients": canonical_ingredients(request.ingredients),
+        "additional_instructions": (request.additional_instructions or "").strip() or None,
+        "temperature": request.temperature,
+        "max_tokens": request.max_tokens,
+        "model": model_id,
+        "seed": seed,
+    }
+    raw = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def recipe_context_key(request, model_id: str, seed: int) -> str:
+    """
+    Key for everything about a recipe request except its ingredients.
+
+    Near-duplicate matches are only allowed between requests with the same
+    context key.
+    """
+    payload = {
+        "additional_instructions": (request.additional_instructions or "").strip() or None,
+        "temperature": request.temperature,
+        "max_tokens": request.max_tokens,
+        "model": model_id,
+        "seed": seed,
+    }
+    raw = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def chat_request_key(messages: List[dict], temperature: Optional[float], model_id: str, seed: int) -> str:
+    """Build the coalescing key for a chat completion."""
+    payload = {
+        "messages": messages,
+        "temperature": temperature,
+        "model": model_id,
+        "seed": seed,
+    }
+    raw = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class SQLiteCacheStore:
+    """Persistent cache tier backed by a local SQLite file."""
+
+    def __init__(self, path: str):
+        dir_path = os.path.dirname(path)
+        if dir_path:
+            os.makedirs(dir_path, exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self._lock = asyncio.Lock()
+
+    def _get(self, key: str) -> Optional[tuple]:
+        row = self._conn.execute(
+            "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at < time.time():
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._conn.commit()
+            return None
+        return json.loads(value), expires_at - time.time()
+
+    def _set(self, key: str, value: Dict[str, Any], ttl_seconds: float):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO responses (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, json.dumps(value), time.time() + ttl_seconds),
+        )
+        self._conn.commit()
+
+    async def get(self, key: str) -> Optional[tuple]:
+        """Return `(value, remaining_ttl_seconds)` or None."""
+        async with self._lock:
+            return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: str, value: Dict[str, Any], ttl_seconds: float):
+        async with self._lock:
+            await asyncio.to_thread(self._set, key, value, ttl_seconds)
+
+    def close(self):
+        self._conn.close()
+
+
+class ResponseCache:
+    """
+    Bounded in-memory LRU with TTL, optionally backed by a persistent tier.
+
+    Memory hits never leave the event loop; the persistent tier is only
+    consulted on a memory miss and its hits are promoted back into memory.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600.0,
+                 store: Optional[SQLiteCacheStore] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.store = store
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+
+    def _remember(self, key: str, value: Dict[str, Any], expires_at: float):
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at >= time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+
+        if self.store is not None:
+            found = await self.store.get(key)
+            if found is not None:
+                value, remaining = found
+                self._remember(key, value, time.monotonic() + remaining)
+                self.hits += 1
+                self.persistent_hits += 1
+                return value
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: Dict[str, Any]):
+        self._remember(key, value, time.monotonic() + self.ttl_seconds)
+        if self.store is not None:
+            await self.store.set(key, value, self.ttl_seconds)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "persistent_hits": self.persistent_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def close(self):
+        if self.store is not None:
+            self.store.close()
@@ -11,6 +11,54 @@ class Config:
     # Modal API Configuration
     MODAL_API_KEY = os.getenv("MODAL_API_KEY")
     MODAL_BASE_URL = "https://v-ibe--cook-assistant-v1-serve.modal.run/v1"
+    # Comma-separated OpenAI-compatible endpoints serving the same model
+    UPSTREAM_BASE_URLS = [url.strip() for url in os.getenv("UPSTREAM_BASE_URLS", MODAL_BASE_URL).split(",") if url.strip()]
+    UPSTREAM_ROUTING = os.getenv("UPSTREAM_ROUTING", "least_outstanding")  # "least_outstanding" or "ewma"
+    
+    # Upstream Connection Configuration
+    UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100"))
+    UPSTREAM_MAX_KEEPALIVE = int(os.getenv("UPSTREAM_MAX_KEEPALIVE", "20"))
+    UPSTREAM_KEEPALIVE_EXPIRY = float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY", "30"))
+    UPSTREAM_CONNECT_TIMEOUT = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "5"))
+    UPSTREAM_READ_TIMEOUT = float(os.getenv("UPSTREAM_READ_TIMEOUT", "120"))
+    UPSTREAM_MAX_RETRIES = int(os.getenv("UPSTREAM_MAX_RETRIES", "2"))
+    UPSTREAM_RETRY_BACKOFF = float(os.getenv("UPSTREAM_RETRY_BACKOFF", "0.5"))
+    UPSTREAM_RETRY_MAX_BACKOFF = float(os.getenv("UPSTREAM_RETRY_MAX_BACKOFF", "8"))
+    CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+    CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30"))
+    
+    # /chat Hedging Configuration; a budget of 0 disables it
+    # Extra upstream calls allowed for hedges, as a fraction of /chat calls
+    HEDGE_BUDGET = float(os.getenv("HEDGE_BUDGET", "0"))
+    # Hedge a call still unanswered at this percentile of recent /chat latencies
+    HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))
+    HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "0.05"))
+    HEDGE_UPSTREAM = os.getenv("HEDGE_UPSTREAM", "other")  # "other" or "any"
+    
+    # Admission Control Configuration
+    # Stay below allow_concurrent_inputs=100 in modal_deploy.py so queueing happens here, visibly
+    ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "64"))
+    ADMISSION_QUEUE_INTERACTIVE = int(os.getenv("ADMISSION_QUEUE_INTERACTIVE", "128"))
+    ADMISSION_QUEUE_STANDARD = int(os.getenv("ADMISSION_QUEUE_STANDARD", "64"))
+    ADMISSION_QUEUE_BULK = int(os.getenv("ADMISSION_QUEUE_BULK", "256"))
+    
+    # Health Probe Configuration
+    # Any upstream traffic keeps the Modal replica warm, so keep this well apart
+    HEALTH_PROBE_INTERVAL = float(os.getenv("HEALTH_PROBE_INTERVAL", "60"))
+    HEALTH_PROBE_TIMEOUT = float(os.getenv("HEALTH_PROBE_TIMEOUT", "10"))
+    # Pause probing after this many seconds without real traffic; keep it below the upstream scaledown window
+    HEALTH_PROBE_IDLE_AFTER = float(os.getenv("HEALTH_PROBE_IDLE_AFTER", "600"))
+    
+    # Tracing Configuration; "file" writes OTLP/JSON lines, "otlp" posts them to a collector
+    TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "off")  # "off", "file" or "otlp"
+    TRACE_FILE = os.getenv("TRACE_FILE", "data/traces.jsonl")
+    TRACE_FILE_MAX_BYTES = int(os.getenv("TRACE_FILE_MAX_BYTES", str(50 * 1024 * 1024)))
+    TRACE_FILE_BACKUPS = int(os.getenv("TRACE_FILE_BACKUPS", "5"))
+    TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+    TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.05"))
+    # Requests slower than this (and server errors) are kept even when not sampled; 0 disables
+    TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", "5000"))
+    TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "cook-assistant-backend")
     
     # Server Configuration
     BACKEND_HOST = os.getenv("BACKEND_HOST", "0.0.0.0")
@@ -23,6 +71,49 @@ class Config:
     DEFAULT_TEMPERATURE = 1.0
     DEFAULT_MAX_TOKENS = 8192
     DEFAULT_SEED = 48
+    # Explicit model id; when unset the served model is resolved from the endpoint
+    MODEL_ID = os.getenv("MODEL_ID") or None
+    MODEL_REGISTRY_TTL = float(os.getenv("MODEL_REGISTRY_TTL", "300"))
+    
+    # Response Cache Configuration
+    RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+    RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+    # Optional SQLite file for a persistent cache tier
+    RESPONSE_CACHE_DB = os.getenv("RESPONSE_CACHE_DB") or None
+    
+    # Semantic Cache Configuration (near-duplicate ingredient sets); 0 entries disables it
+    SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "100000"))
+    SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.85"))
+    
+    # Corpus Retrieval Configuration (directory written by `python -m src.app.backend.retrieval build`)
+    RETRIEVAL_INDEX_DIR = os.getenv("RETRIEVAL_INDEX_DIR") or None
+    RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "off")  # "off", "ground" or "answer"
+    RETRIEVAL_METRIC = os.getenv("RETRIEVAL_METRIC", "jaccard")  # "jaccard" or "coverage"
+    RETRIEVAL_ANSWER_THRESHOLD = float(os.getenv("RETRIEVAL_ANSWER_THRESHOLD", "0.6"))
+    RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "3"))
+    
+    # Batch Configuration
+    BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+    BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "32"))
+    BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "1000"))
+    
+    # Chat Session Configuration
+    SESSION_STORE = os.getenv("SESSION_STORE", "memory")  # "memory" or "sqlite"
+    SESSION_DB = os.getenv("SESSION_DB", "data/sessions.db")
+    SESSION_IDLE_TTL = float(os.getenv("SESSION_IDLE_TTL", "1800"))
+    SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "10000"))
+    # Keep well under the backend container's 2G memory limit
+    SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", str(128 * 1024 * 1024)))
+    SESSION_MAX_SESSION_BYTES = int(os.getenv("SESSION_MAX_SESSION_BYTES", str(1024 * 1024)))
+    # /ws/chat sends tokens produced within this many ms of the previous frame together (0 sends each)
+    WS_TOKEN_FLUSH_MS = float(os.getenv("WS_TOKEN_FLUSH_MS", "50"))
+    
+    # Chat Context Window Configuration
+    TOKENIZER_NAME = os.getenv("TOKENIZER_NAME", "anileo1/cook-assistant-Qwen3-0.6B")
+    # Matches --max-model-len in modal_deploy.py; the rest is left for the reply
+    MAX_MODEL_LEN = 8192
+    CHAT_MAX_PROMPT_TOKENS = int(os.getenv("CHAT_MAX_PROMPT_TOKENS", "6144"))
+    CHAT_KEEP_LAST_MESSAGES = int(os.getenv("CHAT_KEEP_LAST_MESSAGES", "2"))
 
 config = Config()
 
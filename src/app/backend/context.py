@@ -0,0 +1,150 @@
+"""Token-budget-aware context window management for chat."""
+
+import asyncio
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+# Tokens the chat template adds around each message (role markers, separators)
+MESSAGE_TEMPLATE_TOKENS = 4
+# Fallback estimate when the tokenizer cannot be loaded
+CHARS_PER_TOKEN = 4
+
+
+class ContextOverflowError(Exception):
+    """The latest turn alone does not fit in the prompt budget."""
+
+
+class TokenCounter:
+    """
+    Counts tokens with the served model's tokenizer.
+
+    The tokenizer is loaded lazily in a worker thread on first use and
+    reused afterwards. Per-message counts are memoized in a bounded LRU, so a
+    long conversation only tokenizes its newest messages on each turn. Until
+    the tokenizer is loaded, or if it cannot be, a character-based estimate
+    is used instead; estimates are cheap and never memoized, so exact counts
+    replace them as soon as the tokenizer is available.
+    """
+
+    def __init__(self, tokenizer_name: str, cache_size: int = 20000):
+        self.tokenizer_name = tokenizer_name
+        self.cache_size = cache_size
+        self._tokenizer = None
+        self._load_failed = False
+        self._load_lock = asyncio.Lock()
+        self._counts: "OrderedDict[Tuple[str, str], int]" = OrderedDict()
+
+    @property
+    def loaded(self) -> bool:
+        return self._tokenizer is not None
+
+    @property
+    def cached_counts(self) -> int:
+        return len(self._counts)
+
+    def _load(self):
+        from transformers import AutoTokenizer
+        return AutoTokenizer.from_pretrained(self.tokenizer_name)
+
+    async def load(self):
+        """Load the tokenizer if it is not loaded yet."""
+        if self._tokenizer is not None or self._load_failed:
+            return
+        async with self._load_lock:
+            if self._tokenizer is not None or self._load_failed:
+                return
+            try:
+                self._tokenizer = await asyncio.to_thread(self._load)
+            except Exception as e:
+                self._load_failed = True
+                print(f"Tokenizer '{self.tokenizer_name}' unavailable, estimating token counts: {e}")
+
+    def count_text(self, text: str) -> int:
+        if self._tokenizer is None:
+            return len(text) // CHARS_PER_TOKEN + 1
+        return len(self._tokenizer.encode(text, add_special_tokens=False))
+
+    def count_message(self, message: dict) -> int:
+        key = (message.get("role") or "", message.get("content") or "")
+        if self._tokenizer is None:
+            return self.count_text(key[1]) + MESSAGE_TEMPLATE_TOKENS
+        count = self._counts.get(key)
+        if count is not None:
+            self._counts.move_to_end(key)
+            return count
+        count = self.count_text(key[1]) + MESSAGE_TEMPLATE_TOKENS
+        self._counts[key] = count
+        if len(self._counts) > self.cache_size:
+            self._counts.popitem(last=False)
+        return count
+
+
+class ContextWindowManager:
+    """
+    Fits chat messages into a prompt token budget.
+
+    The system prompt and the latest `keep_last_messages` messages are always
+    kept. Older turns are dropped oldest-first until the prompt fits, and a
+    short note about the omitted turns is appended to the system prompt.
+    """
+
+    OMITTED_NOTE = "\n\n(Earlier parts of this conversation were omitted: {count} messages.)"
+
+    def __init__(self, counter: TokenCounter, max_prompt_tokens: int, keep_last_messages: int = 2):
+        self.counter = counter
+        self.max_prompt_tokens = max_prompt_tokens
+        self.keep_last_messages = keep_last_messages
+        self.trimmed_requests = 0
+        self.trimmed_messages = 0
+
+    async def fit(self, messages: List[dict]) -> List[dict]:
+        """Return `messages` trimmed to the prompt budget."""
+        await self.counter.load()
+
+        system: Optional[dict] = None
+        turns = messages
+        if messages and messages[0].get("role") == "system":
+            system, turns = messages[0], messages[1:]
+
+        counts = [self.counter.count_message(m) for m in turns]
+        budget = self.max_prompt_tokens
+        if system is not None:
+            budget -= self.counter.count_message(system)
+        if sum(counts) <= budget:
+            return messages
+
+        # Reserve room for the omission note added to the system prompt
+        budget -= self.counter.count_text(self.OMITTED_NOTE.format(count=len(turns)))
+        protected = min(self.keep_last_messages, len(turns))
+        if sum(counts[len(turns) - protected:]) > budget:
+            raise ContextOverflowError(
+                f"The latest {protected} message(s) exceed the prompt budget of {self.max_prompt_tokens} tokens"
+            )
+
+        # Keep the longest suffix of turns that fits
+        kept = 0
+        used = 0
+        for count in reversed(counts):
+            if used + count > budget:
+                break
+            used += count
+            kept += 1
+        dropped = len(turns) - kept
+
+        self.trimmed_requests += 1
+        self.trimmed_messages += dropped
+        note = self.OMITTED_NOTE.format(count=dropped)
+        if system is not None:
+            system = {**system, "content": system["content"] + note}
+        else:
+            system = {"role": "system", "content": note.strip()}
+        return [system] + turns[dropped:]
+
+    def stats(self) -> dict:
+        return {
+            "max_prompt_tokens": self.max_prompt_tokens,
+            "tokenizer_loaded": self.counter.loaded,
+            "trimmed_requests": self.trimmed_requests,
+            "trimmed_messages": self.trimmed_messages,
+            "cached_message_counts": self.counter.cached_counts,
+        }
@@ -0,0 +1,125 @@
+"""Background upstream health probing."""
+
+import asyncio
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+
+class HealthProber:
+    """
+    Periodically checks the upstream and caches the result.
+
+    `/health` and `/ready` answer from `snapshot()` without any upstream
+    call. A probe is skipped when a real upstream call succeeded within the
+    last interval, so an active backend adds no extra traffic. Probing also
+    pauses once no real call has succeeded for `idle_after` seconds, so the
+    probes alone never keep a scale-to-zero upstream (Modal) warm; it resumes
+    with the next real traffic.
+
+    Args:
+        upstream: An `UpstreamClient`
+        interval: Seconds between probes
+        timeout: Seconds before a probe counts as failed
+        idle_after: Seconds without real traffic after which probing pauses (0 never pauses)
+        on_models: Optional callback receiving the model ids from each successful probe
+    """
+
+    def __init__(self, upstream, interval: float = 60.0, timeout: float = 10.0, idle_after: float = 600.0,
+                 on_models: Optional[Callable[[List[str]], None]] = None):
+        self.upstream = upstream
+        self.interval = interval
+        self.timeout = timeout
+        self.idle_after = idle_after
+        self.on_models = on_models
+        self.healthy: Optional[bool] = None
+        self.available_models: List[str] = []
+        self.last_probe_at: Optional[float] = None
+        self.last_latency: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.probes = 0
+        self.skipped = 0
+        self.idle = False
+        # Upstream success timestamp produced by our own last probe
+        self._own_success_at: Optional[float] = None
+        # Last success of real traffic seen, or when probing started
+        self._last_traffic_at = time.monotonic()
+        self._task: Optional[asyncio.Task] = None
+
+    async def probe(self):
+        """Run one probe now and update the cached state."""
+        started = time.perf_counter()
+        self.probes += 1
+        try:
+            # A single attempt: the probe should report the upstream as it is
+            models = await asyncio.wait_for(self.upstream.list_models(retry=False), timeout=self.timeout)
+        except Exception as e:
+            self.healthy = False
+            self.last_error = f"{type(e).__name__}: {e}"
+        else:
+            self.healthy = True
+            self.last_error = None
+            self.available_models = models
+            self._own_success_at = getattr(self.upstream, "last_success_at", None)
+            if self.on_models is not None:
+                self.on_models(models)
+        self.last_latency = time.perf_counter() - started
+        self.last_probe_at = time.monotonic()
+
+    def _note_traffic(self):
+        last_success = getattr(self.upstream, "last_success_at", None)
+        if last_success is not None and last_success != self._own_success_at:
+            self._last_traffic_at = max(self._last_traffic_at, last_success)
+
+    def _recently_active(self) -> bool:
+        """True if request traffic (not our own probe) succeeded within the interval."""
+        return time.monotonic() - self._last_traffic_at < self.interval
+
+    async def _loop(self):
+        self._last_traffic_at = time.monotonic()
+        await self.probe()
+        while True:
+            await asyncio.sleep(self.interval)
+            self._note_traffic()
+            self.idle = bool(self.idle_after) and time.monotonic() - self._last_traffic_at >= self.idle_after
+            if self.idle:
+                # Leave an idle upstream alone so it can scale down
+                self.skipped += 1
+                continue
+            if self.healthy and self._recently_active():
+                # Real traffic already proved the upstream is up
+                self.skipped += 1
+                self.last_probe_at = self.upstream.last_success_at
+                continue
+            try:
+                await self.probe()
+            except Exception as e:
+                print(f"Health probe failed unexpectedly: {e}")
+
+    def start(self):
+        """Start probing in the background; the first probe runs immediately."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        if self.healthy is None:
+            connection = "unknown"
+        else:
+            connection = "connected" if self.healthy else "disconnected"
+        age = time.monotonic() - self.last_probe_at if self.last_probe_at is not None else None
+        return {
+            "modal_connection": connection,
+            "available_models": list(self.available_models),
+            "last_probe_age_s": round(age, 3) if age is not None else None,
+            "last_probe_latency_ms": round(self.last_latency * 1000, 1) if self.last_latency is not None else None,
+            "last_error": self.last_error,
+            "probing": "paused (idle)" if self.idle else "active",
+        }
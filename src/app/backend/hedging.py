@@ -0,0 +1,82 @@
+"""Hedged upstream requests: duplicate a slow call and keep whichever answers first."""
+
+import math
+from collections import deque
+from typing import Deque, Optional
+
+
+class HedgePolicy:
+    """
+    When to send a duplicate of a slow upstream call, and how many.
+
+    The hedge delay is the `percentile` of recently observed latencies (no
+    hedging until `min_samples` have been seen), floored at `min_delay`.
+    Hedges are paid for from a budget: every call earns `budget` credits
+    (capped at `burst`) and each hedge spends one, so hedging adds at most
+    about `budget` extra upstream calls per call on average.
+
+    Args:
+        percentile: Latency percentile (0-100) after which a call is hedged
+        budget: Extra upstream load allowed for hedges, as a fraction of calls
+        window: Recent latencies the percentile is computed over
+        other_upstream: Send the hedge to a different replica when one is available
+    """
+
+    def __init__(self, percentile: float = 95.0, budget: float = 0.05, min_delay: float = 0.05,
+                 window: int = 512, min_samples: int = 20, burst: float = 10.0, other_upstream: bool = True):
+        self.percentile = percentile
+        self.budget = budget
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.burst = burst
+        self.other_upstream = other_upstream
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self._threshold: Optional[float] = None
+        self._stale = 0
+        self._credits = 0.0
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.denied = 0
+
+    def observe(self, latency: float):
+        """Record the latency of one upstream attempt, or a lower bound for one cut short by a hedge."""
+        self._latencies.append(latency)
+        self._stale += 1
+        # Re-sort only every so often; the threshold need not track every sample
+        if self._threshold is None or self._stale >= 32:
+            self._stale = 0
+            if len(self._latencies) >= self.min_samples:
+                ordered = sorted(self._latencies)
+                rank = max(0, math.ceil(self.percentile / 100 * len(ordered)) - 1)
+                self._threshold = ordered[rank]
+
+    @property
+    def delay(self) -> Optional[float]:
+        """Seconds to wait before hedging, or None until enough latencies are known."""
+        if self._threshold is None:
+            return None
+        return max(self.min_delay, self._threshold)
+
+    def start_call(self):
+        self.calls += 1
+        self._credits = min(self.burst, self._credits + self.budget)
+
+    def try_hedge(self) -> bool:
+        """Spend a credit on a hedge; False when the budget is exhausted."""
+        if self._credits < 1.0:
+            self.denied += 1
+            return False
+        self._credits -= 1.0
+        self.hedged += 1
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "denied": self.denied,
+            "delay_s": round(self.delay, 4) if self.delay is not None else None,
+            "credits": round(self._credits, 2),
+        }
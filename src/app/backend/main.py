@@ -1,11 +1,52 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import json
+import math
+import time
+import weakref
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from openai import AsyncOpenAI
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, ValidationError
 from typing import Optional, List
+from .admission import BULK, INTERACTIVE, STANDARD, AdmissionController, AdmissionRejected
 from .config import config
+from .context import ContextOverflowError, ContextWindowManager, TokenCounter
+from .health import HealthProber
+from .hedging import HedgePolicy
+from . import metrics
+from .cache import ResponseCache, SQLiteCacheStore, canonical_ingredients, chat_request_key, recipe_cache_key, recipe_context_key
+from .model_registry import ModelRegistry
+from .retrieval import RecipeIndex, format_recipe
+from .router import UpstreamRouter
+from .semantic_cache import SemanticCache
+from .sessions import InMemorySessionStore, SessionTooLargeError, SQLiteSessionStore
+from .singleflight import SingleFlight
+from .streaming import StreamStats, sse_event, stream_visible_text, strip_think
+from .tracing import FileSpanExporter, OTLPSpanExporter, Tracer, TracingMiddleware, record_span, span
+from .upstream import CircuitBreaker, CircuitOpenError, UpstreamClient
 
-app = FastAPI(title="Cook Assistant API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await tracer.start()
+    await upstream.start()
+    # The health prober feeds the registry through `update()`; the first request resolves the
+    # model itself if no probe has succeeded yet, so startup never waits on the upstream
+    health_prober.start()
+    # Warm the tokenizer off the request path
+    tokenizer_warmup = asyncio.create_task(token_counter.load())
+    yield
+    tokenizer_warmup.cancel()
+    await health_prober.stop()
+    await model_registry.stop()
+    await upstream.aclose()
+    recipe_cache.close()
+    session_store.close()
+    if recipe_index is not None:
+        recipe_index.close()
+    await tracer.stop()
+
+app = FastAPI(title="Cook Assistant API", version="1.0.0", lifespan=lifespan)
 
 # Enable CORS for frontend access
 app.add_middleware(
@@ -14,12 +55,236 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Trace-Id"],
+)
+
+# Request counts and latency per route
+app.add_middleware(metrics.MetricsMiddleware)
+
+# Per-request stage timings; only sampled, slow or failed requests are exported
+if config.TRACE_EXPORTER == "file":
+    trace_exporter = FileSpanExporter(
+        config.TRACE_FILE,
+        config.TRACE_SERVICE_NAME,
+        max_bytes=config.TRACE_FILE_MAX_BYTES,
+        backup_count=config.TRACE_FILE_BACKUPS
+    )
+elif config.TRACE_EXPORTER == "otlp":
+    trace_exporter = OTLPSpanExporter(config.TRACE_OTLP_ENDPOINT, config.TRACE_SERVICE_NAME)
+else:
+    trace_exporter = None
+tracer = Tracer(
+    trace_exporter,
+    sample_rate=config.TRACE_SAMPLE_RATE,
+    slow_threshold=config.TRACE_SLOW_MS / 1000 if config.TRACE_SLOW_MS > 0 else None
+)
+app.add_middleware(TracingMiddleware, tracer=tracer)
+
+# Pooled clients for the model endpoints; connection pools are opened in the lifespan hook
+upstream = UpstreamRouter(
+    [
+        UpstreamClient(
+            base_url=base_url,
+            api_key=config.MODAL_API_KEY,
+            max_connections=config.UPSTREAM_MAX_CONNECTIONS,
+            max_keepalive_connections=config.UPSTREAM_MAX_KEEPALIVE,
+            keepalive_expiry=config.UPSTREAM_KEEPALIVE_EXPIRY,
+            connect_timeout=config.UPSTREAM_CONNECT_TIMEOUT,
+            read_timeout=config.UPSTREAM_READ_TIMEOUT,
+            breaker=CircuitBreaker(
+                failure_threshold=config.CIRCUIT_FAILURE_THRESHOLD,
+                reset_timeout=config.CIRCUIT_RESET_TIMEOUT
+            )
+        )
+        for base_url in config.UPSTREAM_BASE_URLS
+    ],
+    strategy=config.UPSTREAM_ROUTING,
+    max_retries=config.UPSTREAM_MAX_RETRIES,
+    backoff_base=config.UPSTREAM_RETRY_BACKOFF,
+    backoff_max=config.UPSTREAM_RETRY_MAX_BACKOFF
+)
+
+# Duplicates /chat calls stuck in the latency tail, within a load budget
+chat_hedge = HedgePolicy(
+    percentile=config.HEDGE_PERCENTILE,
+    budget=config.HEDGE_BUDGET,
+    min_delay=config.HEDGE_MIN_DELAY,
+    other_upstream=config.HEDGE_UPSTREAM == "other"
+) if config.HEDGE_BUDGET > 0 else None
+
+# Caps in-flight generations; chat is served ahead of single recipes, and both ahead of batch jobs
+admission = AdmissionController(
+    max_in_flight=config.ADMISSION_MAX_IN_FLIGHT,
+    queue_limits={
+        INTERACTIVE: config.ADMISSION_QUEUE_INTERACTIVE,
+        STANDARD: config.ADMISSION_QUEUE_STANDARD,
+        BULK: config.ADMISSION_QUEUE_BULK
+    }
+)
+
+# Served model id, resolved on first use and renewed by the health prober
+model_registry = ModelRegistry(
+    upstream,
+    ttl_seconds=config.MODEL_REGISTRY_TTL,
+    override=config.MODEL_ID
 )
 
-# Initialize AsyncOpenAI client with Modal endpoint
-client = AsyncOpenAI(
-    api_key=config.MODAL_API_KEY,
-    base_url=config.MODAL_BASE_URL
+# Upstream status for /health and /ready, refreshed in the background
+health_prober = HealthProber(
+    upstream,
+    interval=config.HEALTH_PROBE_INTERVAL,
+    timeout=config.HEALTH_PROBE_TIMEOUT,
+    idle_after=config.HEALTH_PROBE_IDLE_AFTER,
+    on_models=model_registry.update
+)
+
+# Generations use a fixed seed, so identical recipe requests can be served from cache
+recipe_cache = ResponseCache(
+    max_entries=config.RESPONSE_CACHE_SIZE,
+    ttl_seconds=config.RESPONSE_CACHE_TTL,
+    store=SQLiteCacheStore(config.RESPONSE_CACHE_DB) if config.RESPONSE_CACHE_DB else None
+)
+
+# Serves a prior recipe to a request whose ingredient set is nearly the same
+semantic_cache = SemanticCache(
+    max_entries=config.SEMANTIC_CACHE_SIZE,
+    ttl_seconds=config.RESPONSE_CACHE_TTL,
+    threshold=config.SEMANTIC_CACHE_THRESHOLD
+)
+
+# Ingredient index over the processed corpus; memory-mapped, so opening it is cheap
+recipe_index = RecipeIndex(config.RETRIEVAL_INDEX_DIR) if config.RETRIEVAL_INDEX_DIR else None
+
+# Server-side chat history, so clients only send the new message each turn
+if config.SESSION_STORE == "sqlite":
+    session_store = SQLiteSessionStore(
+        config.SESSION_DB,
+        idle_ttl_seconds=config.SESSION_IDLE_TTL,
+        max_sessions=config.SESSION_MAX_SESSIONS,
+        max_bytes=config.SESSION_MAX_BYTES,
+        max_session_bytes=config.SESSION_MAX_SESSION_BYTES
+    )
+else:
+    session_store = InMemorySessionStore(
+        idle_ttl_seconds=config.SESSION_IDLE_TTL,
+        max_sessions=config.SESSION_MAX_SESSIONS,
+        max_bytes=config.SESSION_MAX_BYTES,
+        max_session_bytes=config.SESSION_MAX_SESSION_BYTES
+    )
+
+# Keep chat prompts within the model's context window
+token_counter = TokenCounter(config.TOKENIZER_NAME)
+context_manager = ContextWindowManager(
+    token_counter,
+    max_prompt_tokens=config.CHAT_MAX_PROMPT_TOKENS,
+    keep_last_messages=config.CHAT_KEEP_LAST_MESSAGES
+)
+
+# Concurrent identical requests share one upstream completion
+recipe_flights = SingleFlight()
+chat_flights = SingleFlight()
+
+# Expose the counters components already keep; read only at scrape time
+metrics.registry.callback(
+    "cook_assistant_admission_in_flight", "Upstream generations currently admitted", (),
+    lambda: {(): admission.in_flight}
+)
+metrics.registry.callback(
+    "cook_assistant_admission_queued", "Requests waiting for an upstream slot", ("lane",),
+    lambda: {(lane,): admission.queued(lane) for lane in admission.lanes}
+)
+metrics.registry.callback(
+    "cook_assistant_admission_rejected_total", "Requests rejected with 429 because their queue was full", ("lane",),
+    lambda: {(lane,): count for lane, count in admission.rejected.items()}, type="counter"
+)
+metrics.registry.callback(
+    "cook_assistant_traces_total", "Request traces started, kept for export, exported and dropped", ("outcome",),
+    lambda: {(k,): v for k, v in tracer.stats().items()}, type="counter"
+)
+metrics.registry.callback(
+    "cook_assistant_upstream_up", "1 if the last health probe reached the upstream", (),
+    lambda: {(): 1 if health_prober.healthy else 0}
+)
+metrics.registry.callback(
+    "cook_assistant_health_probe_latency_seconds", "Latency of the last upstream health probe", (),
+    lambda: {(): health_prober.last_latency or 0.0}
+)
+metrics.registry.callback(
+    "cook_assistant_upstream_circuit_open", "1 while the upstream's circuit breaker is not closed", ("upstream",),
+    lambda: {(r.name,): 0 if r.client.breaker.state == CircuitBreaker.CLOSED else 1 for r in upstream.replicas}
+)
+metrics.registry.callback(
+    "cook_assistant_upstream_outstanding", "Requests in flight per upstream, streams until closed", ("upstream",),
+    lambda: {(r.name,): r.outstanding for r in upstream.replicas}
+)
+metrics.registry.callback(
+    "cook_assistant_upstream_latency_ewma_seconds", "Moving average of upstream response latency", ("upstream",),
+    lambda: {(r.name,): r.latency for r in upstream.replicas if r.latency is not None}
+)
+metrics.registry.callback(
+    "cook_assistant_upstream_requests_total", "Calls routed to each upstream", ("upstream",),
+    lambda: {(r.name,): r.requests for r in upstream.replicas}, type="counter"
+)
+metrics.registry.callback(
+    "cook_assistant_upstream_failures_total", "Failed calls per upstream", ("upstream",),
+    lambda: {(r.name,): r.failures for r in upstream.replicas}, type="counter"
+)
+metrics.registry.callback(
+    "cook_assistant_upstream_retries_total", "Upstream calls retried after a retryable failure", (),
+    lambda: {(): upstream.retries}, type="counter"
+)
+metrics.registry.callback(
+    "cook_assistant_upstream_rejected_total", "Calls rejected while the circuit breaker was open", ("upstream",),
+    lambda: {(r.name,): r.client.breaker.rejected for r in upstream.replicas}, type="counter"
+)
+if chat_hedge is not None:
+    metrics.registry.callback(
+        "cook_assistant_hedge_total", "/chat calls, hedges sent, hedges that answered first and hedges denied by the budget",
+        ("outcome",),
+        lambda: {
+            ("calls",): chat_hedge.calls,
+            ("hedged",): chat_hedge.hedged,
+            ("won",): chat_hedge.hedge_wins,
+            ("denied",): chat_hedge.denied
+        },
+        type="counter"
+    )
+    metrics.registry.callback(
+        "cook_assistant_hedge_delay_seconds", "Current wait for a first token before a /chat call is hedged", (),
+        lambda: {(): chat_hedge.delay} if chat_hedge.delay is not None else {}
+    )
+metrics.registry.callback(
+    "cook_assistant_cache_hits_total", "Response cache hits", ("cache",),
+    lambda: {("recipe",): recipe_cache.hits, ("semantic",): semantic_cache.hits}, type="counter"
+)
+metrics.registry.callback(
+    "cook_assistant_cache_misses_total", "Response cache misses", ("cache",),
+    lambda: {("recipe",): recipe_cache.misses, ("semantic",): semantic_cache.misses}, type="counter"
+)
+metrics.registry.callback(
+    "cook_assistant_cache_hit_ratio", "Response cache hit ratio since startup", ("cache",),
+    lambda: {("recipe",): recipe_cache.stats()["hit_rate"], ("semantic",): semantic_cache.stats()["hit_rate"]}
+)
+metrics.registry.callback(
+    "cook_assistant_cache_entries", "Entries held in memory by each cache", ("cache",),
+    lambda: {
+        ("recipe",): recipe_cache.stats()["entries"],
+        ("semantic",): len(semantic_cache),
+        ("token_counts",): token_counter.cached_counts
+    }
+)
+metrics.registry.callback(
+    "cook_assistant_upstream_calls_saved_total", "Upstream calls avoided by request coalescing", ("operation",),
+    lambda: {("recipe",): recipe_flights.coalesced, ("chat",): chat_flights.coalesced}, type="counter"
+)
+metrics.registry.callback(
+    "cook_assistant_chat_sessions", "Chat session store statistics", ("stat",),
+    lambda: {(k,): v for k, v in session_store.stats().items() if isinstance(v, (int, float))}
+)
+metrics.registry.callback(
+    "cook_assistant_context_trimmed_total", "Chat requests and messages trimmed to the prompt budget", ("kind",),
+    lambda: {("requests",): context_manager.trimmed_requests, ("messages",): context_manager.trimmed_messages},
+    type="counter"
 )
 
 class RecipeRequest(BaseModel):
@@ -27,20 +292,42 @@ class RecipeRequest(BaseModel):
     additional_instructions: Optional[str] = None
     temperature: Optional[float] = 1.0
     max_tokens: Optional[int] = 1024
+    model: Optional[str] = None
+    bypass_cache: Optional[bool] = False
 
 class RecipeResponse(BaseModel):
     recipe: str
     ingredients_used: List[str]
     model: str
+    cached: bool = False
+    # Set when the recipe was generated for a near-duplicate ingredient set
+    similar_to: Optional[List[str]] = None
+    # "corpus" when the recipe was taken from the dataset instead of generated
+    source: str = "model"
+
+class RecipeSearchRequest(BaseModel):
+    ingredients: List[str]
+    k: Optional[int] = 5
+    metric: Optional[str] = "coverage"
+
+class RecipeBatchRequest(BaseModel):
+    requests: List[RecipeRequest]
+    max_concurrency: Optional[int] = None
 
 class ChatRequest(BaseModel):
     message: str
     conversation_history: Optional[List[dict]] = None
     temperature: Optional[float] = 1.0
+    model: Optional[str] = None
+    session_id: Optional[str] = None
 
 class ChatResponse(BaseModel):
     response: str
     model: str
+    session_id: Optional[str] = None
+
+class SessionCreateRequest(BaseModel):
+    conversation_history: Optional[List[dict]] = None
 
 @app.get("/")
 async def root():
@@ -49,134 +336,878 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "/generate-recipe": "POST - Generate a recipe from ingredients",
+            "/generate-recipe/stream": "POST - Generate a recipe, streamed as server-sent events",
+            "/generate-recipe/batch": "POST - Generate many recipes, streamed back as NDJSON",
+            "/recipes/search": "POST - Find corpus recipes by ingredient overlap",
             "/chat": "POST - Chat with the cooking assistant",
-            "/health": "GET - Health check"
+            "/chat/stream": "POST - Chat with the cooking assistant, streamed as server-sent events",
+            "/sessions": "POST - Start a server-side chat session",
+            "/cache/stats": "GET - Response cache statistics",
+            "/metrics": "GET - Prometheus metrics",
+            "/health": "GET - Liveness check with cached upstream status",
+            "/ready": "GET - Readiness check (503 while the upstream is unreachable)"
         }
     }
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
+    """
+    Liveness check, answered from the cached upstream probe.
+
+    Always 200 while the backend is running; `status` is "degraded" when the
+    last probe could not reach the Modal endpoint.
+    """
+    upstream_status = health_prober.snapshot()
+    return {
+        "status": "degraded" if health_prober.healthy is False else "healthy",
+        **upstream_status,
+        "model": model_registry.model_id,
+        "circuit": upstream.circuit_state,
+        "upstreams": [replica.stats() for replica in upstream.replicas]
+    }
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness check: 503 until the upstream has been reached and while it is down."""
+    upstream_status = health_prober.snapshot()
+    if not health_prober.healthy or upstream.circuit_state == CircuitBreaker.OPEN:
+        return JSONResponse(status_code=503, content={"status": "unavailable", **upstream_status})
+    return {"status": "ready", **upstream_status, "model": model_registry.model_id}
+
+class ClientDisconnected(Exception):
+    """The client closed the connection before its response was ready."""
+
+async def cancel_on_disconnect(http_request: Request, awaitable):
+    """
+    Await `awaitable`, cancelling it if the client disconnects first.
+
+    Cancellation reaches the upstream call, whose HTTP connection is closed,
+    so vLLM aborts the sequence instead of decoding for nobody. Coalesced
+    requests keep a shared generation alive until their last waiter leaves.
+
+    Raises:
+        ClientDisconnected: The client went away and the work was cancelled
+    """
+    work = asyncio.ensure_future(awaitable)
+    
+    async def wait_for_disconnect():
+        # The body has been read already, so the next message is the disconnect
+        while (await http_request.receive())["type"] != "http.disconnect":
+            pass
+    
+    watcher = asyncio.create_task(wait_for_disconnect())
     try:
-        # Try to list models to verify connection
-        models = await client.models.list()
-        model_list = [model.id for model in models.data]
-        return {
-            "status": "healthy",
-            "modal_connection": "connected",
-            "available_models": model_list
+        done, _ = await asyncio.wait({work, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        watcher.cancel()
+        if not work.done():
+            work.cancel()
+    if work not in done:
+        # Let the cancellation unwind (admission slot, upstream connection) before answering
+        await asyncio.gather(work, return_exceptions=True)
+        raise ClientDisconnected()
+    return work.result()
+
+def upstream_error(exc: Exception, message: str) -> HTTPException:
+    """Map a failure while talking to the upstream to the HTTP error returned to the client."""
+    if isinstance(exc, ClientDisconnected):
+        # Nobody reads it; nginx's "client closed request" status keeps it apart in metrics
+        return HTTPException(status_code=499, detail=f"{message}: client disconnected")
+    if isinstance(exc, AdmissionRejected):
+        return HTTPException(
+            status_code=429,
+            detail=f"{message}: {str(exc)}",
+            headers={"Retry-After": str(math.ceil(exc.retry_after))}
+        )
+    if isinstance(exc, CircuitOpenError):
+        return HTTPException(
+            status_code=503,
+            detail=f"{message}: {str(exc)}",
+            headers={"Retry-After": str(math.ceil(exc.retry_after))}
+        )
+    return HTTPException(status_code=500, detail=f"{message}: {str(exc)}")
+
+RECIPE_SYSTEM_PROMPT = "You are a helpful assistant that generates recipe samples from a given set of ingredients."
+CHAT_SYSTEM_PROMPT = "You are a helpful cooking assistant. You can help with recipes, cooking techniques, ingredient substitutions, and general cooking advice."
+
+def build_recipe_messages(request: RecipeRequest, references: Optional[List[dict]] = None) -> List[dict]:
+    """
+    Build the completion messages for a recipe request.
+
+    Args:
+        references: Corpus recipes to show the model as grounding context
+    """
+    # Format ingredients
+    ingredients_text = ", ".join(request.ingredients)
+    
+    # Create the user message
+    user_content = f"Generate a recipe using the following ingredients: {ingredients_text}. Include a title and clear steps."
+    
+    if request.additional_instructions:
+        user_content += f" Additional requirements: {request.additional_instructions}"
+    
+    system_content = RECIPE_SYSTEM_PROMPT
+    if references:
+        system_content += "\n\nSimilar recipes from our collection, for reference:\n\n" + "\n\n".join(
+            format_reference(recipe) for recipe in references
+        )
+    
+    return [
+        {
+            "role": "system",
+            "content": system_content
+        },
+        {
+            "role": "user",
+            "content": user_content
+        }
+    ]
+
+# Directions of a grounding reference are cut to this many characters to bound the prompt
+REFERENCE_MAX_CHARS = 600
+
+def format_reference(recipe: dict) -> str:
+    directions = " ".join(recipe.get("directions") or [])
+    if len(directions) > REFERENCE_MAX_CHARS:
+        directions = directions[:REFERENCE_MAX_CHARS].rsplit(" ", 1)[0] + " ..."
+    return f"{recipe['title']}\nIngredients: {', '.join(recipe['ingredients'])}\nDirections: {directions}"
+
+async def retrieve_recipes(request: RecipeRequest) -> tuple:
+    """
+    Look a recipe request up in the corpus index.
+
+    Returns `(answer, references)`: the corpus recipe to serve instead of
+    generating (only in "answer" mode, above the threshold, and for requests
+    without `bypass_cache` or additional instructions the corpus could not
+    honour), and the top hits to ground a generation with otherwise.
+    """
+    if recipe_index is None or config.RETRIEVAL_MODE not in ("ground", "answer"):
+        return None, None
+    started = time.perf_counter()
+    with span("retrieval", metric=config.RETRIEVAL_METRIC) as current:
+        # Common ingredients have long postings; keep the scan off the event loop
+        hits = await asyncio.to_thread(
+            recipe_index.search, request.ingredients, config.RETRIEVAL_TOP_K, config.RETRIEVAL_METRIC
+        )
+        if current is not None:
+            current.attributes.update(hits=len(hits), best_score=hits[0]["score"] if hits else None)
+    metrics.retrieval_latency.observe(time.perf_counter() - started)
+    if (config.RETRIEVAL_MODE == "answer" and hits and hits[0]["score"] >= config.RETRIEVAL_ANSWER_THRESHOLD
+            and not request.bypass_cache and not request.additional_instructions):
+        metrics.retrieval_requests.inc("answered")
+        return hits[0], None
+    if hits:
+        metrics.retrieval_requests.inc("grounded")
+    return None, hits or None
+
+def build_chat_messages(request: ChatRequest, history: Optional[List[dict]] = None) -> List[dict]:
+    """
+    Build the completion messages for a chat turn.
+
+    Args:
+        history: Stored session history; falls back to the request's conversation_history
+    """
+    messages = [
+        {
+            "role": "system",
+            "content": CHAT_SYSTEM_PROMPT
         }
+    ]
+    
+    # Add conversation history if provided
+    if history is None:
+        history = request.conversation_history
+    if history:
+        messages.extend(history)
+    
+    # Add current user message
+    messages.append({
+        "role": "user",
+        "content": request.message
+    })
+    return messages
+
+async def load_session_history(request: ChatRequest) -> Optional[List[dict]]:
+    """Fetch the stored history for the request's session, if it names one."""
+    if not request.session_id:
+        return None
+    history = await session_store.get(request.session_id)
+    if history is None:
+        raise HTTPException(status_code=404, detail=f"Session not found or expired: {request.session_id}")
+    return history
+
+async def prepare_chat_messages(request: ChatRequest) -> List[dict]:
+    """Build the chat messages from the request or its session, trimmed to the prompt budget."""
+    with span("load_session"):
+        history = await load_session_history(request)
+    try:
+        with span("fit_context"):
+            return await context_manager.fit(build_chat_messages(request, history))
+    except ContextOverflowError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+def session_expired(session_id: str) -> HTTPException:
+    """The error for a session that disappeared before a reply could be stored in it."""
+    return HTTPException(
+        status_code=404,
+        detail=f"Session expired before the reply was stored: {session_id}; start a new session"
+    )
+
+async def record_chat_turn(request: ChatRequest, assistant_message: str):
+    """Append the user message and assistant reply to the request's session."""
+    if request.session_id:
+        try:
+            stored = await session_store.append(request.session_id, [
+                {"role": "user", "content": request.message},
+                {"role": "assistant", "content": assistant_message}
+            ])
+        except SessionTooLargeError as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        if not stored:
+            raise session_expired(request.session_id)
+
+def trace_usage(current, usage):
+    """Attach a completion's token counts to its trace span, if traced."""
+    if current is not None and usage is not None:
+        current.attributes.update(
+            prompt_tokens=getattr(usage, "prompt_tokens", None),
+            completion_tokens=getattr(usage, "completion_tokens", None)
+        )
+
+async def open_upstream_stream(lane: str, **kwargs):
+    """
+    Admit and start a streamed completion.
+
+    Returns `(stream, ticket, upstream_started)`; the admission ticket must be
+    released when the stream ends (see `sse_response`).
+    """
+    ticket = await admission.acquire(lane)
+    try:
+        with span("upstream.connect", model=kwargs.get("model")):
+            upstream_started = time.perf_counter()
+            stream = await upstream.create_chat_completion(
+                stream=True,
+                stream_options={"include_usage": True},
+                **kwargs
+            )
+    except BaseException:
+        ticket.release()
+        raise
+    return stream, ticket, upstream_started
+
+def sse_response(relay, ticket) -> StreamingResponse:
+    """Wrap an `sse_completion` generator, releasing its admission slot even if it never runs."""
+    weakref.finalize(relay, ticket.release)
+    return StreamingResponse(
+        relay,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def sse_completion(stream, model_id: str, started: float, upstream_started: float,
+                         endpoint: str, operation: str, ticket=None, on_complete=None):
+    """
+    Relay a streamed completion to the client as server-sent events.
+
+    Args:
+        started: `time.perf_counter()` when the request was received
+        upstream_started: `time.perf_counter()` when the upstream call was issued
+        ticket: Admission ticket released once the upstream stream is done
+        on_complete: Optional coroutine function called with the full visible text
+    """
+    first_token_at = None
+    parts = []
+    stats = StreamStats()
+    try:
+        async for text in stream_visible_text(stream, stats):
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+            parts.append(text)
+            yield sse_event("token", {"content": text})
+        finished = time.perf_counter()
+        metrics.record_upstream(operation, upstream_started, stats.usage, stats.first_token_at)
+        # Prefill ends with the first token the upstream sent, visible or not
+        prefill_end = stats.first_token_at or finished
+        record_span("upstream.prefill", upstream_started, prefill_end)
+        record_span(
+            "upstream.decode", prefill_end, finished,
+            completion_tokens=getattr(stats.usage, "completion_tokens", None)
+        )
+        if on_complete is not None:
+            with span("postprocess"):
+                await on_complete("".join(parts))
+        yield sse_event("done", {
+            "model": model_id,
+            "time_to_first_token_ms": round((first_token_at - started) * 1000, 1) if first_token_at else None,
+            "total_ms": round((time.perf_counter() - started) * 1000, 1)
+        })
+    except (asyncio.CancelledError, GeneratorExit):
+        # The client disconnected mid-stream; closing the stream below aborts the generation
+        metrics.record_cancelled(operation, upstream_started, stats.chunks)
+        raise
+    except HTTPException as e:
+        metrics.record_error(endpoint, e)
+        yield sse_event("error", {"status": e.status_code, "detail": e.detail})
     except Exception as e:
-        raise HTTPException(status_code=503, detail=f"Service unhealthy: {str(e)}")
+        metrics.record_error(endpoint, e)
+        yield sse_event("error", {"detail": str(e)})
+    finally:
+        await stream.close()
+        if ticket is not None:
+            ticket.release()
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus text-format metrics."""
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Hit/miss counters for the recipe response cache and request coalescing."""
+    return {
+        "recipe": recipe_cache.stats(),
+        "semantic": semantic_cache.stats(),
+        "coalescing": {
+            "recipe": recipe_flights.stats(),
+            "chat": chat_flights.stats()
+        }
+    }
+
+async def run_recipe_generation(request: RecipeRequest, lane: str = STANDARD) -> RecipeResponse:
+    """
+    Generate a recipe for a single request.
+
+    Shared by `/generate-recipe` and `/generate-recipe/batch` so both paths
+    use the same prompt, cache and coalescing. Errors propagate to the caller.
+
+    Args:
+        lane: Admission lane for the upstream call
+    """
+    # Resolve the model from the cached registry
+    with span("resolve_model"):
+        model_id = await model_registry.get_model_id(request.model)
+    
+    cache_key = recipe_cache_key(request, model_id, config.DEFAULT_SEED)
+    context_key = recipe_context_key(request, model_id, config.DEFAULT_SEED)
+    if not request.bypass_cache:
+        with span("cache_lookup") as current:
+            cached = await recipe_cache.get(cache_key)
+            similar = semantic_cache.lookup(context_key, request.ingredients) if cached is None else None
+            if current is not None:
+                current.attributes["result"] = "exact" if cached else "semantic" if similar else "miss"
+        if cached is not None:
+            return RecipeResponse(
+                recipe=cached["recipe"],
+                ingredients_used=request.ingredients,
+                model=model_id,
+                cached=True
+            )
+        if similar is not None:
+            value, _ = similar
+            return RecipeResponse(
+                recipe=value["recipe"],
+                # The ingredients the recipe was written for, not the request's spelling
+                ingredients_used=value["ingredients"],
+                model=model_id,
+                cached=True,
+                similar_to=value["ingredients"]
+            )
+    
+    async def complete():
+        answer, references = await retrieve_recipes(request)
+        if answer is not None:
+            return format_recipe(answer), "corpus"
+        async with admission.slot(lane):
+            # Get completion from Modal endpoint
+            with span("upstream", model=model_id) as current:
+                upstream_started = time.perf_counter()
+                try:
+                    response = await upstream.create_chat_completion(
+                        model=model_id,
+                        messages=build_recipe_messages(request, references),
+                        temperature=request.temperature,
+                        max_tokens=request.max_tokens,
+                        stream=False,
+                        seed=config.DEFAULT_SEED
+                    )
+                except asyncio.CancelledError:
+                    metrics.record_cancelled("recipe", upstream_started)
+                    raise
+                trace_usage(current, response.usage)
+        metrics.record_upstream("recipe", upstream_started, response.usage)
+        
+        with span("postprocess"):
+            # Extract the recipe, removing thinking tags if present
+            recipe_text = strip_think(response.choices[0].message.content)
+            await recipe_cache.set(cache_key, {"recipe": recipe_text})
+            semantic_cache.add(
+                context_key, request.ingredients,
+                {"recipe": recipe_text, "ingredients": canonical_ingredients(request.ingredients)}
+            )
+        return recipe_text, "model"
+    
+    recipe_text, source = await recipe_flights.do(cache_key, complete)
+    
+    return RecipeResponse(
+        recipe=recipe_text,
+        ingredients_used=request.ingredients,
+        model=model_id,
+        source=source
+    )
 
 @app.post("/generate-recipe", response_model=RecipeResponse)
-async def generate_recipe(request: RecipeRequest):
+async def generate_recipe(request: RecipeRequest, http_request: Request):
     """
     Generate a recipe from a list of ingredients.
     """
     try:
-        # Get the available model
-        models = await client.models.list()
-        model_id = models.data[0].id if models.data else "unknown"
-        
-        # Format ingredients
-        ingredients_text = ", ".join(request.ingredients)
-        
-        # Create the user message
-        user_content = f"Generate a recipe using the following ingredients: {ingredients_text}. Include a title and clear steps."
+        return await cancel_on_disconnect(http_request, run_recipe_generation(request))
+    except Exception as e:
+        metrics.record_error("/generate-recipe", e)
+        raise upstream_error(e, "Error generating recipe")
+
+async def ndjson_batch_results(requests: List[RecipeRequest], concurrency: int):
+    """
+    Run recipe requests with at most `concurrency` in flight and yield one
+    NDJSON line per item as it completes.
+    """
+    pending: asyncio.Queue = asyncio.Queue()
+    for index, item in enumerate(requests):
+        pending.put_nowait((index, item))
+    results: asyncio.Queue = asyncio.Queue()
+    
+    async def worker():
+        while True:
+            try:
+                index, item = pending.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                recipe = await run_recipe_generation(item, lane=BULK)
+                line = {"index": index, "status": "success", "result": recipe.model_dump()}
+            except Exception as e:
+                metrics.record_error("/generate-recipe/batch", e)
+                line = {"index": index, "status": "error", "detail": f"Error generating recipe: {str(e)}"}
+            await results.put(line)
+    
+    workers = [asyncio.create_task(worker()) for _ in range(min(concurrency, len(requests)))]
+    try:
+        for _ in range(len(requests)):
+            line = await results.get()
+            yield json.dumps(line) + "\n"
+    finally:
+        # Stop outstanding work if the client goes away mid-batch
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+SEARCH_MAX_K = 50
+
+@app.post("/recipes/search")
+async def search_recipes(request: RecipeSearchRequest):
+    """
+    Find corpus recipes sharing the most ingredients with the request.
+
+    Scored by `coverage` (share of the recipe's ingredients the request has)
+    or `jaccard` (overlap over the union of both ingredient sets).
+    """
+    if recipe_index is None:
+        raise HTTPException(status_code=503, detail="No recipe index configured (set RETRIEVAL_INDEX_DIR)")
+    try:
+        started = time.perf_counter()
+        k = max(1, min(request.k or 5, SEARCH_MAX_K))
+        results = await asyncio.to_thread(recipe_index.search, request.ingredients, k, request.metric)
+        metrics.retrieval_latency.observe(time.perf_counter() - started)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return {"results": results, "metric": request.metric, "index": recipe_index.stats()}
+
+@app.post("/generate-recipe/batch")
+async def generate_recipe_batch(request: RecipeBatchRequest):
+    """
+    Generate recipes for many requests, streaming per-item results as NDJSON.
+
+    Each line is `{"index", "status", "result" | "detail"}`; lines arrive in
+    completion order, not request order.
+    """
+    if len(request.requests) > config.BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {len(request.requests)} items (max {config.BATCH_MAX_ITEMS})"
+        )
+    concurrency = min(request.max_concurrency or config.BATCH_CONCURRENCY, config.BATCH_MAX_CONCURRENCY)
+    return StreamingResponse(
+        ndjson_batch_results(request.requests, max(concurrency, 1)),
+        media_type="application/x-ndjson"
+    )
+
+@app.post("/generate-recipe/stream")
+async def generate_recipe_stream(request: RecipeRequest):
+    """
+    Generate a recipe and stream it back as server-sent events.
+
+    Emits `token` events with visible content as it is generated, then a
+    single `done` (or `error`) event.
+    """
+    started = time.perf_counter()
+    try:
+        with span("resolve_model"):
+            model_id = await model_registry.get_model_id(request.model)
         
-        if request.additional_instructions:
-            user_content += f" Additional requirements: {request.additional_instructions}"
+        cache_key = recipe_cache_key(request, model_id, config.DEFAULT_SEED)
+        context_key = recipe_context_key(request, model_id, config.DEFAULT_SEED)
+        if not request.bypass_cache:
+            with span("cache_lookup") as current:
+                cached = await recipe_cache.get(cache_key)
+                similar_to = None
+                if cached is None:
+                    similar = semantic_cache.lookup(context_key, request.ingredients)
+                    if similar is not None:
+                        cached = similar[0]
+                        similar_to = cached["ingredients"]
+                if current is not None:
+                    current.attributes["result"] = "semantic" if similar_to else "exact" if cached else "miss"
+            if cached is not None:
+                return StreamingResponse(
+                    iter([
+                        sse_event("token", {"content": cached["recipe"]}),
+                        sse_event("done", {"model": model_id, "cached": True, "similar_to": similar_to})
+                    ]),
+                    media_type="text/event-stream"
+                )
         
-        # Create messages
-        messages = [
-            {
-                "role": "system",
-                "content": "You are a helpful assistant that generates recipe samples from a given set of ingredients."
-            },
-            {
-                "role": "user",
-                "content": user_content
-            }
-        ]
+        answer, references = await retrieve_recipes(request)
+        if answer is not None:
+            return StreamingResponse(
+                iter([
+                    sse_event("token", {"content": format_recipe(answer)}),
+                    sse_event("done", {"model": model_id, "cached": False, "source": "corpus"})
+                ]),
+                media_type="text/event-stream"
+            )
         
-        # Get completion from Modal endpoint
-        response = await client.chat.completions.create(
+        stream, ticket, upstream_started = await open_upstream_stream(
+            STANDARD,
             model=model_id,
-            messages=messages,
+            messages=build_recipe_messages(request, references),
             temperature=request.temperature,
             max_tokens=request.max_tokens,
-            stream=False,
             seed=config.DEFAULT_SEED
         )
-        
-        # Extract the recipe
-        recipe_text = response.choices[0].message.content
-        
-        # Remove thinking tags if present
-        if "</think>" in recipe_text:
-            recipe_text = recipe_text.split("</think>", 1)[-1].lstrip()
-        
-        return RecipeResponse(
-            recipe=recipe_text,
-            ingredients_used=request.ingredients,
-            model=model_id
-        )
-        
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error generating recipe: {str(e)}")
+        metrics.record_error("/generate-recipe/stream", e)
+        raise upstream_error(e, "Error generating recipe")
+    
+    async def store_recipe(recipe_text: str):
+        await recipe_cache.set(cache_key, {"recipe": recipe_text})
+        semantic_cache.add(
+            context_key, request.ingredients,
+            {"recipe": recipe_text, "ingredients": canonical_ingredients(request.ingredients)}
+        )
+    
+    return sse_response(
+        sse_completion(
+            stream, model_id, started, upstream_started,
+            "/generate-recipe/stream", "recipe", ticket=ticket, on_complete=store_recipe
+        ),
+        ticket
+    )
 
 @app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, http_request: Request):
     """
     Chat with the cooking assistant.
+
+    With a `session_id`, the history is read from the server-side session and
+    the new turn is appended to it, so only the new message needs to be sent.
     """
+    messages = await prepare_chat_messages(request)
     try:
-        # Get the available model
-        models = await client.models.list()
-        model_id = models.data[0].id if models.data else "unknown"
-        
-        # Build conversation history
-        messages = [
-            {
-                "role": "system",
-                "content": "You are a helpful cooking assistant. You can help with recipes, cooking techniques, ingredient substitutions, and general cooking advice."
-            }
-        ]
+        # Resolve the model from the cached registry
+        with span("resolve_model"):
+            model_id = await model_registry.get_model_id(request.model)
         
-        # Add conversation history if provided
-        if request.conversation_history:
-            messages.extend(request.conversation_history)
-        
-        # Add current user message
-        messages.append({
-            "role": "user",
-            "content": request.message
-        })
+        async def complete():
+            async with admission.slot(INTERACTIVE):
+                # Get completion from Modal endpoint
+                with span("upstream", model=model_id) as current:
+                    upstream_started = time.perf_counter()
+                    try:
+                        response = await upstream.create_chat_completion(
+                            hedge=chat_hedge,
+                            model=model_id,
+                            messages=messages,
+                            temperature=request.temperature,
+                            stream=False,
+                            seed=config.DEFAULT_SEED
+                        )
+                    except asyncio.CancelledError:
+                        metrics.record_cancelled("chat", upstream_started)
+                        raise
+                    trace_usage(current, response.usage)
+            metrics.record_upstream("chat", upstream_started, response.usage)
+            
+            # Extract response, removing thinking tags if present
+            with span("postprocess"):
+                return strip_think(response.choices[0].message.content)
         
-        # Get completion from Modal endpoint
-        response = await client.chat.completions.create(
+        assistant_message = await cancel_on_disconnect(http_request, chat_flights.do(
+            chat_request_key(messages, request.temperature, model_id, config.DEFAULT_SEED),
+            complete
+        ))
+    except Exception as e:
+        metrics.record_error("/chat", e)
+        raise upstream_error(e, "Error in chat")
+    
+    with span("record_turn"):
+        await record_chat_turn(request, assistant_message)
+    
+    return ChatResponse(
+        response=assistant_message,
+        model=model_id,
+        session_id=request.session_id
+    )
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Chat with the cooking assistant, streaming the reply as server-sent events.
+    """
+    started = time.perf_counter()
+    messages = await prepare_chat_messages(request)
+    try:
+        with span("resolve_model"):
+            model_id = await model_registry.get_model_id(request.model)
+        stream, ticket, upstream_started = await open_upstream_stream(
+            INTERACTIVE,
             model=model_id,
             messages=messages,
             temperature=request.temperature,
-            stream=False,
             seed=config.DEFAULT_SEED
         )
-        
-        # Extract response
-        assistant_message = response.choices[0].message.content
-        
-        # Remove thinking tags if present
-        if "</think>" in assistant_message:
-            assistant_message = assistant_message.split("</think>", 1)[-1].lstrip()
-        
-        return ChatResponse(
-            response=assistant_message,
-            model=model_id
+    except Exception as e:
+        metrics.record_error("/chat/stream", e)
+        raise upstream_error(e, "Error in chat")
+    
+    async def store_turn(assistant_message: str):
+        await record_chat_turn(request, assistant_message)
+    
+    return sse_response(
+        sse_completion(
+            stream, model_id, started, upstream_started,
+            "/chat/stream", "chat", ticket=ticket, on_complete=store_turn
+        ),
+        ticket
+    )
+
+async def websocket_chat_turn(websocket: WebSocket, history: List[dict], message: dict,
+                              session_id: Optional[str] = None):
+    """
+    Generate one `/ws/chat` reply, streaming it over the socket.
+
+    The turn is added to `history` (and the stored session, if any) only once
+    the reply completes; a cancelled turn leaves the conversation unchanged.
+    """
+    started = time.perf_counter()
+    stream = ticket = None
+    try:
+        request = ChatRequest(
+            message=message.get("content"),
+            temperature=message.get("temperature", 1.0),
+            model=message.get("model")
         )
-        
+        messages = await context_manager.fit(build_chat_messages(request, history))
+        model_id = await model_registry.get_model_id(request.model)
+        stream, ticket, upstream_started = await open_upstream_stream(
+            INTERACTIVE,
+            model=model_id,
+            messages=messages,
+            temperature=request.temperature,
+            seed=config.DEFAULT_SEED
+        )
+        first_token_at = None
+        parts = []
+        # Tokens arriving within WS_TOKEN_FLUSH_MS of the last frame share the next one
+        pending = []
+        last_sent = 0.0
+        stats = StreamStats()
+        async for text in stream_visible_text(stream, stats):
+            now = time.perf_counter()
+            if first_token_at is None:
+                first_token_at = now
+            parts.append(text)
+            pending.append(text)
+            if now - last_sent >= config.WS_TOKEN_FLUSH_MS / 1000:
+                await websocket.send_json({"type": "token", "content": "".join(pending)})
+                pending.clear()
+                last_sent = now
+        if pending:
+            await websocket.send_json({"type": "token", "content": "".join(pending)})
+        metrics.record_upstream("chat", upstream_started, stats.usage, stats.first_token_at)
+
+        turn = [
+            {"role": "user", "content": request.message},
+            {"role": "assistant", "content": "".join(parts)}
+        ]
+        history.extend(turn)
+        if session_id and not await session_store.append(session_id, turn):
+            raise session_expired(session_id)
+        metrics.ws_chat_turns.inc("completed")
+        metrics.ws_chat_turn_latency.observe(time.perf_counter() - started)
+        await websocket.send_json({
+            "type": "done",
+            "model": model_id,
+            "time_to_first_token_ms": round((first_token_at - started) * 1000, 1) if first_token_at else None,
+            "total_ms": round((time.perf_counter() - started) * 1000, 1)
+        })
+    except asyncio.CancelledError:
+        # Cancelled by the client, or the socket went away
+        metrics.ws_chat_turns.inc("cancelled")
+        if stream is not None:
+            metrics.record_cancelled("chat", upstream_started, stats.chunks)
+        try:
+            await websocket.send_json({"type": "cancelled"})
+        except Exception:
+            pass
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error in chat: {str(e)}")
+        metrics.ws_chat_turns.inc("error")
+        metrics.record_error("/ws/chat", e)
+        if isinstance(e, ValidationError):
+            error = {"status": 422, "detail": e.errors(include_url=False, include_context=False)}
+        elif isinstance(e, (ContextOverflowError, SessionTooLargeError)):
+            error = {"status": 413, "detail": str(e)}
+        elif isinstance(e, HTTPException):
+            error = {"status": e.status_code, "detail": e.detail}
+        else:
+            http_error = upstream_error(e, "Error in chat")
+            error = {"status": http_error.status_code, "detail": http_error.detail}
+            if isinstance(e, (AdmissionRejected, CircuitOpenError)):
+                error["retry_after"] = math.ceil(e.retry_after)
+        try:
+            await websocket.send_json({"type": "error", **error})
+        except Exception:
+            pass
+    finally:
+        # Closing the stream drops the upstream connection, which aborts the generation
+        if stream is not None:
+            await stream.close()
+        if ticket is not None:
+            ticket.release()
+
+async def cancel_websocket_turn(websocket: WebSocket, turn: asyncio.Task):
+    """
+    Cancel a `/ws/chat` turn and wait for it to finish.
+
+    A turn that was already running reports `cancelled` itself; one cancelled
+    before it started cannot, so the terminal message is sent here instead.
+    """
+    turn.cancel()
+    try:
+        await turn
+    except asyncio.CancelledError:
+        if not turn.cancelled():
+            # This handler is being cancelled, not the turn
+            raise
+        metrics.ws_chat_turns.inc("cancelled")
+        await websocket.send_json({"type": "cancelled"})
+
+@app.websocket("/ws/chat")
+async def chat_websocket(websocket: WebSocket):
+    """
+    Chat over one WebSocket per conversation.
+
+    The history is kept on the connection, so each turn only carries the new
+    message. Pass `?session_id=` to start from a stored session and keep it
+    updated. Client messages are JSON:
+
+        {"type": "message", "content": "...", "temperature": 1.0, "model": null}
+        {"type": "cancel"}   abort the reply being generated
+        {"type": "reset"}    forget the conversation held on this connection
+
+    Replies stream back as `token` messages followed by `done`, `cancelled`
+    or `error` (with an HTTP-style `status`). Tokens produced within
+    `WS_TOKEN_FLUSH_MS` of the previous frame are sent together. With a
+    session, a reset deletes it and continues in a new one, announced as
+    `{"type": "reset", "session_id": ...}`.
+    """
+    await websocket.accept()
+    session_id = websocket.query_params.get("session_id")
+    history: List[dict] = []
+    if session_id:
+        stored = await session_store.get(session_id)
+        if stored is None:
+            await websocket.close(code=4404, reason=f"Session not found or expired: {session_id}")
+            return
+        history = stored
+
+    turn: Optional[asyncio.Task] = None
+    try:
+        while True:
+            try:
+                message = await websocket.receive_json()
+            except (ValueError, KeyError):
+                await websocket.send_json({"type": "error", "status": 400, "detail": "Messages must be JSON text frames"})
+                continue
+            kind = message.get("type") if isinstance(message, dict) else None
+
+            if kind == "cancel":
+                if turn is not None and not turn.done():
+                    await cancel_websocket_turn(websocket, turn)
+            elif kind == "reset":
+                if turn is not None and not turn.done():
+                    await cancel_websocket_turn(websocket, turn)
+                history.clear()
+                if session_id:
+                    # The stored session would bring the forgotten turns back on reload
+                    await session_store.delete(session_id)
+                    session_id = await session_store.create()
+                    await websocket.send_json({"type": "reset", "session_id": session_id})
+            elif kind == "message":
+                if turn is not None and not turn.done():
+                    await websocket.send_json({"type": "error", "status": 409, "detail": "A reply is still being generated"})
+                    continue
+                turn = asyncio.create_task(websocket_chat_turn(websocket, history, message, session_id))
+            else:
+                await websocket.send_json({"type": "error", "status": 400, "detail": f"Unknown message type: {kind}"})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if turn is not None and not turn.done():
+            turn.cancel()
+            try:
+                await turn
+            except asyncio.CancelledError:
+                pass
+
+@app.post("/sessions")
+async def create_session(request: Optional[SessionCreateRequest] = None):
+    """Start a server-side chat session, optionally seeded with prior history."""
+    history = request.conversation_history if request else None
+    try:
+        session_id = await session_store.create(history)
+    except SessionTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    return {"session_id": session_id}
+
+@app.get("/sessions")
+async def session_stats():
+    """Session store statistics."""
+    return session_store.stats()
+
+@app.get("/sessions/{session_id}")
+async def get_session(session_id: str):
+    """Return the stored conversation for a session."""
+    messages = await session_store.get(session_id)
+    if messages is None:
+        raise HTTPException(status_code=404, detail=f"Session not found or expired: {session_id}")
+    return {"session_id": session_id, "messages": messages}
+
+@app.delete("/sessions/{session_id}")
+async def delete_session(session_id: str):
+    """Delete a session and its conversation."""
+    if not await session_store.delete(session_id):
+        raise HTTPException(status_code=404, detail=f"Session not found or expired: {session_id}")
+    return {"session_id": session_id, "deleted": True}
 
 if __name__ == "__main__":
     import uvicorn
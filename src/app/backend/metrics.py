@@ -0,0 +1,290 @@
+"""
+Lightweight Prometheus-style metrics.
+
+Collectors are plain dicts of numbers updated from the event loop thread, so
+recording a sample is a dict lookup and an increment with no locking.
+`render()` produces the Prometheus text exposition format.
+"""
+
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+TOKENS_PER_SECOND_BUCKETS = (1, 5, 10, 25, 50, 100, 200, 500, 1000)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        for labels, value in self._values.items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str):
+        series = self._series.get(labels)
+        if series is None:
+            series = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            self._series[labels] = series
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return series[2] if series else 0
+
+    def total(self, *labels: str) -> float:
+        series = self._series.get(labels)
+        return series[1] if series else 0.0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in self._series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(total)}")
+            lines.append(f"{self.name}_count{label_text} {count}")
+        return lines
+
+
+class CallbackMetric:
+    """
+    A metric whose samples are read from a callback at scrape time.
+
+    Used to expose counters that components already keep (cache hits,
+    evictions) without touching their hot paths.
+    """
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str],
+                 collect: Callable[[], Dict[Tuple[str, ...], float]], type: str = "gauge"):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+        self.type = type
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.type}"]
+        for labels, value in self.collect().items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._collectors: list = []
+
+    def register(self, collector):
+        self._collectors.append(collector)
+        return collector
+
+    def counter(self, name: str, description: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, description, labelnames))
+
+    def histogram(self, name: str, description: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, description, labelnames, buckets))
+
+    def callback(self, name: str, description: str, labelnames: Sequence[str],
+                 collect: Callable[[], Dict[Tuple[str, ...], float]], type: str = "gauge") -> CallbackMetric:
+        return self.register(CallbackMetric(name, description, labelnames, collect, type))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for collector in self._collectors:
+            lines.extend(collector.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+http_requests = registry.counter(
+    "cook_assistant_http_requests_total", "HTTP requests by endpoint and status",
+    ("method", "endpoint", "status"),
+)
+http_latency = registry.histogram(
+    "cook_assistant_http_request_duration_seconds", "HTTP request latency including streamed bodies",
+    ("method", "endpoint"),
+)
+upstream_ttft = registry.histogram(
+    "cook_assistant_upstream_time_to_first_token_seconds", "Upstream time to first token",
+    ("operation",),
+)
+upstream_duration = registry.histogram(
+    "cook_assistant_upstream_generation_seconds", "Upstream total generation time",
+    ("operation",),
+)
+upstream_tokens = registry.counter(
+    "cook_assistant_upstream_tokens_total", "Tokens reported by the upstream usage block",
+    ("operation", "kind"),
+)
+upstream_tokens_per_second = registry.histogram(
+    "cook_assistant_upstream_tokens_per_second", "Completion tokens per second of generation time",
+    ("operation",), buckets=TOKENS_PER_SECOND_BUCKETS,
+)
+upstream_cancelled = registry.counter(
+    "cook_assistant_upstream_cancelled_total", "Upstream generations cancelled because the client went away",
+    ("operation",),
+)
+upstream_saved_tokens = registry.counter(
+    "cook_assistant_upstream_saved_tokens_total", "Estimated completion tokens not generated after cancellations",
+    ("operation",),
+)
+upstream_saved_seconds = registry.counter(
+    "cook_assistant_upstream_saved_seconds_total", "Estimated upstream generation seconds avoided after cancellations",
+    ("operation",),
+)
+ws_chat_turns = registry.counter(
+    "cook_assistant_ws_chat_turns_total", "WebSocket chat turns by outcome",
+    ("outcome",),
+)
+ws_chat_turn_latency = registry.histogram(
+    "cook_assistant_ws_chat_turn_seconds", "WebSocket chat turn latency, message received to last token",
+)
+retrieval_requests = registry.counter(
+    "cook_assistant_retrieval_requests_total", "Recipe requests answered from the corpus or grounded with it",
+    ("outcome",),
+)
+retrieval_latency = registry.histogram(
+    "cook_assistant_retrieval_seconds", "Corpus index search latency",
+)
+errors = registry.counter(
+    "cook_assistant_errors_total", "Errors by endpoint and exception type",
+    ("endpoint", "type"),
+)
+
+
+def record_error(endpoint: str, exc: BaseException):
+    errors.inc(endpoint, type(exc).__name__)
+
+
+def record_upstream(operation: str, started: float, usage=None, first_token_at: Optional[float] = None):
+    """
+    Record one finished upstream completion.
+
+    Args:
+        operation: "recipe" or "chat"
+        started: `time.perf_counter()` when the upstream call was issued
+        usage: The completion's `usage` block, if the upstream returned one
+        first_token_at: `time.perf_counter()` of the first streamed token; for
+            non-streaming calls the whole response arrives at once
+    """
+    finished = time.perf_counter()
+    elapsed = finished - started
+    upstream_duration.observe(elapsed, operation)
+    upstream_ttft.observe((first_token_at or finished) - started, operation)
+    if usage is not None:
+        prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+        completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+        upstream_tokens.inc(operation, "prompt", amount=prompt_tokens)
+        upstream_tokens.inc(operation, "completion", amount=completion_tokens)
+        if completion_tokens and elapsed > 0:
+            upstream_tokens_per_second.observe(completion_tokens / elapsed, operation)
+
+
+def record_cancelled(operation: str, started: float, generated_tokens: Optional[int] = None):
+    """
+    Record an upstream generation abandoned before it finished.
+
+    What it would have cost is estimated from the mean duration and
+    completion length of the generations that did finish.
+
+    Args:
+        started: `time.perf_counter()` when the upstream call was issued
+        generated_tokens: Tokens already streamed; estimated from the elapsed
+            time for non-streaming calls
+    """
+    upstream_cancelled.inc(operation)
+    completed = upstream_duration.count(operation)
+    if not completed:
+        return
+    mean_seconds = upstream_duration.total(operation) / completed
+    mean_tokens = upstream_tokens.value(operation, "completion") / completed
+    elapsed = time.perf_counter() - started
+    if generated_tokens is None:
+        generated_tokens = mean_tokens * min(1.0, elapsed / mean_seconds) if mean_seconds > 0 else 0
+    upstream_saved_seconds.inc(operation, amount=max(0.0, mean_seconds - elapsed))
+    upstream_saved_tokens.inc(operation, amount=max(0.0, mean_tokens - generated_tokens))
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording request counts and latency per route.
+
+    Routes are labelled by their path template (e.g. `/sessions/{session_id}`)
+    to keep label cardinality bounded. Latency covers the full response body,
+    so streamed responses are timed until their last chunk.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = "500"
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            endpoint = getattr(route, "path", None) or "unmatched"
+            method = scope.get("method", "")
+            http_requests.inc(method, endpoint, status)
+            http_latency.observe(time.perf_counter() - started, method, endpoint)
@@ -0,0 +1,121 @@
+"""Served model resolution for the Modal vLLM endpoint."""
+
+import asyncio
+import time
+from typing import Optional
+
+
+class ModelRegistry:
+    """
+    Resolves the served model id once and keeps it fresh in the background.
+
+    `client` is anything with an async `list_models()` returning model ids.
+
+    Request handlers call `get_model_id()`, which answers from memory. The
+    upstream `models.list()` call only happens when a request arrives before
+    any resolution or `update()`, and from the optional background refresh
+    loop (see `start()`) once the TTL expires without an `update()`.
+    """
+
+    def __init__(self, client, ttl_seconds: float = 300.0, override: Optional[str] = None):
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self.override = override
+        self._model_id: Optional[str] = None
+        self._available_models: list = []
+        self._resolved_at = 0.0
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    @property
+    def model_id(self) -> Optional[str]:
+        """The currently resolved model id, without triggering a lookup."""
+        return self.override or self._model_id
+
+    @property
+    def available_models(self) -> list:
+        return list(self._available_models)
+
+    @property
+    def age(self) -> Optional[float]:
+        """Seconds since the last successful resolution."""
+        if not self._resolved_at:
+            return None
+        return time.monotonic() - self._resolved_at
+
+    def update(self, model_ids: list):
+        """Accept a model list fetched elsewhere (e.g. by the health prober)."""
+        if model_ids:
+            self._available_models = list(model_ids)
+            self._model_id = model_ids[0]
+            self._resolved_at = time.monotonic()
+
+    async def refresh(self, force: bool = True) -> Optional[str]:
+        """
+        Fetch the served models from the upstream and update the cached id.
+
+        Args:
+            force: When False, skip the upstream call if an id is already resolved.
+        """
+        async with self._lock:
+            if not force and self._model_id is not None:
+                return self._model_id
+            self._available_models = await self.client.list_models()
+            if self._available_models:
+                self._model_id = self._available_models[0]
+            self._resolved_at = time.monotonic()
+            return self._model_id
+
+    async def get_model_id(self, override: Optional[str] = None) -> str:
+        """
+        Return the model id to use for a completion.
+
+        Args:
+            override: Per-request model id; takes precedence over everything else.
+        """
+        if override:
+            return override
+        if self.override:
+            return self.override
+        if self._model_id is None:
+            # Only requests arriving before the first resolution pay the round trip
+            await self.refresh(force=False)
+        return self._model_id or "unknown"
+
+    async def _refresh_loop(self):
+        while True:
+            # `update()` from the health prober also renews the id; only fetch once it is stale
+            await asyncio.sleep(max(1.0, self._resolved_at + self.ttl_seconds - time.monotonic()))
+            if self.age is not None and self.age < self.ttl_seconds:
+                continue
+            try:
+                await self.refresh()
+            except Exception as e:
+                # Keep serving the last known id; the next tick will retry
+                print(f"Model registry refresh failed: {e}")
+
+    async def start(self, refresh_in_background: bool = True):
+        """
+        Resolve the model eagerly and start the background refresh loop.
+
+        Args:
+            refresh_in_background: Set to False when something else feeds
+                `update()` (the health prober), so the registry adds no calls
+        """
+        if self.override:
+            return
+        try:
+            await self.refresh()
+        except Exception as e:
+            print(f"Model registry initial resolution failed: {e}")
+        if refresh_in_background:
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
@@ -0,0 +1,296 @@
+"""
+Recipe retrieval from the processed corpus through an ingredient inverted index.
+
+The index is built once from `dataset/recipes_processed.json` and stored as a
+directory of flat NumPy arrays, which are opened with `mmap_mode="r"` so the
+backend pages in only the postings a query touches:
+
+    vocab.json          canonical ingredient terms; a term's id is its position
+    offsets.npy         int64, postings of term t are postings[offsets[t]:offsets[t + 1]]
+    postings.npy        int32 recipe ids, ascending within each term
+    sizes.npy           uint16 distinct terms per recipe
+    recipes.jsonl       one recipe per line (title, ingredients, directions, indexed terms)
+    recipe_offsets.npy  int64 byte offset of each recipe line
+    meta.json           source, field and build figures
+
+Usage:
+    python -m src.app.backend.retrieval build dataset/recipes_processed.json dataset/recipe_index
+    python -m src.app.backend.retrieval search dataset/recipe_index chicken rice garlic
+"""
+
+import argparse
+import json
+import mmap
+import os
+import re
+import time
+from array import array
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .semantic_cache import DESCRIPTORS, singularize
+
+# Scoring metrics
+COVERAGE = "coverage"  # share of the recipe's ingredients the request has
+JACCARD = "jaccard"    # overlap over union; also penalizes unused request ingredients
+METRICS = (COVERAGE, JACCARD)
+# Below one posting per this many corpus recipes, sorting the postings beats a per-recipe count
+SPARSE_QUERY_RATIO = 8
+
+# Preparation words in corpus ingredient lines that do not name the ingredient
+QUALIFIERS = DESCRIPTORS | frozenset({
+    "firmly", "packed", "lightly", "broken", "softened", "melted", "beaten", "cooked", "uncooked",
+    "crushed", "cubed", "halved", "peeled", "pitted", "drained", "rinsed", "thinly", "finely",
+    "coarsely", "cut", "into", "piece", "of", "to", "taste", "optional",
+})
+
+PARENTHETICAL = re.compile(r"\(.*?\)")
+ALTERNATIVES = re.compile(r"\bor\b|/")
+WORD = re.compile(r"[a-z]+")
+
+
+# The corpus repeats the same ingredient lines across many recipes
+@lru_cache(maxsize=262144)
+def ingredient_terms(ingredient: str) -> Tuple[str, ...]:
+    """
+    Canonical index terms for one ingredient line.
+
+    Lower-cased and singularized, without parentheticals or preparation
+    words; "butter or margarine" yields both alternatives.
+    """
+    text = PARENTHETICAL.sub(" ", ingredient.lower())
+    terms: List[str] = []
+    for alternative in ALTERNATIVES.split(text):
+        words = [singularize(w) for w in WORD.findall(alternative)]
+        term = " ".join(w for w in words if w not in QUALIFIERS)
+        if term and term not in terms:
+            terms.append(term)
+    return tuple(terms)
+
+
+def recipe_terms(ingredients: Iterable[str]) -> List[str]:
+    """Distinct canonical terms of an ingredient list, in first-seen order."""
+    seen: Dict[str, None] = {}
+    for ingredient in ingredients:
+        for term in ingredient_terms(ingredient):
+            seen[term] = None
+    return list(seen)
+
+
+def build_index(recipes: Iterable[Dict[str, Any]], output_dir: str, field: str = "cleaned_ingredients",
+                source: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Build the inverted index for `recipes` and write it to `output_dir`.
+
+    Records are consumed one at a time and the (term, recipe) pairs are kept
+    in compact typed buffers, so a corpus read lazily (`iter_json_array`)
+    is never held in memory.
+
+    Args:
+        recipes: Corpus records with `title`, `directions` and `field`, in any iterable
+        field: Record field holding the ingredient names to index
+        source: Corpus path, recorded in meta.json
+
+    Returns:
+        The build figures also written to meta.json
+    """
+    started = time.perf_counter()
+    os.makedirs(output_dir, exist_ok=True)
+
+    vocab: Dict[str, int] = {}
+    # Growable int32/uint16/int64 buffers; no Python int object per entry
+    term_ids = array("i")
+    recipe_ids = array("i")
+    sizes = array("H")
+    recipe_offsets = array("q")
+
+    with open(os.path.join(output_dir, "recipes.jsonl"), "wb") as f:
+        for recipe_id, recipe in enumerate(recipes):
+            terms = recipe_terms(recipe.get(field) or [])
+            sizes.append(min(len(terms), np.iinfo(np.uint16).max))
+            term_ids.extend(vocab.setdefault(term, len(vocab)) for term in terms)
+            recipe_ids.extend([recipe_id] * len(terms))
+            recipe_offsets.append(f.tell())
+            record = {
+                "title": recipe.get("title", ""),
+                "ingredients": recipe.get("ingredients") or recipe.get(field) or [],
+                "directions": recipe.get("directions") or [],
+                "terms": terms,
+            }
+            f.write(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+
+    # Group (term, recipe) pairs by term; a stable sort keeps recipe ids ascending
+    term_array = np.frombuffer(term_ids, dtype=np.int32)
+    order = np.argsort(term_array, kind="stable")
+    postings = np.frombuffer(recipe_ids, dtype=np.int32)[order]
+    del order
+    offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(term_array, minlength=len(vocab)), out=offsets[1:])
+
+    np.save(os.path.join(output_dir, "offsets.npy"), offsets)
+    np.save(os.path.join(output_dir, "postings.npy"), postings)
+    np.save(os.path.join(output_dir, "sizes.npy"), np.frombuffer(sizes, dtype=np.uint16))
+    np.save(os.path.join(output_dir, "recipe_offsets.npy"), np.frombuffer(recipe_offsets, dtype=np.int64))
+    with open(os.path.join(output_dir, "vocab.json"), "w", encoding="utf-8") as f:
+        json.dump(sorted(vocab, key=vocab.get), f, ensure_ascii=False)
+
+    meta = {
+        "source": source,
+        "field": field,
+        "recipes": len(sizes),
+        "terms": len(vocab),
+        "postings": len(postings),
+        "build_seconds": round(time.perf_counter() - started, 3),
+    }
+    with open(os.path.join(output_dir, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=4)
+    return meta
+
+
+class RecipeIndex:
+    """
+    Read-only, memory-mapped ingredient index over the recipe corpus.
+
+    A search reads the postings of the request's terms, counts per recipe how
+    many of them it uses with one `bincount`, and scores the recipes sharing
+    enough of them in one vectorized pass. Only those postings and the
+    returned recipes are paged in from disk.
+
+    Args:
+        path: Directory written by `build_index`
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        with open(os.path.join(path, "vocab.json"), encoding="utf-8") as f:
+            self._term_ids = {term: i for i, term in enumerate(json.load(f))}
+        self._offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+        self._postings = np.load(os.path.join(path, "postings.npy"), mmap_mode="r")
+        self._sizes = np.load(os.path.join(path, "sizes.npy"), mmap_mode="r")
+        self._recipe_offsets = np.load(os.path.join(path, "recipe_offsets.npy"), mmap_mode="r")
+        self._recipes_file = open(os.path.join(path, "recipes.jsonl"), "rb")
+        self._recipes = mmap.mmap(self._recipes_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.searches = 0
+
+    def __len__(self) -> int:
+        return len(self._sizes)
+
+    def recipe(self, recipe_id: int) -> Dict[str, Any]:
+        """Load one corpus recipe by id."""
+        start = int(self._recipe_offsets[recipe_id])
+        end = self._recipes.find(b"\n", start)
+        return json.loads(self._recipes[start:end if end >= 0 else len(self._recipes)])
+
+    def search(self, ingredients: Iterable[str], k: int = 5, metric: str = COVERAGE,
+               min_overlap: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Top-`k` corpus recipes for an ingredient list, best first.
+
+        Args:
+            metric: "coverage" (share of the recipe's ingredients in the request)
+                or "jaccard" (overlap over union of both sets)
+            min_overlap: Fewest shared ingredients for a recipe to count;
+                defaults to 2, or 1 for single-ingredient requests
+
+        Returns:
+            Recipes with their `id`, `score`, and `matched` ingredient terms
+        """
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric {metric!r}, expected one of {METRICS}")
+        self.searches += 1
+        query = recipe_terms(ingredients)
+        known = [self._term_ids[term] for term in query if term in self._term_ids]
+        if not known or k <= 0:
+            return []
+        if min_overlap is None:
+            min_overlap = min(2, len(query))
+
+        # Overlap per recipe: how many of the request's postings list it
+        postings = np.concatenate([self._postings[self._offsets[t]:self._offsets[t + 1]] for t in known])
+        if len(postings) * SPARSE_QUERY_RATIO < len(self._sizes):
+            # Rare ingredients: count only the recipes listed, not a slot per corpus recipe
+            listed, counts = np.unique(postings, return_counts=True)
+            keep = np.flatnonzero(counts >= min_overlap)
+            candidates = listed[keep]
+        else:
+            counts = np.bincount(postings, minlength=len(self._sizes))
+            keep = candidates = np.flatnonzero(counts >= min_overlap)
+        if len(candidates) == 0:
+            return []
+
+        overlap = counts[keep].astype(np.float32)
+        sizes = np.maximum(self._sizes[candidates], 1).astype(np.float32)
+        if metric == COVERAGE:
+            scores = overlap / sizes
+        else:
+            scores = overlap / (len(query) + sizes - overlap)
+        # Among equal scores prefer the recipe using more of the request
+        ranking = scores + overlap * 1e-6
+        if len(candidates) > k:
+            top = np.argpartition(-ranking, k)[:k]
+        else:
+            top = np.arange(len(candidates))
+        top = top[np.argsort(-ranking[top], kind="stable")]
+
+        query_terms = set(query)
+        results = []
+        for i in top:
+            recipe = self.recipe(int(candidates[i]))
+            terms = recipe.pop("terms")
+            results.append({
+                "id": int(candidates[i]),
+                "score": round(float(scores[i]), 4),
+                "matched": [term for term in terms if term in query_terms],
+                **recipe,
+            })
+        return results
+
+    def close(self):
+        self._recipes.close()
+        self._recipes_file.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.meta, "searches": self.searches}
+
+
+def format_recipe(recipe: Dict[str, Any]) -> str:
+    """Render a corpus recipe the way the fine-tuning samples present one."""
+    directions = "\n".join(recipe.get("directions") or [])
+    return (
+        f"Using the given ingredients, you can cook the following dish: {recipe['title']}\n"
+        f"Here is how to prepare it:\n{directions}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the recipe ingredient index")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Build the index from a processed corpus")
+    build.add_argument("corpus", help="Processed recipes JSON (list of records); read incrementally")
+    build.add_argument("output", help="Index directory")
+    build.add_argument("--field", default="cleaned_ingredients", help="Record field with ingredient names")
+    search = commands.add_parser("search", help="Print the top matches for some ingredients")
+    search.add_argument("index", help="Index directory")
+    search.add_argument("ingredients", nargs="+")
+    search.add_argument("--k", type=int, default=5)
+    search.add_argument("--metric", default=COVERAGE, choices=METRICS)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        # Only the build needs the pipeline's reader; the backend itself never imports it
+        from src.utils.io_utils import iter_json_array
+
+        recipes = iter_json_array(args.corpus)
+        print(json.dumps(build_index(recipes, args.output, field=args.field, source=args.corpus), indent=4))
+    else:
+        index = RecipeIndex(args.index)
+        for hit in index.search(args.ingredients, k=args.k, metric=args.metric):
+            print(f"{hit['score']:.3f}  {hit['title']}  ({', '.join(hit['matched'])})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,390 @@
+"""Load balancing across several OpenAI-compatible upstreams."""
+
+import asyncio
+import random
+import time
+import weakref
+from typing import Any, Awaitable, Callable, List, Optional
+
+from openai import AsyncOpenAI
+from openai.types.chat import ChatCompletion, ChatCompletionMessage
+from openai.types.chat.chat_completion import Choice
+
+from .hedging import HedgePolicy
+from .tracing import span
+from .upstream import CircuitBreaker, CircuitOpenError, UpstreamClient, is_retryable, is_upstream_failure
+
+# Routing strategies
+LEAST_OUTSTANDING = "least_outstanding"
+EWMA = "ewma"
+STRATEGIES = (LEAST_OUTSTANDING, EWMA)
+
+
+class Replica:
+    """One upstream behind the router, with the load figures used to pick it."""
+
+    def __init__(self, client: UpstreamClient, name: Optional[str] = None, ewma_alpha: float = 0.3):
+        self.client = client
+        self.name = name or client.base_url
+        self.ewma_alpha = ewma_alpha
+        self.outstanding = 0
+        # EWMA of seconds until the upstream answered (headers, for streams)
+        self.latency: Optional[float] = None
+        self.requests = 0
+        self.failures = 0
+
+    @property
+    def available(self) -> bool:
+        """False while the replica's circuit breaker has it ejected."""
+        return self.client.breaker.allows_call()
+
+    def observe(self, latency: float):
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += self.ewma_alpha * (latency - self.latency)
+
+    def cost(self, strategy: str) -> float:
+        if strategy == EWMA:
+            # Expected wait: typical latency times the requests queued in front.
+            # Replicas without a sample yet cost nothing, so they get tried.
+            return (self.latency or 0.0) * (self.outstanding + 1)
+        return self.outstanding
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "available": self.available,
+            "circuit": self.client.breaker.state,
+            "outstanding": self.outstanding,
+            "latency_ewma_s": round(self.latency, 4) if self.latency is not None else None,
+            "requests": self.requests,
+            "failures": self.failures,
+        }
+
+
+class _RoutedStream:
+    """
+    A streamed completion that counts against its replica until closed.
+
+    Proxies the OpenAI `AsyncStream`; the outstanding count is also released
+    if the stream is garbage collected without being closed.
+    """
+
+    def __init__(self, stream, replica: Replica):
+        self._stream = stream
+        self._finalizer = weakref.finalize(self, _release_replica, replica)
+
+    def __aiter__(self):
+        return self._stream.__aiter__()
+
+    async def close(self):
+        try:
+            await self._stream.close()
+        finally:
+            self._finalizer()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+def _release_replica(replica: Replica):
+    replica.outstanding -= 1
+
+
+# First chunk of a stream that ended without any
+_EMPTY = object()
+
+
+class _PrimedStream:
+    """A stream whose first chunk was read ahead to see when it arrived; replays it first."""
+
+    def __init__(self, stream, iterator, first):
+        self._stream = stream
+        self._iterator = iterator
+        self._first = first
+
+    async def __aiter__(self):
+        if self._first is not _EMPTY:
+            yield self._first
+        async for chunk in self._iterator:
+            yield chunk
+
+    async def close(self):
+        await self._stream.close()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+async def _collect_completion(stream) -> ChatCompletion:
+    """Assemble a streamed chat completion into the response a non-streamed call returns."""
+    first = None
+    parts = []
+    finish_reason = None
+    usage = None
+    try:
+        async for chunk in stream:
+            first = first or chunk
+            if chunk.usage is not None:
+                usage = chunk.usage
+            for choice in chunk.choices:
+                if choice.delta.content:
+                    parts.append(choice.delta.content)
+                if choice.finish_reason:
+                    finish_reason = choice.finish_reason
+    finally:
+        await stream.close()
+    return ChatCompletion(
+        id=first.id if first else "",
+        object="chat.completion",
+        created=first.created if first else int(time.time()),
+        model=first.model if first else "",
+        choices=[Choice(
+            index=0,
+            finish_reason=finish_reason or "stop",
+            message=ChatCompletionMessage(role="assistant", content="".join(parts))
+        )],
+        usage=usage
+    )
+
+
+class UpstreamRouter:
+    """
+    Spreads calls over several upstreams serving the same model.
+
+    Each call goes to the available replica with the lowest cost: the fewest
+    outstanding requests (`least_outstanding`), or the lowest EWMA latency
+    scaled by outstanding requests (`ewma`); ties are broken at random.
+    Streams count as outstanding until they are closed.
+
+    Each replica keeps its own circuit breaker, which ejects it after
+    repeated failures and re-admits it through a half-open trial call.
+    Retryable failures fail over to another replica straight away; backoff
+    only applies once every available replica has been tried. Exposes the
+    same calling interface as `UpstreamClient`.
+
+    Args:
+        replicas: The upstream clients to balance over
+        strategy: "least_outstanding" or "ewma"
+        max_retries: Retries per call, across replicas
+    """
+
+    def __init__(self, replicas: List[UpstreamClient], strategy: str = LEAST_OUTSTANDING,
+                 max_retries: int = 2, backoff_base: float = 0.5, backoff_max: float = 8.0):
+        if not replicas:
+            raise ValueError("At least one upstream is required")
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown routing strategy {strategy!r}, expected one of {STRATEGIES}")
+        self.replicas = [Replica(client) for client in replicas]
+        self.strategy = strategy
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retries = 0
+
+    async def start(self):
+        for replica in self.replicas:
+            await replica.client.start()
+
+    async def aclose(self):
+        for replica in self.replicas:
+            await replica.client.aclose()
+
+    @property
+    def last_success_at(self) -> Optional[float]:
+        times = [r.client.last_success_at for r in self.replicas if r.client.last_success_at is not None]
+        return max(times) if times else None
+
+    @property
+    def circuit_state(self) -> str:
+        """"open" when every replica is ejected, "closed" when none is, else "degraded"."""
+        states = [r.client.breaker.state for r in self.replicas]
+        if all(state == CircuitBreaker.CLOSED for state in states):
+            return CircuitBreaker.CLOSED
+        if not any(r.available for r in self.replicas):
+            return CircuitBreaker.OPEN
+        return "degraded"
+
+    @property
+    def rejected(self) -> int:
+        return sum(r.client.breaker.rejected for r in self.replicas)
+
+    def _pick(self, tried: set) -> Replica:
+        available = [r for r in self.replicas if r.available]
+        if not available:
+            raise CircuitOpenError(min(r.client.breaker.retry_after() for r in self.replicas))
+        candidates = [r for r in available if r not in tried] or available
+        return min(candidates, key=lambda r: (r.cost(self.strategy), random.random()))
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def call(self, fn: Callable[[AsyncOpenAI], Awaitable[Any]], max_retries: Optional[int] = None,
+                   stream: bool = False, used: Optional[set] = None, avoid: Optional[set] = None) -> Any:
+        """
+        Run `fn(client)` on the best replica, failing over on retryable errors.
+
+        Args:
+            max_retries: Overrides the configured retry bound for this call
+            stream: The result is a stream; keep the replica busy until it is closed
+            used: Filled with the replicas the call is sent to
+            avoid: Replicas to pass over while any other is available
+        """
+        if max_retries is None:
+            max_retries = self.max_retries
+        attempt = 0
+        tried: set = set(avoid or ())
+        while True:
+            replica = self._pick(tried)
+            if used is not None:
+                used.add(replica)
+            replica.outstanding += 1
+            replica.requests += 1
+            started = time.perf_counter()
+            try:
+                # Retries happen here, so they can move to another replica
+                with span("upstream.attempt", replica=replica.name, attempt=attempt):
+                    result = await replica.client.call(fn, max_retries=0)
+            except BaseException as e:
+                replica.outstanding -= 1
+                if not isinstance(e, Exception):
+                    raise
+                if is_upstream_failure(e):
+                    replica.failures += 1
+                if attempt >= max_retries or not (is_retryable(e) or isinstance(e, CircuitOpenError)):
+                    raise
+                tried.add(replica)
+                if all(r in tried for r in self.replicas if r.available):
+                    await asyncio.sleep(self._backoff(attempt))
+                    tried.clear()
+                self.retries += 1
+                attempt += 1
+                continue
+            replica.observe(time.perf_counter() - started)
+            if stream:
+                return _RoutedStream(result, replica)
+            replica.outstanding -= 1
+            return result
+
+    async def _open_primed(self, fn: Callable[[AsyncOpenAI], Awaitable[Any]], **call_kwargs) -> _PrimedStream:
+        """Open a stream with `call` and wait for its first chunk."""
+        stream = await self.call(fn, stream=True, **call_kwargs)
+        iterator = stream.__aiter__()
+        try:
+            first = await iterator.__anext__()
+        except StopAsyncIteration:
+            first = _EMPTY
+        except BaseException:
+            await stream.close()
+            raise
+        return _PrimedStream(stream, iterator, first)
+
+    async def call_hedged(self, fn: Callable[[AsyncOpenAI], Awaitable[Any]], policy: HedgePolicy,
+                          stream: bool = False, first_chunk: bool = False) -> Any:
+        """
+        Like `call`, but send a duplicate if no answer arrives within the policy's delay.
+
+        The first call to succeed wins and the other is cancelled (a stream
+        it already opened is closed). If one fails, the other is still
+        awaited; the primary's error is raised only if both fail.
+
+        The policy learns the latency of each attempt that succeeds, plus the
+        time a still-running primary had taken when the hedge beat it.
+
+        Args:
+            first_chunk: `fn` opens a stream; the race (and the latency the
+                policy learns) is up to its first chunk, i.e. time to first token
+        """
+        def attempt(**call_kwargs):
+            if first_chunk:
+                return self._open_primed(fn, **call_kwargs)
+            return self.call(fn, stream=stream, **call_kwargs)
+
+        opens_stream = stream or first_chunk
+        policy.start_call()
+        started = time.perf_counter()
+        delay = policy.delay
+        used: set = set()
+        primary = asyncio.ensure_future(attempt(used=used))
+        if delay is None:
+            result = await primary
+            policy.observe(time.perf_counter() - started)
+            return result
+
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+        except BaseException:
+            primary.cancel()
+            raise
+        if primary in done or not policy.try_hedge():
+            result = await primary
+            policy.observe(time.perf_counter() - started)
+            return result
+
+        hedge_started = time.perf_counter()
+        hedge = asyncio.ensure_future(attempt(avoid=used if policy.other_upstream else None))
+        pending = {primary, hedge}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = next((task for task in done if task.exception() is None), None)
+                if winner is not None:
+                    finished = time.perf_counter()
+                    if winner is hedge:
+                        policy.hedge_wins += 1
+                        policy.observe(finished - hedge_started)
+                        if primary in pending:
+                            # The primary is cut short, but it took at least this long; leaving it
+                            # out would teach the policy only the fast calls and lower the delay
+                            policy.observe(finished - started)
+                    else:
+                        policy.observe(finished - started)
+                    # Both may have finished together; a second open stream must be closed too
+                    for task in done - {winner}:
+                        if opens_stream and task.exception() is None:
+                            await task.result().close()
+                    return winner.result()
+            raise primary.exception() or hedge.exception()
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    async def create_chat_completion(self, hedge: Optional[HedgePolicy] = None, **kwargs):
+        """
+        `chat.completions.create` on the best replica.
+
+        Args:
+            hedge: Hedge the call under this policy, on time to first token.
+                A non-streamed call is streamed internally so the first token
+                can be seen, then assembled into the usual response.
+        """
+        if hedge is not None:
+            streamed = bool(kwargs.get("stream"))
+            if not streamed:
+                kwargs = dict(kwargs, stream=True, stream_options={"include_usage": True})
+            result = await self.call_hedged(
+                lambda client: client.chat.completions.create(**kwargs),
+                hedge,
+                first_chunk=True
+            )
+            return result if streamed else await _collect_completion(result)
+        return await self.call(
+            lambda client: client.chat.completions.create(**kwargs),
+            stream=bool(kwargs.get("stream"))
+        )
+
+    async def list_models(self, retry: bool = True) -> List[str]:
+        """Ids of the models served by the upstreams."""
+        models = await self.call(lambda client: client.models.list(), max_retries=None if retry else 0)
+        return [model.id for model in models.data]
+
+    def stats(self) -> dict:
+        return {
+            "strategy": self.strategy,
+            "circuit": self.circuit_state,
+            "retries": self.retries,
+            "replicas": [replica.stats() for replica in self.replicas],
+        }
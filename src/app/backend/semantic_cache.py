@@ -0,0 +1,290 @@
+"""
+Near-duplicate cache for recipe requests.
+
+Ingredient sets are embedded on the CPU with hashed word and character
+trigram features (no model involved) and kept in a compact array-backed
+index, so "chicken, rice, garlic" can be served the recipe generated for
+"Garlic, chopped chicken, rices". Only spellings of the same ingredients
+match: a set with an ingredient added, dropped or swapped (an allergen, say)
+never gets another set's recipe, however similar the vectors are.
+"""
+
+import math
+import re
+import time
+import zlib
+from collections import OrderedDict
+from functools import lru_cache
+from itertools import islice
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from .cache import canonical_ingredients
+
+# Words that describe an ingredient rather than name it count for less
+DESCRIPTORS = frozenset({
+    "fresh", "frozen", "dried", "chopped", "diced", "minced", "sliced", "grated", "shredded",
+    "large", "small", "medium", "organic", "raw", "whole", "boneless", "skinless", "ripe",
+})
+DESCRIPTOR_WEIGHT = 0.3
+# Share of a word's weight carried by its character trigrams (catches plurals and typos)
+TRIGRAM_WEIGHT = 0.5
+
+
+def singularize(word: str) -> str:
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 4 and word.endswith("oes"):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def ingredient_words(ingredients: Iterable[str]) -> List[str]:
+    """Sorted, singularized words of the canonical ingredient set."""
+    words = set()
+    for ingredient in canonical_ingredients(ingredients):
+        for word in re.findall(r"[a-z0-9]+", ingredient):
+            words.add(singularize(word))
+    return sorted(words)
+
+
+def ingredient_set(ingredients: Iterable[str]) -> FrozenSet[str]:
+    """
+    The ingredients with spelling differences removed: singular words, no descriptors, sorted.
+
+    Two requests name the same ingredients exactly when their sets are equal.
+    """
+    names = set()
+    for ingredient in canonical_ingredients(ingredients):
+        words = sorted(
+            singularize(word) for word in re.findall(r"[a-z0-9]+", ingredient)
+            if singularize(word) not in DESCRIPTORS
+        )
+        if words:
+            names.add(" ".join(words))
+    return frozenset(names)
+
+
+def _feature_index(feature: str, dim: int) -> Tuple[int, float]:
+    digest = zlib.crc32(feature.encode("utf-8"))
+    return digest % dim, (-1.0 if digest & 0x80000000 else 1.0)
+
+
+@lru_cache(maxsize=65536)
+def _word_features(word: str, dim: int) -> Tuple[Tuple[int, float], ...]:
+    """Signed hashed features of one word, before its descriptor weighting."""
+    features = [_feature_index("w:" + word, dim)]
+    padded = f"<{word}>"
+    grams = [padded[i:i + 3] for i in range(len(padded) - 2)]
+    each = TRIGRAM_WEIGHT / math.sqrt(len(grams))
+    for gram in grams:
+        index, sign = _feature_index("c:" + gram, dim)
+        features.append((index, sign * each))
+    return tuple(features)
+
+
+def embed_words(words: List[str], dim: int, max_features: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Embed a word set as a sparse, L2-normalized hashed feature vector.
+
+    Returns `(indices, values)`, keeping at most `max_features` of the
+    largest-magnitude features.
+    """
+    weights: Dict[int, float] = {}
+    for word in words:
+        scale = DESCRIPTOR_WEIGHT if word in DESCRIPTORS else 1.0
+        for index, value in _word_features(word, dim):
+            weights[index] = weights.get(index, 0.0) + scale * value
+    indices = np.fromiter(weights.keys(), dtype=np.int64, count=len(weights))
+    values = np.fromiter(weights.values(), dtype=np.float32, count=len(weights))
+    if len(values) > max_features:
+        keep = np.argpartition(-np.abs(values), max_features)[:max_features]
+        indices, values = indices[keep], values[keep]
+    norm = float(np.linalg.norm(values))
+    if norm > 0:
+        values /= norm
+    return indices, values
+
+
+class SemanticCache:
+    """
+    Serve a prior recipe when a new request's ingredients are close enough.
+
+    Each entry's sparse vector is stored in fixed-width rows of two NumPy
+    arrays (feature indices and weights). A lookup does not scan the whole
+    index: entries are posted under each of their words, and only the
+    postings of the query's rarest words are probed (prefix filtering; an
+    entry sharing none of them shares too few words to reach the threshold).
+    The surviving candidates are scored with one vectorized gather, and only
+    those naming the same ingredients as the query (`ingredient_set`) may be
+    served, so similarity ranks spellings but never substitutes an ingredient. At most
+    `max_candidates` entries are scored, so a query made only of very common
+    words trades some recall for bounded latency.
+
+    Entries only match requests with the same context (model, sampling
+    parameters and instructions). Bounded by `max_entries` with LRU eviction
+    and a TTL.
+
+    Args:
+        threshold: Minimum cosine similarity to serve a cached recipe
+        dim: Hashed feature space size
+        max_features: Features kept per entry (row width)
+        max_candidates: Upper bound on entries scored per lookup
+    """
+
+    def __init__(self, max_entries: int = 100_000, ttl_seconds: float = 3600.0, threshold: float = 0.85,
+                 dim: int = 4096, max_features: int = 64, max_candidates: int = 1024):
+        if dim > np.iinfo(np.uint16).max + 1:
+            raise ValueError("dim must fit in uint16 indices")
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self.dim = dim
+        self.max_features = max_features
+        self.max_candidates = max_candidates
+        self._capacity = 0
+        self._indices = np.zeros((0, max_features), dtype=np.uint16)
+        self._values = np.zeros((0, max_features), dtype=np.float32)
+        self._expires = np.zeros(0, dtype=np.float64)
+        self._payloads: List[Optional[Dict[str, Any]]] = []
+        self._row_keys: List[Optional[Tuple[str, Tuple[str, ...]]]] = []
+        self._row_sets: List[Optional[FrozenSet[str]]] = []
+        self._free: List[int] = []
+        self._lru: "OrderedDict[int, None]" = OrderedDict()
+        self._by_key: Dict[Tuple[str, Tuple[str, ...]], int] = {}
+        self._postings: Dict[Tuple[str, str], Set[int]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._lru)
+
+    def _grow(self):
+        """Double the row capacity, up to `max_entries`."""
+        new_capacity = min(self.max_entries, max(1024, self._capacity * 2))
+        extra = new_capacity - self._capacity
+        self._indices = np.vstack([self._indices, np.zeros((extra, self.max_features), dtype=np.uint16)])
+        self._values = np.vstack([self._values, np.zeros((extra, self.max_features), dtype=np.float32)])
+        self._expires = np.concatenate([self._expires, np.zeros(extra, dtype=np.float64)])
+        self._payloads.extend([None] * extra)
+        self._row_keys.extend([None] * extra)
+        self._row_sets.extend([None] * extra)
+        self._free.extend(range(new_capacity - 1, self._capacity - 1, -1))
+        self._capacity = new_capacity
+
+    def _release(self, row: int):
+        context, words = self._row_keys[row]
+        for word in words:
+            posting = self._postings.get((context, word))
+            if posting is not None:
+                posting.discard(row)
+                if not posting:
+                    del self._postings[(context, word)]
+        del self._by_key[(context, words)]
+        self._lru.pop(row, None)
+        self._payloads[row] = None
+        self._row_keys[row] = None
+        self._row_sets[row] = None
+        self._values[row] = 0.0
+        self._free.append(row)
+
+    def _allocate(self) -> int:
+        if not self._free:
+            if self._capacity < self.max_entries:
+                self._grow()
+            else:
+                oldest = next(iter(self._lru))
+                self._release(oldest)
+                self.evictions += 1
+        return self._free.pop()
+
+    def lookup(self, context: str, ingredients: Iterable[str]) -> Optional[Tuple[Dict[str, Any], float]]:
+        """Return `(value, similarity)` of the closest live entry above the threshold, or None."""
+        ingredients = list(ingredients)
+        names = ingredient_set(ingredients)
+        words = ingredient_words(ingredients)
+        if not words:
+            self.misses += 1
+            return None
+
+        # Probe the rarest words; words never seen before have empty postings
+        by_rarity = sorted(words, key=lambda w: len(self._postings.get((context, w), ())))
+        probe = len(words) - math.floor(self.threshold * len(words)) + 1
+        candidates: Set[int] = set()
+        for word in by_rarity[:probe]:
+            room = self.max_candidates - len(candidates)
+            if room <= 0:
+                break
+            candidates.update(islice(self._postings.get((context, word), ()), room))
+        if not candidates:
+            self.misses += 1
+            return None
+
+        rows = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+        rows = rows[self._expires[rows] >= time.monotonic()]
+        rows = rows[[self._row_sets[row] == names for row in rows]] if len(rows) else rows
+        if len(rows) == 0:
+            self.misses += 1
+            return None
+
+        indices, values = embed_words(words, self.dim, self.max_features)
+        query = np.zeros(self.dim, dtype=np.float32)
+        query[indices] = values
+        scores = (self._values[rows] * query[self._indices[rows]]).sum(axis=1)
+        best = int(np.argmax(scores))
+        similarity = float(scores[best])
+        if similarity < self.threshold:
+            self.misses += 1
+            return None
+
+        row = int(rows[best])
+        self._lru.move_to_end(row)
+        self.hits += 1
+        return self._payloads[row], similarity
+
+    def add(self, context: str, ingredients: Iterable[str], value: Dict[str, Any]):
+        """Index `value` under the request's ingredient set, replacing an identical set."""
+        ingredients = list(ingredients)
+        words = tuple(ingredient_words(ingredients))
+        if not words or self.max_entries <= 0:
+            return
+        key = (context, words)
+        existing = self._by_key.get(key)
+        if existing is not None:
+            self._release(existing)
+
+        row = self._allocate()
+        indices, values = embed_words(list(words), self.dim, self.max_features)
+        self._indices[row, :len(indices)] = indices
+        self._indices[row, len(indices):] = 0
+        self._values[row, :len(values)] = values
+        self._values[row, len(values):] = 0.0
+        self._expires[row] = time.monotonic() + self.ttl_seconds
+        self._payloads[row] = value
+        self._row_keys[row] = key
+        self._row_sets[row] = ingredient_set(ingredients)
+        self._by_key[key] = row
+        self._lru[row] = None
+        for word in words:
+            self._postings.setdefault((context, word), set()).add(row)
+
+    def clear(self):
+        for row in list(self._lru):
+            self._release(row)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._lru),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "index_bytes": self._indices.nbytes + self._values.nbytes + self._expires.nbytes,
+        }
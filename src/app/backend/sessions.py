@@ -0,0 +1,332 @@
+"""Server-side chat session storage."""
+
+import asyncio
+import json
+import os
+import sqlite3
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+# Rough per-message bookkeeping overhead (dict, strings, list slot)
+MESSAGE_OVERHEAD_BYTES = 200
+
+
+class SessionTooLargeError(Exception):
+    """A session would outgrow the per-session size limit."""
+
+
+def message_size(message: dict) -> int:
+    """Approximate in-memory footprint of a chat message."""
+    return len(message.get("content") or "") + len(message.get("role") or "") + MESSAGE_OVERHEAD_BYTES
+
+
+class SessionStore:
+    """Interface for chat session stores."""
+
+    async def create(self, messages: Optional[List[dict]] = None) -> str:
+        raise NotImplementedError
+
+    async def get(self, session_id: str) -> Optional[List[dict]]:
+        """Return the session's messages, or None if it does not exist or expired."""
+        raise NotImplementedError
+
+    async def append(self, session_id: str, messages: List[dict]) -> bool:
+        """Append messages to a session; returns False if the session is gone."""
+        raise NotImplementedError
+
+    async def delete(self, session_id: str) -> bool:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+    def close(self):
+        pass
+
+
+class _Session:
+    __slots__ = ("messages", "size", "last_access")
+
+    def __init__(self, messages: List[dict]):
+        self.messages = messages
+        self.size = sum(message_size(m) for m in messages)
+        self.last_access = time.monotonic()
+
+
+class InMemorySessionStore(SessionStore):
+    """
+    Sessions kept in process memory, ordered by last access.
+
+    Idle sessions are evicted lazily: because the order is by last access,
+    expired sessions always sit at the front and are dropped on the next
+    write. A global byte budget evicts the least recently used sessions
+    first when exceeded; the session being written is never evicted by its
+    own write. A session that would outgrow `max_session_bytes` is rejected
+    with `SessionTooLargeError` before anything is stored.
+    """
+
+    def __init__(self, idle_ttl_seconds: float = 1800.0, max_sessions: int = 10000,
+                 max_bytes: int = 128 * 1024 * 1024, max_session_bytes: int = 1024 * 1024):
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.max_session_bytes = min(max_session_bytes, max_bytes)
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._bytes = 0
+        self.evicted_idle = 0
+        self.evicted_capacity = 0
+
+    def _drop(self, session_id: str):
+        session = self._sessions.pop(session_id)
+        self._bytes -= session.size
+
+    def _evict(self, keep: str):
+        """Drop expired sessions, then the least recently used ones over budget, sparing `keep`."""
+        cutoff = time.monotonic() - self.idle_ttl_seconds
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session.last_access >= cutoff or session_id == keep:
+                break
+            self._drop(session_id)
+            self.evicted_idle += 1
+        while len(self._sessions) > 1 and (len(self._sessions) > self.max_sessions or self._bytes > self.max_bytes):
+            session_id = next(iter(self._sessions))
+            if session_id == keep:
+                self._sessions.move_to_end(keep)
+                session_id = next(iter(self._sessions))
+            self._drop(session_id)
+            self.evicted_capacity += 1
+
+    def _check_size(self, size: int):
+        if size > self.max_session_bytes:
+            raise SessionTooLargeError(
+                f"Session would use {size} bytes, over the {self.max_session_bytes} byte limit; start a new session"
+            )
+
+    def _touch(self, session_id: str) -> Optional[_Session]:
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+        if session.last_access < time.monotonic() - self.idle_ttl_seconds:
+            self._drop(session_id)
+            self.evicted_idle += 1
+            return None
+        session.last_access = time.monotonic()
+        self._sessions.move_to_end(session_id)
+        return session
+
+    async def create(self, messages: Optional[List[dict]] = None) -> str:
+        session = _Session(list(messages or []))
+        self._check_size(session.size)
+        session_id = uuid.uuid4().hex
+        self._sessions[session_id] = session
+        self._bytes += session.size
+        self._evict(keep=session_id)
+        return session_id
+
+    async def get(self, session_id: str) -> Optional[List[dict]]:
+        session = self._touch(session_id)
+        return list(session.messages) if session is not None else None
+
+    async def append(self, session_id: str, messages: List[dict]) -> bool:
+        session = self._touch(session_id)
+        if session is None:
+            return False
+        added = sum(message_size(m) for m in messages)
+        self._check_size(session.size + added)
+        session.messages.extend(messages)
+        session.size += added
+        self._bytes += added
+        self._evict(keep=session_id)
+        return True
+
+    async def delete(self, session_id: str) -> bool:
+        if session_id not in self._sessions:
+            return False
+        self._drop(session_id)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "memory",
+            "sessions": len(self._sessions),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "max_session_bytes": self.max_session_bytes,
+            "evicted_idle": self.evicted_idle,
+            "evicted_capacity": self.evicted_capacity,
+        }
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Sessions persisted to a local SQLite file; survives backend restarts.
+
+    Enforces the same limits as `InMemorySessionStore`, measured with the same
+    `message_size` estimate: a session that would outgrow `max_session_bytes`
+    is rejected with `SessionTooLargeError`, and past `max_sessions` or
+    `max_bytes` the least recently used sessions are deleted. Here the byte
+    budget bounds the database rather than process memory.
+    """
+
+    def __init__(self, path: str, idle_ttl_seconds: float = 1800.0, max_sessions: int = 10000,
+                 max_bytes: int = 128 * 1024 * 1024, max_session_bytes: int = 1024 * 1024):
+        dir_path = os.path.dirname(path)
+        if dir_path:
+            os.makedirs(dir_path, exist_ok=True)
+        self.path = path
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.max_session_bytes = min(max_session_bytes, max_bytes)
+        self.evicted_capacity = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "  session_id TEXT PRIMARY KEY, last_access REAL NOT NULL, size INTEGER NOT NULL DEFAULT 0);"
+            "CREATE INDEX IF NOT EXISTS sessions_last_access ON sessions (last_access);"
+            "CREATE TABLE IF NOT EXISTS messages ("
+            "  session_id TEXT NOT NULL, seq INTEGER NOT NULL, message TEXT NOT NULL,"
+            "  PRIMARY KEY (session_id, seq));"
+        )
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(sessions)")]
+        if "size" not in columns:
+            # Databases written before sizes were tracked
+            self._conn.execute("ALTER TABLE sessions ADD COLUMN size INTEGER NOT NULL DEFAULT 0")
+            sizes: Dict[str, int] = {}
+            for session_id, message in self._conn.execute("SELECT session_id, message FROM messages"):
+                sizes[session_id] = sizes.get(session_id, 0) + message_size(json.loads(message))
+            self._conn.executemany(
+                "UPDATE sessions SET size = ? WHERE session_id = ?",
+                [(size, session_id) for session_id, size in sizes.items()],
+            )
+        self._conn.commit()
+        self._lock = asyncio.Lock()
+
+    def _expire(self):
+        cutoff = time.time() - self.idle_ttl_seconds
+        self._conn.execute(
+            "DELETE FROM messages WHERE session_id IN "
+            "(SELECT session_id FROM sessions WHERE last_access < ?)", (cutoff,)
+        )
+        self._conn.execute("DELETE FROM sessions WHERE last_access < ?", (cutoff,))
+
+    def _evict(self, keep: str):
+        """Delete the least recently used sessions over the count or byte budget, sparing `keep`."""
+        count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM sessions").fetchone()
+        if count <= self.max_sessions and total <= self.max_bytes:
+            return
+        victims = []
+        rows = self._conn.execute(
+            "SELECT session_id, size FROM sessions WHERE session_id != ? ORDER BY last_access", (keep,)
+        )
+        for session_id, size in rows:
+            if count <= self.max_sessions and total <= self.max_bytes:
+                break
+            victims.append((session_id,))
+            count -= 1
+            total -= size
+        self._conn.executemany("DELETE FROM messages WHERE session_id = ?", victims)
+        self._conn.executemany("DELETE FROM sessions WHERE session_id = ?", victims)
+        self.evicted_capacity += len(victims)
+
+    def _check_size(self, size: int):
+        if size > self.max_session_bytes:
+            raise SessionTooLargeError(
+                f"Session would use {size} bytes, over the {self.max_session_bytes} byte limit; start a new session"
+            )
+
+    def _alive(self, session_id: str) -> Optional[int]:
+        """The session's size if it exists and has not expired, else None."""
+        row = self._conn.execute(
+            "SELECT last_access, size FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row is None or row[0] < time.time() - self.idle_ttl_seconds:
+            return None
+        return row[1]
+
+    def _insert(self, session_id: str, messages: List[dict], size: int):
+        row = self._conn.execute(
+            "SELECT COALESCE(MAX(seq), -1) FROM messages WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        start = row[0] + 1
+        self._conn.executemany(
+            "INSERT INTO messages (session_id, seq, message) VALUES (?, ?, ?)",
+            [(session_id, start + i, json.dumps(m)) for i, m in enumerate(messages)],
+        )
+        self._conn.execute(
+            "UPDATE sessions SET last_access = ?, size = ? WHERE session_id = ?", (time.time(), size, session_id)
+        )
+
+    def _create(self, messages: List[dict]) -> str:
+        size = sum(message_size(m) for m in messages)
+        self._check_size(size)
+        self._expire()
+        session_id = uuid.uuid4().hex
+        self._conn.execute(
+            "INSERT INTO sessions (session_id, last_access) VALUES (?, ?)", (session_id, time.time())
+        )
+        self._insert(session_id, messages, size)
+        self._evict(keep=session_id)
+        self._conn.commit()
+        return session_id
+
+    def _get(self, session_id: str) -> Optional[List[dict]]:
+        if self._alive(session_id) is None:
+            return None
+        rows = self._conn.execute(
+            "SELECT message FROM messages WHERE session_id = ? ORDER BY seq", (session_id,)
+        ).fetchall()
+        self._conn.execute(
+            "UPDATE sessions SET last_access = ? WHERE session_id = ?", (time.time(), session_id)
+        )
+        self._conn.commit()
+        return [json.loads(row[0]) for row in rows]
+
+    def _append(self, session_id: str, messages: List[dict]) -> bool:
+        size = self._alive(session_id)
+        if size is None:
+            return False
+        size += sum(message_size(m) for m in messages)
+        self._check_size(size)
+        self._insert(session_id, messages, size)
+        self._evict(keep=session_id)
+        self._conn.commit()
+        return True
+
+    def _delete(self, session_id: str) -> bool:
+        self._conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+        deleted = self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,)).rowcount
+        self._conn.commit()
+        return deleted > 0
+
+    async def create(self, messages: Optional[List[dict]] = None) -> str:
+        async with self._lock:
+            return await asyncio.to_thread(self._create, list(messages or []))
+
+    async def get(self, session_id: str) -> Optional[List[dict]]:
+        async with self._lock:
+            return await asyncio.to_thread(self._get, session_id)
+
+    async def append(self, session_id: str, messages: List[dict]) -> bool:
+        async with self._lock:
+            return await asyncio.to_thread(self._append, session_id, messages)
+
+    async def delete(self, session_id: str) -> bool:
+        async with self._lock:
+            return await asyncio.to_thread(self._delete, session_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            "max_bytes": self.max_bytes,
+            "max_session_bytes": self.max_session_bytes,
+            "evicted_capacity": self.evicted_capacity,
+        }
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,67 @@
+"""In-flight coalescing of identical concurrent upstream calls."""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Share one upstream call between concurrent callers with the same key.
+
+    The first caller for a key starts the call as a separate task; later
+    callers await the same task. Each caller waits through `asyncio.shield`,
+    so a disconnecting client only cancels its own wait. The shared call is
+    cancelled once the last waiter has gone away.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    def _forget(self, key: str, task: asyncio.Task):
+        flight = self._flights.get(key)
+        if flight is not None and flight.task is task:
+            del self._flights[key]
+        # Mark the exception as retrieved when nobody was left to await it
+        if not task.cancelled():
+            task.exception()
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run `fn()` for `key`, or join the identical call already in flight."""
+        flight = self._flights.get(key)
+        if flight is None:
+            task = asyncio.ensure_future(fn())
+            flight = _Flight(task)
+            self._flights[key] = flight
+            task.add_done_callback(lambda t: self._forget(key, t))
+            self.executions += 1
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "upstream_calls": self.executions,
+            "upstream_calls_saved": self.coalesced,
+        }
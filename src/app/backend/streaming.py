@@ -0,0 +1,147 @@
+"""Streaming helpers: incremental think-tag stripping and server-sent events."""
+
+import json
+import time
+from typing import Any, AsyncIterator, Dict, Optional
+
+THINK_OPEN = "<think>"
+THINK_CLOSE = "</think>"
+
+
+def _partial_tag(text: str, tag: str) -> int:
+    """Length of the longest suffix of `text` that could be the start of `tag`."""
+    for size in range(min(len(text), len(tag) - 1), 0, -1):
+        if tag.startswith(text[-size:]):
+            return size
+    return 0
+
+
+def strip_think(text: str) -> str:
+    """
+    Remove the reasoning section from a complete model response.
+
+    The reasoning ends at the first `</think>`, whether or not the response
+    opened it with `<think>` (some chat templates put the opening tag in the
+    prompt); stray closing tags after it are removed. A `<think>` block that
+    is never closed is all reasoning. `ThinkTagStripper` applies the same
+    rule to a stream.
+    """
+    if THINK_CLOSE in text:
+        return text.split(THINK_CLOSE, 1)[1].lstrip().replace(THINK_CLOSE, "")
+    if text.lstrip().startswith(THINK_OPEN):
+        return ""
+    return text
+
+
+class ThinkTagStripper:
+    """
+    Incremental version of `strip_think` for streamed responses.
+
+    Chunks are fed in as the upstream emits them and only the visible part of
+    the answer is returned; for any chunking, the concatenated output equals
+    `strip_think` of the whole response. Tags split across chunk boundaries
+    are handled by holding back the few characters that could still start a
+    tag. A response that does not open with `<think>` may still be reasoning
+    whose opening tag was in the prompt, so it is held back until a
+    `</think>` shows up or the stream ends.
+    """
+
+    PENDING = "pending"
+    REASONING = "reasoning"
+    UNOPENED = "unopened"
+    ANSWER_START = "answer_start"
+    VISIBLE = "visible"
+
+    def __init__(self):
+        self.state = self.PENDING
+        self._buffer = ""
+
+    def feed(self, chunk: str) -> str:
+        """Consume a chunk and return the text that should be shown."""
+        self._buffer += chunk
+
+        if self.state == self.PENDING:
+            head = self._buffer.lstrip()
+            if head.startswith(THINK_OPEN):
+                self.state = self.REASONING
+                self._buffer = head[len(THINK_OPEN):]
+            elif THINK_OPEN.startswith(head):
+                # Still could be the opening tag; wait for more
+                return ""
+            else:
+                self.state = self.UNOPENED
+
+        if self.state in (self.REASONING, self.UNOPENED):
+            end = self._buffer.find(THINK_CLOSE)
+            if end == -1:
+                if self.state == self.REASONING:
+                    # Keep only what could be the start of a split closing tag
+                    self._buffer = self._buffer[-(len(THINK_CLOSE) - 1):]
+                return ""
+            self._buffer = self._buffer[end + len(THINK_CLOSE):]
+            self.state = self.ANSWER_START
+
+        if self.state == self.ANSWER_START:
+            self._buffer = self._buffer.lstrip()
+            if not self._buffer:
+                return ""
+            self.state = self.VISIBLE
+
+        # Drop stray closing tags, holding back one that may be split across chunks
+        self._buffer = self._buffer.replace(THINK_CLOSE, "")
+        held = _partial_tag(self._buffer, THINK_CLOSE)
+        visible = self._buffer[:len(self._buffer) - held]
+        self._buffer = self._buffer[len(self._buffer) - held:]
+        return visible
+
+    def flush(self) -> str:
+        """Return any held-back visible text at the end of the stream."""
+        visible = self._buffer if self.state in (self.PENDING, self.UNOPENED, self.VISIBLE) else ""
+        self._buffer = ""
+        return visible
+
+
+class StreamStats:
+    """Upstream timing and usage captured while relaying a stream."""
+
+    __slots__ = ("first_token_at", "usage", "chunks")
+
+    def __init__(self):
+        self.first_token_at: Optional[float] = None
+        self.usage = None
+        # Content deltas received, hidden reasoning included; about one token each
+        self.chunks = 0
+
+
+async def stream_visible_text(stream, stats: Optional[StreamStats] = None) -> AsyncIterator[str]:
+    """
+    Yield the visible content deltas of a streamed chat completion.
+
+    Args:
+        stream: The `AsyncStream` returned by `chat.completions.create(stream=True)`
+        stats: Optional collector for the first raw token time and usage block
+    """
+    stripper = ThinkTagStripper()
+    async for chunk in stream:
+        if stats is not None and getattr(chunk, "usage", None) is not None:
+            stats.usage = chunk.usage
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if not delta:
+            continue
+        if stats is not None:
+            stats.chunks += 1
+            if stats.first_token_at is None:
+                stats.first_token_at = time.perf_counter()
+        visible = stripper.feed(delta)
+        if visible:
+            yield visible
+    tail = stripper.flush()
+    if tail:
+        yield tail
+
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format a single server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
@@ -0,0 +1,385 @@
+"""
+Lightweight request tracing.
+
+Every HTTP request gets a trace id, returned in the `X-Trace-Id` header (or
+continued from an incoming `X-Trace-Id` / W3C `traceparent` header). Request
+handlers wrap their stages in `span()`; spans are plain objects appended to
+the request's trace, and nothing is serialized on the request path.
+
+Which traces are kept is decided when the request finishes: a fraction of
+requests are sampled up front, and with a slow threshold set, any slower
+request or server error is kept too. Requests that can no longer be kept do
+not record spans at all. Kept traces are exported as OTLP/JSON, either to a
+local rotating file (one `ExportTraceServiceRequest` per line, written by a
+background thread) or to an OTLP/HTTP collector in batches.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import queue
+import random
+import re
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from logging.handlers import QueueListener, RotatingFileHandler
+from typing import Any, Deque, Dict, List, Optional
+
+import httpx
+
+TRACE_HEADER = "x-trace-id"
+TRACEPARENT = re.compile(r"^[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+TRACE_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+class Span:
+    __slots__ = ("span_id", "parent_id", "name", "start", "end", "attributes", "error")
+
+    def __init__(self, name: str, parent_id: Optional[str], start: float, attributes: Dict[str, Any]):
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.start = start
+        self.end: Optional[float] = None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+
+
+class Trace:
+    """
+    Spans of one request.
+
+    Span times are `time.perf_counter()` values, converted to wall-clock
+    nanoseconds against the trace's start on export.
+
+    Args:
+        recording: False when the trace cannot be kept; spans are then skipped
+    """
+
+    def __init__(self, trace_id: str, sampled: bool, recording: bool, parent_span_id: Optional[str] = None):
+        self.trace_id = trace_id
+        self.sampled = sampled
+        self.recording = recording
+        self.parent_span_id = parent_span_id
+        self.wall_start_ns = time.time_ns()
+        self.perf_start = time.perf_counter()
+        self.spans: List[Span] = []
+
+    def add(self, name: str, start: float, end: float, parent_id: Optional[str] = None, **attributes) -> Optional[Span]:
+        if not self.recording:
+            return None
+        span = Span(name, parent_id or _current_span.get(), start, attributes)
+        span.end = end
+        self.spans.append(span)
+        return span
+
+    def to_unix_nanos(self, perf: float) -> int:
+        return self.wall_start_ns + int((perf - self.perf_start) * 1e9)
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional[str]] = ContextVar("current_span", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Time a stage of the current request as a child of the enclosing span.
+
+    Yields the span, whose `attributes` can be filled in as the stage runs,
+    or None when the request is not being traced.
+    """
+    trace = _current_trace.get()
+    if trace is None or not trace.recording:
+        yield None
+        return
+    current = Span(name, _current_span.get(), time.perf_counter(), attributes)
+    token = _current_span.set(current.span_id)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = type(e).__name__
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end = time.perf_counter()
+        trace.spans.append(current)
+
+
+def record_span(name: str, start: float, end: float, **attributes):
+    """Add an already-finished stage (`time.perf_counter()` bounds) to the current request."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(name, start, end, **attributes)
+
+
+def _attribute(key: str, value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def to_otlp(traces: List[Trace], service_name: str) -> dict:
+    """Encode finished traces as an OTLP/JSON `ExportTraceServiceRequest`."""
+    spans = []
+    for trace in traces:
+        for item in trace.spans:
+            spans.append({
+                "traceId": trace.trace_id,
+                "spanId": item.span_id,
+                "parentSpanId": item.parent_id or trace.parent_span_id or "",
+                "name": item.name,
+                "kind": 2 if item.parent_id is None else 1,  # SERVER for the root, INTERNAL below it
+                "startTimeUnixNano": str(trace.to_unix_nanos(item.start)),
+                "endTimeUnixNano": str(trace.to_unix_nanos(item.end if item.end is not None else item.start)),
+                "attributes": [_attribute(key, value) for key, value in item.attributes.items() if value is not None],
+                "status": {"code": 2, "message": item.error} if item.error else {},
+            })
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [_attribute("service.name", service_name)]},
+            "scopeSpans": [{"scope": {"name": "cook_assistant.tracing"}, "spans": spans}],
+        }]
+    }
+
+
+class _OTLPFormatter(logging.Formatter):
+    def __init__(self, service_name: str):
+        super().__init__()
+        self.service_name = service_name
+
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(to_otlp([record.msg], self.service_name), separators=(",", ":"))
+
+
+class FileSpanExporter:
+    """
+    Append kept traces to a size-rotated JSON-lines file.
+
+    Encoding and writing happen on a background thread; traces are dropped
+    (and counted) if it falls `max_queue` traces behind.
+    """
+
+    def __init__(self, path: str, service_name: str, max_bytes: int = 50 * 1024 * 1024, backup_count: int = 5,
+                 max_queue: int = 10000):
+        dir_path = os.path.dirname(path)
+        if dir_path:
+            os.makedirs(dir_path, exist_ok=True)
+        self.path = path
+        handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8", delay=True)
+        handler.setFormatter(_OTLPFormatter(service_name))
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._listener = QueueListener(self._queue, handler)
+        self.exported = 0
+        self.dropped = 0
+
+    async def start(self):
+        self._listener.start()
+
+    async def stop(self):
+        await asyncio.to_thread(self._listener.stop)
+
+    def export(self, trace: Trace):
+        try:
+            self._queue.put_nowait(logging.makeLogRecord({"msg": trace}))
+            self.exported += 1
+        except queue.Full:
+            self.dropped += 1
+
+
+class OTLPSpanExporter:
+    """
+    Send kept traces to an OTLP/HTTP collector (`/v1/traces`, JSON) in batches.
+
+    Traces are buffered and flushed every `interval` seconds by a background
+    task; the oldest are dropped (and counted) if the buffer fills up.
+    """
+
+    def __init__(self, endpoint: str, service_name: str, interval: float = 5.0, max_batch: int = 512,
+                 max_buffer: int = 10000, timeout: float = 10.0):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.interval = interval
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self._buffer: Deque[Trace] = deque(maxlen=max_buffer)
+        self._client: Optional[httpx.AsyncClient] = None
+        self._task: Optional[asyncio.Task] = None
+        self.exported = 0
+        self.dropped = 0
+        self.failed = 0
+
+    async def start(self):
+        self._client = httpx.AsyncClient(timeout=self.timeout)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+        if self._client is not None:
+            await self._client.aclose()
+
+    def export(self, trace: Trace):
+        if len(self._buffer) == self._buffer.maxlen:
+            self.dropped += 1
+        self._buffer.append(trace)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    async def flush(self):
+        while self._buffer and self._client is not None:
+            batch = [self._buffer.popleft() for _ in range(min(self.max_batch, len(self._buffer)))]
+            body = await asyncio.to_thread(json.dumps, to_otlp(batch, self.service_name))
+            try:
+                response = await self._client.post(
+                    self.endpoint, content=body, headers={"Content-Type": "application/json"}
+                )
+                response.raise_for_status()
+                self.exported += len(batch)
+            except httpx.HTTPError:
+                # The collector is a diagnostic aid; never let it back up the service
+                self.failed += len(batch)
+                return
+
+
+class Tracer:
+    """
+    Starts a trace per request and exports the ones worth keeping.
+
+    Args:
+        exporter: `FileSpanExporter`, `OTLPSpanExporter`, or None to only
+            hand out trace ids
+        sample_rate: Fraction of requests kept regardless of outcome
+        slow_threshold: Also keep requests slower than this many seconds, and
+            server errors; None keeps only sampled requests
+    """
+
+    def __init__(self, exporter=None, sample_rate: float = 0.05, slow_threshold: Optional[float] = None):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.slow_threshold = slow_threshold
+        self.traces = 0
+        self.kept = 0
+
+    async def start(self):
+        if self.exporter is not None:
+            await self.exporter.start()
+
+    async def stop(self):
+        if self.exporter is not None:
+            await self.exporter.stop()
+
+    def start_trace(self, headers: Dict[str, str]) -> Trace:
+        """Begin a trace, continuing the caller's trace id when one is given."""
+        self.traces += 1
+        trace_id, parent_span_id, sampled = None, None, random.random() < self.sample_rate
+        match = TRACEPARENT.match(headers.get("traceparent", ""))
+        if match:
+            trace_id, parent_span_id = match.group(1), match.group(2)
+            sampled = sampled or int(match.group(3), 16) & 1 == 1
+        elif TRACE_ID.match(headers.get(TRACE_HEADER, "")):
+            trace_id = headers[TRACE_HEADER]
+        recording = self.exporter is not None and (sampled or self.slow_threshold is not None)
+        return Trace(trace_id or os.urandom(16).hex(), sampled, recording, parent_span_id)
+
+    def finish(self, trace: Trace, duration: float, status: int):
+        if not trace.recording:
+            return
+        keep = trace.sampled or (self.slow_threshold is not None
+                                 and (duration >= self.slow_threshold or status >= 500))
+        if keep:
+            self.kept += 1
+            self.exporter.export(trace)
+
+    def stats(self) -> dict:
+        return {
+            "traces": self.traces,
+            "kept": self.kept,
+            "exported": getattr(self.exporter, "exported", 0),
+            "dropped": getattr(self.exporter, "dropped", 0),
+            "failed": getattr(self.exporter, "failed", 0),
+        }
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware that traces each HTTP request.
+
+    Records a root span for the whole exchange (streamed bodies included), a
+    `serialize` span from the end of the handler's last stage to the
+    response start (response model validation and encoding), and a `send`
+    span for the response body. Sets the `X-Trace-Id` response header.
+    """
+
+    def __init__(self, app, tracer: Tracer):
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = {key.decode("latin-1"): value.decode("latin-1") for key, value in scope["headers"]
+                   if key in (b"traceparent", TRACE_HEADER.encode())}
+        trace = self.tracer.start_trace(headers)
+        root = Span(f"{scope.get('method', '')} {scope.get('path', '')}", None, trace.perf_start, {})
+        trace_token = _current_trace.set(trace)
+        span_token = _current_span.set(root.span_id)
+        status = 500
+        response_started: Optional[float] = None
+
+        async def send_wrapper(message):
+            nonlocal status, response_started
+            if message["type"] == "http.response.start":
+                response_started = time.perf_counter()
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (TRACE_HEADER.encode(), trace.trace_id.encode())
+                ]
+                stages = [s.end for s in trace.spans if s.parent_id == root.span_id and s.end is not None]
+                if stages:
+                    trace.add("serialize", max(stages), response_started, parent_id=root.span_id)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException as e:
+            root.error = type(e).__name__
+            raise
+        finally:
+            _current_span.reset(span_token)
+            _current_trace.reset(trace_token)
+            root.end = time.perf_counter()
+            if trace.recording:
+                if response_started is not None:
+                    trace.add("send", response_started, root.end, parent_id=root.span_id)
+                route = scope.get("route")
+                root.attributes.update({
+                    "http.method": scope.get("method", ""),
+                    "http.route": getattr(route, "path", None) or "unmatched",
+                    "http.status_code": status,
+                })
+                if status >= 500 and root.error is None:
+                    root.error = f"HTTP {status}"
+                trace.spans.append(root)
+            self.tracer.finish(trace, root.end - trace.perf_start, status)
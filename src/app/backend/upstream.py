@@ -0,0 +1,211 @@
+"""Upstream (Modal vLLM) client with pooling, retries and a circuit breaker."""
+
+import asyncio
+import random
+import time
+from typing import Any, Awaitable, Callable, List, Optional
+
+import httpx
+from openai import APIConnectionError, APIStatusError, APITimeoutError, AsyncOpenAI
+
+# Statuses where the upstream refused the request before doing any work
+RETRYABLE_STATUS_CODES = {429, 503}
+# Transport errors raised before the request reached the upstream
+RETRYABLE_TRANSPORT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class CircuitOpenError(Exception):
+    """The circuit breaker is open; the upstream is considered down."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Upstream unavailable, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """
+    True for failures where the upstream certainly did not start generating,
+    so sending the same completion again cannot duplicate work.
+    """
+    if isinstance(exc, APIStatusError):
+        return exc.status_code in RETRYABLE_STATUS_CODES
+    if isinstance(exc, (APIConnectionError, APITimeoutError)):
+        return isinstance(exc.__cause__, RETRYABLE_TRANSPORT_ERRORS)
+    return False
+
+
+def is_upstream_failure(exc: BaseException) -> bool:
+    """True for failures that indicate the upstream is unhealthy (not a bad request)."""
+    if isinstance(exc, APIStatusError):
+        return exc.status_code >= 500 or exc.status_code == 429
+    return isinstance(exc, (APIConnectionError, APITimeoutError))
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    After `failure_threshold` consecutive upstream failures the circuit opens
+    and calls fail immediately for `reset_timeout` seconds. Then a single
+    trial call is let through (half-open); its outcome closes or re-opens
+    the circuit.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._trial_in_flight = False
+
+    def before_call(self):
+        """Raise `CircuitOpenError` if the call must not go upstream."""
+        if self.state == self.CLOSED:
+            return
+        if self.state == self.OPEN and time.monotonic() >= self.opened_at + self.reset_timeout:
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return
+        self.rejected += 1
+        raise CircuitOpenError(self.retry_after())
+
+    def allows_call(self) -> bool:
+        """True if `before_call()` would let a call through; does not change state."""
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN:
+            return time.monotonic() >= self.opened_at + self.reset_timeout
+        return not self._trial_in_flight
+
+    def retry_after(self) -> float:
+        """Seconds until the open circuit lets a trial call through."""
+        return max(self.opened_at + self.reset_timeout - time.monotonic(), 1.0)
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self._trial_in_flight = False
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def release(self):
+        """End a trial call that neither succeeded nor failed upstream (e.g. a bad request)."""
+        self._trial_in_flight = False
+
+    def stats(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self.failures, "rejected": self.rejected}
+
+
+class UpstreamClient:
+    """
+    Owns the pooled HTTP client for an OpenAI-compatible upstream.
+
+    The underlying `httpx.AsyncClient` is created in `start()` (called from
+    the FastAPI lifespan) and closed in `aclose()`. Calls go through
+    `call()`, which applies the circuit breaker and bounded retries with
+    full-jitter exponential backoff on retryable failures only.
+    """
+
+    def __init__(self, base_url: str, api_key: Optional[str], max_connections: int = 100,
+                 max_keepalive_connections: int = 20, keepalive_expiry: float = 30.0,
+                 connect_timeout: float = 5.0, read_timeout: float = 120.0, max_retries: int = 2,
+                 backoff_base: float = 0.5, backoff_max: float = 8.0,
+                 breaker: Optional[CircuitBreaker] = None,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+        self.transport = transport
+        self.retries = 0
+        self.last_success_at: Optional[float] = None
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self.client: Optional[AsyncOpenAI] = None
+
+    async def start(self):
+        if self.client is not None:
+            return
+        self._http_client = httpx.AsyncClient(limits=self.limits, timeout=self.timeout, transport=self.transport)
+        self.client = AsyncOpenAI(
+            api_key=self.api_key,
+            base_url=self.base_url,
+            http_client=self._http_client,
+            timeout=self.timeout,
+            # Retries are handled by `call()` so they respect the breaker
+            max_retries=0,
+        )
+
+    async def aclose(self):
+        if self._http_client is not None:
+            await self._http_client.aclose()
+        self._http_client = None
+        self.client = None
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def call(self, fn: Callable[[AsyncOpenAI], Awaitable[Any]], max_retries: Optional[int] = None) -> Any:
+        """
+        Run `fn(client)` with the circuit breaker and retry policy applied.
+
+        Args:
+            max_retries: Overrides the configured retry bound for this call
+        """
+        if self.client is None:
+            raise RuntimeError("Upstream client is not started")
+        if max_retries is None:
+            max_retries = self.max_retries
+        attempt = 0
+        while True:
+            self.breaker.before_call()
+            try:
+                result = await fn(self.client)
+            except asyncio.CancelledError:
+                self.breaker.release()
+                raise
+            except Exception as e:
+                if not is_upstream_failure(e):
+                    self.breaker.release()
+                    raise
+                self.breaker.record_failure()
+                if attempt >= max_retries or not is_retryable(e):
+                    raise
+                self.retries += 1
+                await asyncio.sleep(self._backoff(attempt))
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            self.last_success_at = time.monotonic()
+            return result
+
+    async def create_chat_completion(self, **kwargs):
+        """`chat.completions.create` through the retry and breaker policy."""
+        return await self.call(lambda client: client.chat.completions.create(**kwargs))
+
+    async def list_models(self, retry: bool = True) -> List[str]:
+        """Ids of the models served by the upstream."""
+        models = await self.call(lambda client: client.models.list(), max_retries=None if retry else 0)
+        return [model.id for model in models.data]
+
+    def stats(self) -> dict:
+        return {"circuit": self.breaker.stats(), "retries": self.retries}
@@ -6,22 +6,33 @@
 # generate_qa_pair_samples -> 40k (sourced from fifth 40K samples)
 
 import asyncio
+import hashlib
 import json
-from src.utils.data_generators import generate_recipe_samples, generate_ingredient_extraction_samples, constraint_generator_samples, recipe_summary_samples, generate_qa_pair_samples
-from src.utils.io_utils import load_json, save_json, save_jsonl
-from tqdm.asyncio import tqdm_asyncio
+import os
+from contextlib import aclosing
+from src.utils.batch_backend import BatchRunner
+from src.utils.data_generators import CURATOR_TASKS, close_client, get_client, rate_limiter, generate_recipe_samples, generate_ingredient_extraction_samples, constraint_generator_samples, recipe_summary_samples, generate_qa_pair_samples
+from src.utils.io_utils import append_jsonl, iter_jsonl, load_json, open_corpus, repair_jsonl, save_json, save_jsonl, write_json_array
+from src.utils.worker_pool import imap_bounded
 from tqdm import tqdm
 
+# Completed samples of each task, appended as they finish so a re-run resumes where it stopped
+SHARD_DIR = "dataset/processed/shards"
+# Batch API input files and submitted batch ids, for DATASET_CURATOR_MODE=batch
+BATCH_DIR = "dataset/processed/batches"
+
 async def create_dataset_subsets():
     # load the datasets
     dataset_with_ingredient_NER = load_json("dataset/recipes_proc_NER_1k_1.json")
-    full_dataset = load_json("dataset/recipes_processed.json")[100000:]
-    # create subset of dataset for each task
-    recipe_generation_dataset = dataset_with_ingredient_NER
-    ingredient_extraction_dataset = dataset_with_ingredient_NER[:5000] + full_dataset[:20000]
-    constraint_generator_dataset = dataset_with_ingredient_NER[45000:50000] + full_dataset[20000:23000]
-    recipe_summary_dataset = dataset_with_ingredient_NER[10000:20000] + full_dataset[32000:42000]
-    generate_qa_pair_dataset = dataset_with_ingredient_NER[30000:35000] + full_dataset[62000:65000]
+    # The full corpus is read through an indexed JSONL copy, so only the sliced recipes are parsed
+    with open_corpus("dataset/recipes_processed.json") as full_dataset:
+        skip = 100000  # the first 100K recipes are not used for the subsets
+        # create subset of dataset for each task
+        recipe_generation_dataset = dataset_with_ingredient_NER
+        ingredient_extraction_dataset = dataset_with_ingredient_NER[:5000] + full_dataset[skip:skip + 20000]
+        constraint_generator_dataset = dataset_with_ingredient_NER[45000:50000] + full_dataset[skip + 20000:skip + 23000]
+        recipe_summary_dataset = dataset_with_ingredient_NER[10000:20000] + full_dataset[skip + 32000:skip + 42000]
+        generate_qa_pair_dataset = dataset_with_ingredient_NER[30000:35000] + full_dataset[skip + 62000:skip + 65000]
     # save the datasets
     save_json(recipe_generation_dataset, "dataset/processed/recipe_generation_dataset.json")
     save_json(ingredient_extraction_dataset, "dataset/processed/ingredient_extraction_dataset.json")
@@ -35,46 +46,177 @@ async def create_dataset_subsets():
     print(f"Recipe Summary Dataset: {len(recipe_summary_dataset)}")
     print(f"Generate QA Pair Dataset: {len(generate_qa_pair_dataset)}")
 
-async def process_dataset_with_generator(recipes, generator_func, task_name, max_concurrent=10):
+def recipe_id(recipe):
+    """Stable id of a recipe, a hash of its content, so it does not depend on where the recipe sits in a subset."""
+    content = json.dumps(recipe, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()[:16]
+
+def task_shard_path(task_name):
+    return os.path.join(SHARD_DIR, task_name.lower().replace(" ", "_") + ".jsonl")
+
+def pending_recipes(recipes, task_name, shard_path):
+    """
+    Recipes without a sample in the task's shard yet (lazily), and the number of samples it holds.
+    
+    Also makes the shard ready for appending: its directory exists and a
+    torn last line left by a crash is cut off.
+    """
+    os.makedirs(os.path.dirname(shard_path) or ".", exist_ok=True)
+    repair_jsonl(shard_path)
+    done_ids = set()
+    completed = 0
+    if os.path.exists(shard_path):
+        for record in iter_jsonl(shard_path):
+            done_ids.add(record["id"])
+            completed += 1
+    if completed:
+        print(f"{task_name}: resuming, {completed} samples already in {shard_path}")
+    return (recipe for recipe in recipes if recipe_id(recipe) not in done_ids), completed
+
+async def process_dataset_with_generator(recipes, generator_func, task_name, max_concurrent=10, shard_path=None,
+                                         ordered=False):
     """
     Process a dataset concurrently with a generator function and show progress.
     
+    A fixed pool of `max_concurrent` workers pulls recipes from a bounded
+    queue fed lazily from `recipes`, so memory stays flat however large the
+    dataset is (see `imap_bounded`).
+    
     Args:
-        recipes: List of recipe dictionaries
+        recipes: Recipe dictionaries; a list or any lazy iterable (e.g. a CorpusReader)
         generator_func: Async function to generate instruction samples
         task_name: Name of the task for progress bar
-        max_concurrent: Maximum concurrent tasks
+        max_concurrent: Number of workers, i.e. recipes processed at once
+        shard_path: JSONL file each sample is appended to as it completes, as
+            {"id": recipe id, "sample": sample}. Recipes already in it are
+            skipped, so an interrupted run resumes with the remainder.
+        ordered: Emit samples in dataset order instead of completion order
     
     Returns:
-        List of generated instruction samples
+        List of generated instruction samples, or with `shard_path` the
+        number of samples in the shard
     """
-    semaphore = asyncio.Semaphore(max_concurrent)
+    async def process_safely(recipe):
+        try:
+            return await generator_func(recipe)
+        except Exception as e:
+            print(f"\nError processing recipe in {task_name}: {e}")
+            return None
     
-    async def process_with_semaphore(recipe):
-        async with semaphore:
-            try:
-                return await generator_func(recipe)
-            except Exception as e:
-                print(f"\nError processing recipe in {task_name}: {e}")
-                return None
-    
-    # Create tasks with progress bar
-    tasks = [process_with_semaphore(recipe) for recipe in recipes]
+    total = len(recipes) if hasattr(recipes, "__len__") else None
+    shard = None
+    completed = 0
+    if shard_path:
+        recipes, completed = pending_recipes(recipes, task_name, shard_path)
+        shard = open(shard_path, 'a', encoding='utf-8')
+        if total is not None:
+            total = max(0, total - completed)
     results = []
     
-    # Use tqdm.asyncio.gather for progress tracking
-    for coro in tqdm_asyncio.as_completed(tasks, desc=task_name, total=len(tasks)):
-        result = await coro
-        if result is not None:
-            results.append(result)
+    try:
+        with tqdm(total=total, desc=task_name) as progress:
+            async with aclosing(imap_bounded(process_safely, recipes, workers=max_concurrent, ordered=ordered)) as samples:
+                async for recipe, result in samples:
+                    progress.update(1)
+                    if result is None:
+                        continue
+                    if shard is None:
+                        results.append(result)
+                    else:
+                        append_jsonl({"id": recipe_id(recipe), "sample": result}, shard)
+                        completed += 1
+    finally:
+        # Workers are stopped by the time the pool is closed, so nothing writes after this
+        if shard is not None:
+            shard.close()
+    
+    return results if shard is None else completed
+
+async def process_dataset_with_batch(recipes, steps, build_sample, task_name, runner, shard_path):
+    """
+    Batch API counterpart of `process_dataset_with_generator` for a curator task.
+    
+    Each step is run for all pending recipes as one set of batches, feeding
+    the next step the answers of the previous one, so two-step tasks (the
+    constraint -> adaptation chain) take two rounds of batches. Recipes whose
+    call failed at any step are left for the next run.
+    
+    Args:
+        recipes: List of recipe dictionaries
+        steps: Step functions of the task (see `CURATOR_TASKS`)
+        build_sample: Turns a recipe and its step answers into a sample
+        task_name: Name of the task, also used to name its batches
+        runner: BatchRunner submitting the batches
+        shard_path: JSONL file the samples are appended to
+    
+    Returns:
+        Number of samples in the shard
+    """
+    pending, completed = pending_recipes(recipes, task_name, shard_path)
+    # Batch input files are written whole, so this task holds its pending recipes
+    by_id = {recipe_id(recipe): recipe for recipe in pending}
+    answers = {rid: [] for rid in by_id}
+    batch_name = os.path.splitext(os.path.basename(shard_path))[0]
+    
+    for index, step in enumerate(steps):
+        requests = {}
+        for rid, results in answers.items():
+            try:
+                requests[rid] = step(by_id[rid], results)
+            except Exception as e:
+                print(f"\nError preparing recipe in {task_name}: {e}")
+        step_answers = await runner.run(f"{batch_name}-step{index + 1}", requests)
+        answers = {rid: answers[rid] + [step_answers[rid]] for rid in requests if rid in step_answers}
     
-    return results
+    with open(shard_path, 'a', encoding='utf-8') as shard:
+        for rid, results in answers.items():
+            try:
+                sample = build_sample(by_id[rid], results)
+            except Exception as e:
+                print(f"\nError processing recipe in {task_name}: {e}")
+                continue
+            append_jsonl({"id": rid, "sample": sample}, shard)
+            completed += 1
+    print(f"{task_name}: {len(answers)} of {len(by_id)} pending recipes completed through the Batch API")
+    return completed
+
+async def report_throughput(interval=60):
+    """Print the curator API throughput against its RPM/TPM quota every `interval` seconds."""
+    while True:
+        await asyncio.sleep(interval)
+        tqdm.write(f"API throughput: {rate_limiter.report()}")
 
-async def create_instruction_tuned_dataset():
+async def create_instruction_tuned_dataset(mode=None):
     """
     Create instruction tuned dataset by processing all subset datasets concurrently.
     Each dataset is processed with its corresponding generator function.
+    
+    Samples are checkpointed to one JSONL shard per task under SHARD_DIR, so
+    re-running after an interruption only generates the missing ones.
+    
+    Args:
+        mode: "live" sends the curator calls as they are needed; "batch" runs
+            them through the OpenAI Batch API. Defaults to DATASET_CURATOR_MODE.
     """
+    mode = mode or os.getenv("DATASET_CURATOR_MODE", "live")
+    if mode == "batch":
+        runner = BatchRunner(
+            get_client(),
+            os.getenv('DATASET_CURATOR_MODEL'),
+            work_dir=BATCH_DIR,
+            poll_interval=float(os.getenv("DATASET_CURATOR_BATCH_POLL", "60"))
+        )
+    
+    def curator_task(dataset, generator_func, task_name, max_concurrent):
+        if mode == "batch":
+            steps, build_sample = CURATOR_TASKS[task_name]
+            return process_dataset_with_batch(
+                dataset, steps, build_sample, task_name, runner, shard_path=task_shard_path(task_name)
+            )
+        return process_dataset_with_generator(
+            dataset, generator_func, task_name, max_concurrent=max_concurrent, shard_path=task_shard_path(task_name)
+        )
+
     print("Loading datasets...")
     # load the datasets
     recipe_generation_dataset = load_json("dataset/processed/recipe_generation_dataset.json")
@@ -95,74 +237,79 @@ async def create_instruction_tuned_dataset():
     print("Processing datasets concurrently with progress bars...")
     print("="*80 + "\n")
     
-    # Process all datasets concurrently with their respective generator functions
-    results = await asyncio.gather(
-        process_dataset_with_generator(
-            recipe_generation_dataset, 
-            generate_recipe_samples, 
-            "Recipe Generation",
-            max_concurrent=50
-        ),
-        process_dataset_with_generator(
-            ingredient_extraction_dataset, 
-            generate_ingredient_extraction_samples, 
-            "Ingredient Extraction",
-            max_concurrent=50
-        ),
-        process_dataset_with_generator(
-            constraint_generator_dataset, 
-            constraint_generator_samples, 
-            "Constraint Generator",
-            max_concurrent=30  # Lower concurrency for API-heavy tasks
-        ),
-        process_dataset_with_generator(
-            recipe_summary_dataset, 
-            recipe_summary_samples, 
-            "Recipe Summary",
-            max_concurrent=30  # Lower concurrency for API-heavy tasks
-        ),
-        process_dataset_with_generator(
-            generate_qa_pair_dataset, 
-            generate_qa_pair_samples, 
-            "QA Pair Generation",
-            max_concurrent=30  # Lower concurrency for API-heavy tasks
+    # Process all datasets concurrently with their respective generator functions.
+    # API calls from every task share one client and one rate limiter (DATASET_CURATOR_RPM/TPM);
+    # max_concurrent only bounds each task's calls in flight.
+    reporter = asyncio.create_task(report_throughput())
+    try:
+        results = await asyncio.gather(
+            process_dataset_with_generator(
+                recipe_generation_dataset, 
+                generate_recipe_samples, 
+                "Recipe Generation",
+                max_concurrent=50,
+                shard_path=task_shard_path("Recipe Generation")
+            ),
+            process_dataset_with_generator(
+                ingredient_extraction_dataset, 
+                generate_ingredient_extraction_samples, 
+                "Ingredient Extraction",
+                max_concurrent=50,
+                shard_path=task_shard_path("Ingredient Extraction")
+            ),
+            curator_task(
+                constraint_generator_dataset, 
+                constraint_generator_samples, 
+                "Constraint Generator",
+                max_concurrent=30  # Lower concurrency for API-heavy tasks
+            ),
+            curator_task(
+                recipe_summary_dataset, 
+                recipe_summary_samples, 
+                "Recipe Summary",
+                max_concurrent=30  # Lower concurrency for API-heavy tasks
+            ),
+            curator_task(
+                generate_qa_pair_dataset, 
+                generate_qa_pair_samples, 
+                "QA Pair Generation",
+                max_concurrent=30  # Lower concurrency for API-heavy tasks
+            )
         )
-    )
+    finally:
+        reporter.cancel()
+        await close_client()
     
-    # Unpack results
-    recipe_gen_results, ingredient_ext_results, constraint_gen_results, recipe_sum_results, qa_pair_results = results
+    # Unpack sample counts; the samples themselves are in the task shards
+    recipe_gen_count, ingredient_ext_count, constraint_gen_count, recipe_sum_count, qa_pair_count = results
     
-    # Merge all results into final dataset
+    # Merge the shards into the final dataset, streaming them in task order
+    output_path = "dataset/processed/instruction_tuned_dataset.json"
     print("\n" + "="*80)
-    print("Merging datasets...")
-    final_dataset = (
-        recipe_gen_results + 
-        ingredient_ext_results + 
-        constraint_gen_results + 
-        recipe_sum_results + 
-        qa_pair_results
+    print(f"Merging task shards into {output_path}...")
+    shards = [
+        task_shard_path(name)
+        for name in ("Recipe Generation", "Ingredient Extraction", "Constraint Generator", "Recipe Summary", "QA Pair Generation")
+    ]
+    total_samples = write_json_array(
+        (record["sample"] for path in shards if os.path.exists(path) for record in iter_jsonl(path)),
+        output_path
     )
     
-    print(f"Total samples in final dataset: {len(final_dataset)}")
-    
-    # Save the final conversational dataset
-    output_path = "dataset/processed/instruction_tuned_dataset.json"
-    print(f"\nSaving final dataset to {output_path}...")
-    save_json(final_dataset, output_path)
-    
     print("\n" + "="*80)
     print("✓ Instruction tuned dataset created successfully!")
     print("="*80)
     print(f"\nFinal Dataset Statistics:")
-    print(f"  Recipe Generation samples: {len(recipe_gen_results)}")
-    print(f"  Ingredient Extraction samples: {len(ingredient_ext_results)}")
-    print(f"  Constraint Generator samples: {len(constraint_gen_results)}")
-    print(f"  Recipe Summary samples: {len(recipe_sum_results)}")
-    print(f"  QA Pair Generation samples: {len(qa_pair_results)}")
-    print(f"  Total samples: {len(final_dataset)}")
+    print(f"  Recipe Generation samples: {recipe_gen_count}")
+    print(f"  Ingredient Extraction samples: {ingredient_ext_count}")
+    print(f"  Constraint Generator samples: {constraint_gen_count}")
+    print(f"  Recipe Summary samples: {recipe_sum_count}")
+    print(f"  QA Pair Generation samples: {qa_pair_count}")
+    print(f"  Total samples: {total_samples}")
+    print(f"\nAPI throughput: {rate_limiter.report()}")
     print(f"\nDataset saved to: {output_path}")
     
-    return final_dataset
+    return total_samples
 
 
 
@@ -0,0 +1,304 @@
+"""
+Benchmark the FastAPI backend against an in-process fake vLLM upstream.
+
+The real `app` from `app.backend.main` is driven through `httpx.ASGITransport`
+while its upstream client talks to `fake_vllm.create_app()` the same way, so
+no network or GPU is involved. Each endpoint is run for a fixed number of
+requests at a fixed concurrency and reported as latency percentiles,
+throughput and backend-added overhead (client latency minus the time the
+fake upstream spent on that request).
+
+Results are appended as one JSON line per run, tagged with the git commit,
+so runs can be compared across commits.
+
+Usage:
+    python src/app/tests/benchmark_backend.py --requests 500 --concurrency 32
+    python src/app/tests/benchmark_backend.py --endpoints /chat/stream /ws/chat --output bench.jsonl
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from fake_vllm import FakeUpstreamSettings, create_app  # noqa: E402
+
+FAKE_BASE_URL = "http://fake-vllm/v1"
+ENDPOINTS = ("/generate-recipe", "/chat", "/chat/stream", "/ws/chat", "/health")
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile of `values` (q in 0-100)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def summarize(latencies: List[float], overheads: List[float], errors: Dict[str, int], elapsed: float) -> dict:
+    def ms(value):
+        return round(value * 1000, 3) if value is not None else None
+
+    return {
+        "requests": len(latencies) + sum(errors.values()),
+        "ok": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed > 0 else None,
+        "latency_ms": {f"p{q}": ms(percentile(latencies, q)) for q in (50, 95, 99)},
+        "overhead_ms": {f"p{q}": ms(percentile(overheads, q)) for q in (50, 95, 99)},
+    }
+
+
+def git_commit() -> Optional[str]:
+    repo = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=repo,
+                                capture_output=True, text=True, check=True)
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=repo,
+                               capture_output=True, text=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit.stdout.strip() + ("-dirty" if dirty.stdout.strip() else "")
+
+
+class ASGIWebSocket:
+    """Minimal in-process WebSocket client speaking ASGI directly to an app."""
+
+    def __init__(self, app, path: str):
+        self.app = app
+        self.path = path
+        self._inbox: asyncio.Queue = asyncio.Queue()
+        self._outbox: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+
+    async def connect(self):
+        scope = {
+            "type": "websocket", "asgi": {"version": "3.0"}, "scheme": "ws", "path": self.path,
+            "raw_path": self.path.encode(), "query_string": b"", "root_path": "", "headers": [],
+            "client": ("benchmark", 0), "server": ("backend", 80), "subprotocols": [],
+        }
+        await self._inbox.put({"type": "websocket.connect"})
+        self._task = asyncio.create_task(self.app(scope, self._inbox.get, self._outbox.put))
+        message = await self._outbox.get()
+        if message["type"] != "websocket.accept":
+            raise ConnectionError(f"WebSocket rejected: {message}")
+
+    async def send_json(self, data: dict):
+        await self._inbox.put({"type": "websocket.receive", "text": json.dumps(data)})
+
+    async def receive_json(self) -> dict:
+        message = await self._outbox.get()
+        if message["type"] == "websocket.close":
+            raise ConnectionError(f"WebSocket closed: {message.get('code')}")
+        return json.loads(message["text"])
+
+    async def close(self):
+        await self._inbox.put({"type": "websocket.disconnect", "code": 1000})
+        await self._task
+
+
+class Benchmark:
+    """Drives one endpoint at a time and matches each request to its upstream time."""
+
+    def __init__(self, client: httpx.AsyncClient, backend_app, fake_app, concurrency: int):
+        self.client = client
+        self.backend_app = backend_app
+        self.fake_app = fake_app
+        self.concurrency = concurrency
+        self._next_marker = 0
+
+    def _marker(self) -> str:
+        self._next_marker += 1
+        return f"bench-{self._next_marker}"
+
+    async def _request(self, endpoint: str, marker: str, websocket: Optional[ASGIWebSocket]):
+        """Send one request and return its status (200 on success)."""
+        # Unique markers also keep the response caches and coalescing out of the measurement
+        message = f"{marker}: how long should I rest pizza dough?"
+        if endpoint == "/ws/chat":
+            # One connection per worker; reset so every turn sends the same prompt as the REST paths
+            await websocket.send_json({"type": "reset"})
+            await websocket.send_json({"type": "message", "content": message})
+            while True:
+                reply = await websocket.receive_json()
+                if reply["type"] == "done":
+                    return 200
+                if reply["type"] != "token":
+                    return reply.get("status", reply["type"])
+        if endpoint == "/generate-recipe":
+            response = await self.client.post(endpoint, json={
+                "ingredients": ["eggs", "flour", "milk"],
+                "additional_instructions": marker
+            })
+        elif endpoint == "/chat/stream":
+            response = await self.client.post(endpoint, json={"message": message})
+            if response.status_code == 200 and "event: error" in response.text:
+                return "stream_error"
+        elif endpoint == "/chat":
+            response = await self.client.post(endpoint, json={"message": message})
+        else:
+            response = await self.client.get(endpoint)
+        return response.status_code
+
+    async def run(self, endpoint: str, total: int) -> dict:
+        latencies: List[float] = []
+        overheads: List[float] = []
+        errors: Dict[str, int] = {}
+        remaining = total
+
+        async def worker():
+            nonlocal remaining
+            websocket = None
+            if endpoint == "/ws/chat":
+                websocket = ASGIWebSocket(self.backend_app, endpoint)
+                await websocket.connect()
+            while remaining > 0:
+                remaining -= 1
+                marker = self._marker()
+                started = time.perf_counter()
+                try:
+                    status = await self._request(endpoint, marker, websocket)
+                except Exception as e:
+                    status = type(e).__name__
+                latency = time.perf_counter() - started
+                if status != 200:
+                    errors[str(status)] = errors.get(str(status), 0) + 1
+                    continue
+                latencies.append(latency)
+                overheads.append(latency - self.fake_app.state.timings.pop(marker, 0.0))
+            if websocket is not None:
+                await websocket.close()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(min(self.concurrency, total))))
+        return summarize(latencies, overheads, errors, time.perf_counter() - started)
+
+
+async def run_benchmark(args) -> dict:
+    settings = FakeUpstreamSettings(
+        ttft=args.ttft,
+        tokens_per_second=args.tokens_per_second,
+        completion_tokens=args.completion_tokens,
+        failure_rate=args.failure_rate,
+        failure_status=args.failure_status,
+        seed=0,
+    )
+    fake_app = create_app(settings)
+
+    # Point the backend at the fake before its module-level config is read
+    os.environ["UPSTREAM_BASE_URLS"] = FAKE_BASE_URL
+    os.environ.setdefault("MODAL_API_KEY", "benchmark")
+    from app.backend import main
+
+    for replica in main.upstream.replicas:
+        replica.client.transport = httpx.ASGITransport(app=fake_app)
+
+    results = {}
+    async with main.lifespan(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://backend", timeout=None) as client:
+            benchmark = Benchmark(client, main.app, fake_app, args.concurrency)
+            for endpoint in args.endpoints:
+                if args.warmup:
+                    await benchmark.run(endpoint, args.warmup)
+                results[endpoint] = await benchmark.run(endpoint, args.requests)
+
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": sys.version.split()[0],
+        "params": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "warmup": args.warmup,
+            "ttft": args.ttft,
+            "tokens_per_second": args.tokens_per_second,
+            "completion_tokens": args.completion_tokens,
+            "failure_rate": args.failure_rate,
+            "failure_status": args.failure_status,
+        },
+        "results": results,
+    }
+
+
+def load_last_run(path: str) -> Optional[dict]:
+    if not os.path.exists(path):
+        return None
+    last = None
+    with open(path, "r") as f:
+        for line in f:
+            if line.strip():
+                last = json.loads(line)
+    return last
+
+
+def print_report(run: dict, baseline: Optional[dict] = None):
+    print(f"commit {run['commit']}  {run['timestamp']}  {json.dumps(run['params'])}")
+    if baseline is not None:
+        print(f"compared with {baseline['commit']}  {baseline['timestamp']}")
+    header = f"{'endpoint':<18}{'ok':>7}{'err':>6}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ovh p50':>10}{'ovh p99':>10}"
+    print(header)
+    print("-" * len(header))
+    for endpoint, result in run["results"].items():
+        latency, overhead = result["latency_ms"], result["overhead_ms"]
+        print(
+            f"{endpoint:<18}{result['ok']:>7}{sum(result['errors'].values()):>6}"
+            f"{result['throughput_rps'] or 0:>10.1f}{latency['p50'] or 0:>10.2f}{latency['p95'] or 0:>10.2f}"
+            f"{latency['p99'] or 0:>10.2f}{overhead['p50'] or 0:>10.2f}{overhead['p99'] or 0:>10.2f}"
+        )
+        previous = (baseline or {}).get("results", {}).get(endpoint)
+        if previous:
+            def delta(new, old):
+                if new is None or not old:
+                    return "n/a"
+                return f"{(new - old) / old * 100:+.1f}%"
+
+            print(
+                f"{'  vs baseline':<18}{'':>13}{delta(result['throughput_rps'], previous['throughput_rps']):>10}"
+                f"{delta(latency['p50'], previous['latency_ms']['p50']):>10}"
+                f"{delta(latency['p95'], previous['latency_ms']['p95']):>10}"
+                f"{delta(latency['p99'], previous['latency_ms']['p99']):>10}"
+                f"{delta(overhead['p50'], previous['overhead_ms']['p50']):>10}"
+                f"{delta(overhead['p99'], previous['overhead_ms']['p99']):>10}"
+            )
+        if result["errors"]:
+            print(f"{'  errors':<18}{json.dumps(result['errors'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the backend against a fake upstream")
+    parser.add_argument("--endpoints", nargs="+", default=list(ENDPOINTS), choices=ENDPOINTS)
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=10, help="Unmeasured requests per endpoint")
+    parser.add_argument("--ttft", type=float, default=0.05, help="Fake upstream time to first token (s)")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--completion-tokens", type=int, default=64)
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of upstream calls that fail")
+    parser.add_argument("--failure-status", type=int, default=503)
+    parser.add_argument("--output", help="Append the run as a JSON line to this file")
+    parser.add_argument("--compare", help="JSONL file whose last run is shown as the baseline")
+    args = parser.parse_args()
+
+    baseline = load_last_run(args.compare) if args.compare else None
+    run = asyncio.run(run_benchmark(args))
+    print_report(run, baseline)
+
+    if args.output:
+        with open(args.output, "a") as f:
+            f.write(json.dumps(run) + "\n")
+
+
+if __name__ == "__main__":
+    main()
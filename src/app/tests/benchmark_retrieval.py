@@ -0,0 +1,141 @@
+"""
+Benchmark building and querying the recipe ingredient index.
+
+Builds the index from the processed corpus (or a synthetic corpus with a
+Zipf-like ingredient distribution when the dataset is not available), then
+times searches whose ingredient lists are drawn from corpus recipes, with
+some ingredients dropped and others added, the way users list what they have.
+
+Results are appended as one JSON line per run, tagged with the git commit,
+like `benchmark_backend.py`.
+
+Usage:
+    python src/app/tests/benchmark_retrieval.py --corpus dataset/recipes_processed.json
+    python src/app/tests/benchmark_retrieval.py --synthetic 500000 --queries 2000 --output bench.jsonl
+"""
+
+import argparse
+import itertools
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from app.backend.retrieval import METRICS, RecipeIndex, build_index  # noqa: E402
+from benchmark_backend import git_commit, percentile  # noqa: E402
+
+
+def synthetic_name(i: int) -> str:
+    # Index terms keep letters only, so spell the id out
+    letters = ""
+    while True:
+        i, digit = divmod(i, 26)
+        letters = "abcdefghijklmnopqrstuvwxyz"[digit] + letters
+        if i == 0:
+            return f"ingredient {letters}"
+
+
+def synthetic_corpus(size: int, vocab_size: int, seed: int = 0) -> List[dict]:
+    """Recipes of 4-14 ingredients drawn from a Zipf-like vocabulary, so staples have long postings."""
+    rng = random.Random(seed)
+    vocab = [synthetic_name(i) for i in range(vocab_size)]
+    cum_weights = list(itertools.accumulate(1.0 / (rank + 1) for rank in range(vocab_size)))
+    recipes = []
+    for i in range(size):
+        ingredients = list(dict.fromkeys(rng.choices(vocab, cum_weights=cum_weights, k=rng.randint(4, 14))))
+        recipes.append({
+            "title": f"Recipe {i}",
+            "ingredients": ingredients,
+            "directions": ["Combine everything.", "Cook until done."],
+            "cleaned_ingredients": ingredients,
+        })
+    return recipes
+
+
+def sample_queries(recipes: List[dict], count: int, field: str, seed: int = 0) -> List[List[str]]:
+    rng = random.Random(seed)
+    extras = [ingredient for recipe in rng.sample(recipes, min(len(recipes), 1000)) for ingredient in recipe[field]]
+    queries = []
+    for _ in range(count):
+        ingredients = list(rng.choice(recipes)[field])
+        keep = ingredients[:max(1, len(ingredients) - rng.randint(0, 2))]
+        queries.append(keep + rng.sample(extras, rng.randint(0, 2)))
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the recipe ingredient index")
+    parser.add_argument("--corpus", help="Processed recipes JSON; omit to use a synthetic corpus")
+    parser.add_argument("--field", default="cleaned_ingredients")
+    parser.add_argument("--synthetic", type=int, default=200_000, help="Synthetic corpus size")
+    parser.add_argument("--vocab", type=int, default=20_000, help="Synthetic ingredient vocabulary size")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--index-dir", help="Where to build the index (default: a temporary directory)")
+    parser.add_argument("--output", help="Append the run as a JSON line to this file")
+    args = parser.parse_args()
+
+    if args.corpus:
+        with open(args.corpus, "r") as f:
+            recipes = json.load(f)
+    else:
+        recipes = synthetic_corpus(args.synthetic, args.vocab)
+
+    index_dir = args.index_dir or tempfile.mkdtemp(prefix="recipe_index_")
+    try:
+        meta = build_index(recipes, index_dir, field=args.field, source=args.corpus)
+        index_bytes = sum(os.path.getsize(os.path.join(index_dir, name)) for name in os.listdir(index_dir))
+
+        started = time.perf_counter()
+        index = RecipeIndex(index_dir)
+        open_seconds = time.perf_counter() - started
+
+        queries = sample_queries(recipes, args.queries, args.field)
+        results = {}
+        for metric in METRICS:
+            latencies = []
+            for query in queries:
+                started = time.perf_counter()
+                index.search(query, k=args.k, metric=metric)
+                latencies.append(time.perf_counter() - started)
+            results[metric] = {
+                f"p{q}": round(percentile(latencies, q) * 1000, 3) for q in (50, 95, 99)
+            }
+        index.close()
+    finally:
+        if not args.index_dir:
+            shutil.rmtree(index_dir, ignore_errors=True)
+
+    run = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": sys.version.split()[0],
+        "params": {
+            "corpus": args.corpus or f"synthetic:{args.synthetic}x{args.vocab}",
+            "queries": args.queries,
+            "k": args.k,
+        },
+        "build": {**meta, "index_mb": round(index_bytes / 2 ** 20, 2), "open_seconds": round(open_seconds, 4)},
+        "query_latency_ms": results,
+    }
+    print(f"commit {run['commit']}  {run['timestamp']}  {json.dumps(run['params'])}")
+    print(f"built {meta['recipes']} recipes / {meta['terms']} terms / {meta['postings']} postings "
+          f"in {meta['build_seconds']:.2f}s, {run['build']['index_mb']} MB, opened in {open_seconds * 1000:.1f} ms")
+    for metric, latency in results.items():
+        print(f"{metric:<10} p50 {latency['p50']:.3f} ms  p95 {latency['p95']:.3f} ms  p99 {latency['p99']:.3f} ms")
+
+    if args.output:
+        with open(args.output, "a") as f:
+            f.write(json.dumps(run) + "\n")
+
+
+if __name__ == "__main__":
+    main()
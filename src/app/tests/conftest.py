@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Backend modules are imported as `app.backend...`, pipeline utilities as `src.utils...`
+TESTS_DIR = os.path.dirname(__file__)
+sys.path.insert(0, os.path.join(TESTS_DIR, "..", ".."))
+sys.path.insert(0, os.path.join(TESTS_DIR, "..", "..", ".."))
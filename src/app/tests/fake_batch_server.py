@@ -0,0 +1,213 @@
+"""
+Fake OpenAI Batch API server for testing the data pipeline's batch mode.
+
+Serves the file and batch endpoints the pipeline uses (`POST /v1/files`,
+`GET /v1/files/{id}/content`, `POST /v1/batches`, `GET /v1/batches/{id}`).
+A submitted batch moves through `validating` and `in_progress` and then
+completes, answering every chat completion with a JSON object that carries
+the keys of all curator prompts. Like `fake_vllm.py`, it can be mounted
+in-process through `httpx.ASGITransport` or run on a port.
+
+Usage:
+    python src/app/tests/fake_batch_server.py --port 8002 --processing-seconds 5
+    OPENAI_BASE_URL=http://127.0.0.1:8002/v1 OPENAI_API_KEY=x DATASET_CURATOR_MODE=batch \
+        DATASET_CURATOR_BATCH_POLL=1 python -m src.app.data_pipeline
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from dataclasses import dataclass
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from typing import Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+# One answer that satisfies every curator prompt's JSON format
+ANSWER = {
+    "constraint": "I am allergic to nuts; how can I make this without them?",
+    "altered recipe": {
+        "title": "Nut-Free Version",
+        "ingredients": ["flour", "sugar", "sunflower seeds"],
+        "directions": ["Mix everything.", "Bake until golden."],
+    },
+    "altered ingredients": ["sunflower seeds"],
+    "summary": "A quick baked treat made by mixing and baking the ingredients.",
+    "question": "Can I prepare it ahead of time?",
+    "answer": "Yes, it keeps for a day in an airtight container.",
+}
+
+
+@dataclass
+class FakeBatchSettings:
+    """
+    Behaviour of the fake batch server.
+
+    Args:
+        processing_seconds: Time from submission until a batch completes
+        failure_rate: Fraction of requests answered with an error instead
+        final_status: Status a batch ends in ("completed", "expired", ...)
+    """
+
+    processing_seconds: float = 1.0
+    failure_rate: float = 0.0
+    final_status: str = "completed"
+    seed: Optional[int] = None
+
+
+def _multipart_fields(content_type: str, body: bytes) -> dict:
+    """Decode a multipart/form-data body into {field name: (filename, bytes)}."""
+    message = BytesParser(policy=default_policy).parsebytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode("latin-1") + body
+    )
+    fields = {}
+    for part in message.iter_parts():
+        name = part.get_param("name", header="content-disposition")
+        fields[name] = (part.get_filename(), part.get_payload(decode=True))
+    return fields
+
+
+def create_app(settings: Optional[FakeBatchSettings] = None) -> FastAPI:
+    """
+    Build the fake batch app.
+
+    `app.state.files` and `app.state.batches` hold what was uploaded and
+    submitted, so a test can check how many batches a run created.
+    """
+    settings = settings or FakeBatchSettings()
+    rng = random.Random(settings.seed)
+    app = FastAPI(title="Fake Batch API")
+    app.state.settings = settings
+    app.state.files = {}
+    app.state.batches = {}
+
+    def add_file(content: bytes, filename: str, purpose: str) -> dict:
+        file_id = f"file-{len(app.state.files) + 1}"
+        app.state.files[file_id] = {
+            "id": file_id,
+            "object": "file",
+            "bytes": len(content),
+            "created_at": int(time.time()),
+            "filename": filename,
+            "purpose": purpose,
+            "status": "processed",
+            "content": content,
+        }
+        return app.state.files[file_id]
+
+    def file_object(file: dict) -> dict:
+        return {key: value for key, value in file.items() if key != "content"}
+
+    def complete(request: dict) -> dict:
+        custom_id = request["custom_id"]
+        if rng.random() < settings.failure_rate:
+            return {"id": f"req-{custom_id}", "custom_id": custom_id, "response": {
+                "status_code": 500, "request_id": custom_id, "body": {"error": {"message": "Injected failure"}},
+            }, "error": None}
+        body = request["body"]
+        prompt = " ".join(str(message.get("content", "")) for message in body.get("messages", []))
+        content = json.dumps(ANSWER)
+        return {"id": f"req-{custom_id}", "custom_id": custom_id, "response": {
+            "status_code": 200,
+            "request_id": custom_id,
+            "body": {
+                "id": f"chatcmpl-{custom_id}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4,
+                          "total_tokens": (len(prompt) + len(content)) // 4},
+            },
+        }, "error": None}
+
+    async def process(batch: dict):
+        await asyncio.sleep(settings.processing_seconds / 2)
+        lines = app.state.files[batch["input_file_id"]]["content"].decode("utf-8").splitlines()
+        requests = [json.loads(line) for line in lines if line.strip()]
+        batch.update(status="in_progress", in_progress_at=int(time.time()))
+        batch["request_counts"]["total"] = len(requests)
+        await asyncio.sleep(settings.processing_seconds / 2)
+
+        results = [complete(request) for request in requests]
+        failed = sum(1 for result in results if result["response"]["status_code"] != 200)
+        output = "".join(json.dumps(result) + "\n" for result in results).encode("utf-8")
+        output_file = add_file(output, f"{batch['id']}_output.jsonl", "batch_output")
+        batch.update(
+            status=settings.final_status,
+            output_file_id=output_file["id"],
+            request_counts={"total": len(requests), "completed": len(requests) - failed, "failed": failed},
+        )
+        batch[f"{settings.final_status}_at"] = int(time.time())
+
+    @app.post("/v1/files")
+    async def upload_file(request: Request):
+        fields = _multipart_fields(request.headers["content-type"], await request.body())
+        filename, content = fields["file"]
+        purpose = fields.get("purpose", (None, b"batch"))[1].decode()
+        return file_object(add_file(content, filename or "upload.jsonl", purpose))
+
+    @app.get("/v1/files/{file_id}/content")
+    async def file_content(file_id: str):
+        file = app.state.files.get(file_id)
+        if file is None:
+            return JSONResponse(status_code=404, content={"error": {"message": f"No such file {file_id}"}})
+        return Response(content=file["content"], media_type="application/octet-stream")
+
+    @app.post("/v1/batches")
+    async def create_batch(request: Request):
+        body = await request.json()
+        if body.get("input_file_id") not in app.state.files:
+            return JSONResponse(status_code=400, content={"error": {"message": "Unknown input_file_id"}})
+        batch_id = f"batch-{len(app.state.batches) + 1}"
+        batch = {
+            "id": batch_id,
+            "object": "batch",
+            "endpoint": body["endpoint"],
+            "input_file_id": body["input_file_id"],
+            "completion_window": body["completion_window"],
+            "status": "validating",
+            "created_at": int(time.time()),
+            "output_file_id": None,
+            "error_file_id": None,
+            "request_counts": {"total": 0, "completed": 0, "failed": 0},
+        }
+        app.state.batches[batch_id] = batch
+        batch["_task"] = asyncio.create_task(process(batch))
+        return {key: value for key, value in batch.items() if not key.startswith("_")}
+
+    @app.get("/v1/batches/{batch_id}")
+    async def retrieve_batch(batch_id: str):
+        batch = app.state.batches.get(batch_id)
+        if batch is None:
+            return JSONResponse(status_code=404, content={"error": {"message": f"No such batch {batch_id}"}})
+        return {key: value for key, value in batch.items() if not key.startswith("_")}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a fake OpenAI Batch API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8002)
+    parser.add_argument("--processing-seconds", type=float, default=1.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--final-status", default="completed")
+    args = parser.parse_args()
+
+    import uvicorn
+
+    settings = FakeBatchSettings(
+        processing_seconds=args.processing_seconds,
+        failure_rate=args.failure_rate,
+        final_status=args.final_status,
+    )
+    uvicorn.run(create_app(settings), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
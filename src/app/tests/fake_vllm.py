@@ -0,0 +1,169 @@
+"""
+Fake OpenAI-compatible (vLLM-like) server for benchmarks and local testing.
+
+Serves `/v1/models` and `/v1/chat/completions` (plain and streamed) with a
+configurable time to first token, token rate and failure injection. It can
+be mounted in-process through `httpx.ASGITransport`, or run on a port and
+used as one of the backend's `UPSTREAM_BASE_URLS`.
+
+Usage:
+    python src/app/tests/fake_vllm.py --port 8001 --ttft 0.2 --tokens-per-second 100
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+MODEL_ID = "anileo1/cook-assistant-Qwen3-0.6B"
+
+# Benchmark requests carry a marker so each upstream call can be matched to its client request
+MARKER_PATTERN = re.compile(r"bench-\d+")
+
+
+@dataclass
+class FakeUpstreamSettings:
+    """
+    Behaviour of the fake upstream.
+
+    Args:
+        ttft: Seconds before the first token
+        tokens_per_second: Generation speed after the first token
+        completion_tokens: Tokens generated per completion
+        failure_rate: Fraction of completions answered with `failure_status`
+        failure_status: HTTP status used for injected failures
+    """
+
+    ttft: float = 0.05
+    tokens_per_second: float = 200.0
+    completion_tokens: int = 64
+    failure_rate: float = 0.0
+    failure_status: int = 503
+    model_id: str = MODEL_ID
+    seed: Optional[int] = None
+
+
+def _chunk(completion_id: str, model: str, delta: dict, finish_reason=None, usage=None) -> str:
+    payload = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [] if usage else [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+    if usage:
+        payload["usage"] = usage
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+def create_app(settings: Optional[FakeUpstreamSettings] = None) -> FastAPI:
+    """
+    Build the fake upstream app.
+
+    `app.state.timings` maps each request marker (`bench-<n>`) found in the
+    prompt to the seconds the fake spent serving it, so a benchmark can
+    subtract upstream time from the latency it measured.
+    """
+    settings = settings or FakeUpstreamSettings()
+    rng = random.Random(settings.seed)
+    app = FastAPI(title="Fake vLLM")
+    app.state.settings = settings
+    app.state.timings = {}
+    app.state.completions = 0
+    app.state.failures = 0
+
+    @app.get("/v1/models")
+    async def list_models():
+        return {
+            "object": "list",
+            "data": [{"id": settings.model_id, "object": "model", "created": 0, "owned_by": "vllm"}],
+        }
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        started = time.perf_counter()
+        body = await request.json()
+        prompt = " ".join(str(message.get("content", "")) for message in body.get("messages", []))
+        marker = MARKER_PATTERN.search(prompt)
+        marker = marker.group(0) if marker else None
+        app.state.completions += 1
+
+        if rng.random() < settings.failure_rate:
+            app.state.failures += 1
+            return JSONResponse(status_code=settings.failure_status, content={"error": {"message": "Injected failure"}})
+
+        model = body.get("model", settings.model_id)
+        completion_id = f"chatcmpl-{app.state.completions}"
+        tokens = max(1, min(settings.completion_tokens, body.get("max_tokens") or settings.completion_tokens))
+        token_delay = 1.0 / settings.tokens_per_second
+        usage = {"prompt_tokens": len(prompt) // 4, "completion_tokens": tokens,
+                 "total_tokens": len(prompt) // 4 + tokens}
+
+        def record():
+            if marker is not None:
+                app.state.timings[marker] = time.perf_counter() - started
+
+        if not body.get("stream"):
+            await asyncio.sleep(settings.ttft + tokens * token_delay)
+            content = "<think>\nPlanning.\n</think>\n\n" + " ".join(["word"] * tokens)
+            record()
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": usage,
+            }
+
+        include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+
+        async def generate():
+            await asyncio.sleep(settings.ttft)
+            yield _chunk(completion_id, model, {"role": "assistant", "content": "<think>\nPlanning.\n</think>\n\n"})
+            for _ in range(tokens):
+                await asyncio.sleep(token_delay)
+                yield _chunk(completion_id, model, {"content": "word "})
+            yield _chunk(completion_id, model, {}, finish_reason="stop")
+            if include_usage:
+                yield _chunk(completion_id, model, {}, usage=usage)
+            yield "data: [DONE]\n\n"
+            record()
+
+        return StreamingResponse(generate(), media_type="text/event-stream")
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a fake OpenAI-compatible upstream")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--ttft", type=float, default=0.05)
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--completion-tokens", type=int, default=64)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--failure-status", type=int, default=503)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    settings = FakeUpstreamSettings(
+        ttft=args.ttft,
+        tokens_per_second=args.tokens_per_second,
+        completion_tokens=args.completion_tokens,
+        failure_rate=args.failure_rate,
+        failure_status=args.failure_status,
+    )
+    uvicorn.run(create_app(settings), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
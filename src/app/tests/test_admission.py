@@ -0,0 +1,41 @@
+import asyncio
+
+import pytest
+
+from app.backend.admission import INTERACTIVE, AdmissionController
+
+
+def test_waiter_cancelled_in_same_tick_as_release():
+    async def scenario():
+        admission = AdmissionController(1, {INTERACTIVE: 4})
+        ticket = await admission.acquire(INTERACTIVE)
+        waiter = asyncio.create_task(admission.acquire(INTERACTIVE))
+        await asyncio.sleep(0)
+        assert admission.queued(INTERACTIVE) == 1
+
+        # The release pops the already-cancelled waiter before it gets to run
+        waiter.cancel()
+        ticket.release()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        return admission
+
+    admission = asyncio.run(scenario())
+    assert admission.in_flight == 0
+    assert admission.queued(INTERACTIVE) == 0
+
+
+def test_cancelled_waiter_leaves_queue():
+    async def scenario():
+        admission = AdmissionController(1, {INTERACTIVE: 4})
+        ticket = await admission.acquire(INTERACTIVE)
+        waiter = asyncio.create_task(admission.acquire(INTERACTIVE))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert admission.queued(INTERACTIVE) == 0
+        ticket.release()
+        return admission
+
+    assert asyncio.run(scenario()).in_flight == 0
@@ -0,0 +1,43 @@
+import asyncio
+
+from app.backend.hedging import HedgePolicy
+from app.backend.router import UpstreamRouter
+
+
+def make_router(latencies):
+    """A router whose successive calls answer after the given delays, without any replicas."""
+    router = UpstreamRouter.__new__(UpstreamRouter)
+    delays = iter(latencies)
+
+    async def call(fn, stream=False, used=None, avoid=None):
+        await asyncio.sleep(next(delays))
+        return "answer"
+
+    router.call = call
+    return router
+
+
+def make_policy():
+    policy = HedgePolicy(percentile=50, budget=1.0, min_delay=0.05, min_samples=1)
+    policy.observe(0.05)
+    return policy
+
+
+def test_losing_primary_is_observed_as_lower_bound():
+    policy = make_policy()
+    router = make_router([5.0, 0.01])
+    assert asyncio.run(router.call_hedged(lambda client: None, policy)) == "answer"
+    assert policy.hedge_wins == 1
+
+    hedge, primary = list(policy._latencies)[1:]
+    assert 0.06 <= primary < 1.0
+    assert hedge < primary - 0.04
+
+
+def test_winning_primary_is_observed_once():
+    policy = make_policy()
+    router = make_router([0.08, 5.0])
+    asyncio.run(router.call_hedged(lambda client: None, policy))
+    assert policy.hedged == 1 and policy.hedge_wins == 0
+    assert len(policy._latencies) == 2
+    assert 0.08 <= policy._latencies[-1] < 1.0
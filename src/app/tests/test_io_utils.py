@@ -0,0 +1,31 @@
+import json
+
+import pytest
+
+from src.utils.io_utils import iter_json_array
+
+DOCUMENTS = [
+    '[1.5e10, 2]',
+    '[-12.25E-3,-7,0,1e5]',
+    '[true, false, null, 123456789]',
+    '["a, b]", "esc\\"aped", {"n": [1.5, "x"]}, [], {}]',
+    '  [\n  {"title": "Soup", "ingredients": ["salt", "water"]},\n  42\n]\n',
+    '[]',
+]
+
+
+@pytest.mark.parametrize("document", DOCUMENTS)
+@pytest.mark.parametrize("chunk_size", list(range(1, 17)) + [1 << 20])
+def test_items_match_json_loads(tmp_path, document, chunk_size):
+    path = tmp_path / "items.json"
+    path.write_text(document, encoding="utf-8")
+    assert list(iter_json_array(str(path), chunk_size=chunk_size)) == json.loads(document)
+
+
+@pytest.mark.parametrize("document", ['[1.5e10x, 2]', '[1, tru]', '[1, 2', '{"a": 1}'])
+@pytest.mark.parametrize("chunk_size", [1, 3, 1 << 20])
+def test_malformed_array_raises(tmp_path, document, chunk_size):
+    path = tmp_path / "items.json"
+    path.write_text(document, encoding="utf-8")
+    with pytest.raises(ValueError):
+        list(iter_json_array(str(path), chunk_size=chunk_size))
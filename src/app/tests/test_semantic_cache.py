@@ -0,0 +1,41 @@
+import pytest
+
+from app.backend.semantic_cache import SemanticCache
+
+CONTEXT = "model|1.0|instructions"
+EIGHT = ["chicken", "rice", "garlic", "onion", "carrot", "celery", "thyme", "butter"]
+
+
+def cache_with(ingredients):
+    cache = SemanticCache(max_entries=100)
+    cache.add(CONTEXT, ingredients, {"recipe": "cached", "ingredients": sorted(ingredients)})
+    return cache
+
+
+@pytest.mark.parametrize("cached, requested", [
+    (["butter", "jelly", "bread"], ["peanut butter", "jelly", "bread"]),
+    (["chicken", "rice", "garlic"], ["chicken", "rice", "garlic", "peanuts"]),
+    (EIGHT, EIGHT + ["walnuts"]),
+])
+def test_superset_is_not_served(cached, requested):
+    assert cache_with(cached).lookup(CONTEXT, requested) is None
+
+
+@pytest.mark.parametrize("cached, requested", [
+    (["peanut butter", "jelly", "bread"], ["butter", "jelly", "bread"]),
+    (["chicken", "rice", "garlic", "peanuts"], ["chicken", "rice", "garlic"]),
+    (EIGHT + ["walnuts"], EIGHT),
+])
+def test_subset_is_not_served(cached, requested):
+    assert cache_with(cached).lookup(CONTEXT, requested) is None
+
+
+def test_respelled_ingredients_are_served():
+    cache = cache_with(["chicken", "rice", "garlic"])
+    hit = cache.lookup(CONTEXT, ["Garlic", "chopped chicken", "rices"])
+    assert hit is not None
+    assert hit[0]["ingredients"] == ["chicken", "garlic", "rice"]
+
+
+def test_other_context_is_not_served():
+    assert cache_with(["chicken", "rice", "garlic"]).lookup("other", ["chicken", "rice", "garlic"]) is None
@@ -0,0 +1,84 @@
+import asyncio
+import json
+import sqlite3
+import time
+
+import pytest
+
+from app.backend.sessions import InMemorySessionStore, SessionTooLargeError, SQLiteSessionStore, message_size
+
+TURN = [{"role": "user", "content": "x" * 100}, {"role": "assistant", "content": "y" * 100}]
+TURN_SIZE = sum(message_size(m) for m in TURN)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_store(request, tmp_path):
+    stores = []
+
+    def make(**limits):
+        if request.param == "memory":
+            store = InMemorySessionStore(**limits)
+        else:
+            store = SQLiteSessionStore(str(tmp_path / "sessions.db"), **limits)
+        stores.append(store)
+        return store
+
+    yield make
+    for store in stores:
+        store.close()
+
+
+def test_session_over_limit_is_rejected(make_store):
+    store = make_store(max_session_bytes=2 * TURN_SIZE)
+
+    async def scenario():
+        with pytest.raises(SessionTooLargeError):
+            await store.create(TURN * 3)
+        session_id = await store.create(TURN)
+        assert await store.append(session_id, TURN)
+        with pytest.raises(SessionTooLargeError):
+            await store.append(session_id, TURN)
+        return await store.get(session_id)
+
+    assert asyncio.run(scenario()) == TURN * 2
+
+
+def test_least_recently_used_session_is_evicted(make_store):
+    store = make_store(max_sessions=2)
+
+    async def scenario():
+        first = await store.create(TURN)
+        second = await store.create(TURN)
+        await store.get(first)
+        third = await store.create(TURN)
+        return [await store.get(session_id) is not None for session_id in (first, second, third)]
+
+    assert asyncio.run(scenario()) == [True, False, True]
+
+
+def test_append_to_missing_session_returns_false(make_store):
+    store = make_store()
+    assert asyncio.run(store.append("missing", TURN)) is False
+
+
+def test_sqlite_sizes_backfilled_for_old_databases(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        "CREATE TABLE sessions (session_id TEXT PRIMARY KEY, last_access REAL NOT NULL);"
+        "CREATE TABLE messages (session_id TEXT NOT NULL, seq INTEGER NOT NULL, message TEXT NOT NULL,"
+        "  PRIMARY KEY (session_id, seq));"
+    )
+    conn.execute("INSERT INTO sessions VALUES ('old', ?)", (time.time(),))
+    conn.executemany(
+        "INSERT INTO messages VALUES ('old', ?, ?)", [(i, json.dumps(m)) for i, m in enumerate(TURN)]
+    )
+    conn.commit()
+    conn.close()
+
+    store = SQLiteSessionStore(path, max_session_bytes=TURN_SIZE + 1)
+    try:
+        with pytest.raises(SessionTooLargeError):
+            asyncio.run(store.append("old", TURN))
+    finally:
+        store.close()
@@ -0,0 +1,40 @@
+import pytest
+
+from app.backend.streaming import ThinkTagStripper, strip_think
+
+RESPONSES = [
+    "<think>Eggs first.</think>\n\nWhisk the eggs.",
+    "  <think>\nhmm\n</think>Whisk the eggs.",
+    "Eggs first, then butter.</think>\n\nWhisk the eggs.",
+    "<think>Eggs first, then butter.",
+    "<think>a</think>b</think>c",
+    "Whisk the eggs.",
+    "Whisk the eggs. <b>Serve</b> warm.",
+    "<thin",
+    "",
+    "   ",
+    "<think></think>",
+    "<think>x</think>   </think>  Serve.",
+]
+
+
+def stream(text, size):
+    stripper = ThinkTagStripper()
+    parts = [stripper.feed(text[i:i + size]) for i in range(0, len(text), size)]
+    return "".join(parts) + stripper.flush()
+
+
+@pytest.mark.parametrize("text", RESPONSES)
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 8, 1000])
+def test_stream_matches_strip_think(text, size):
+    assert stream(text, size) == strip_think(text)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("<think>Eggs first.</think>\n\nWhisk the eggs.", "Whisk the eggs."),
+    ("Eggs first.</think>Whisk the eggs.", "Whisk the eggs."),
+    ("<think>Eggs first.", ""),
+    ("Whisk the eggs.", "Whisk the eggs."),
+])
+def test_strip_think(text, expected):
+    assert strip_think(text) == expected
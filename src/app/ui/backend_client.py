@@ -0,0 +1,144 @@
+"""
+HTTP client for the Cook Assistant backend, used by the Streamlit UI.
+
+All calls share one pooled `requests.Session` per process (cached with
+`st.cache_resource`), so keep-alive connections survive Streamlit reruns.
+Generations use the backend's server-sent-event endpoints and are yielded
+token by token for progressive rendering. Chat turns go through a
+server-side session, so each request carries only the new message.
+"""
+
+import json
+import os
+from typing import Iterator, List, Optional
+
+import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
+
+API_BASE_URL = os.getenv("BACKEND_URL", "http://localhost:8080")
+
+# Seconds to connect, and the longest silence allowed between streamed chunks
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 60
+# The backend answers /health from a cached probe; re-checking more often than this is wasted work
+HEALTH_TTL_SECONDS = 10
+
+
+class BackendError(Exception):
+    """The backend could not be reached or returned an error."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+@st.cache_resource
+def get_session() -> requests.Session:
+    """Process-wide pooled session shared by every browser session and rerun."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _error_detail(response: requests.Response) -> str:
+    try:
+        return response.json().get("detail", "Unknown error")
+    except ValueError:
+        return f"Backend returned HTTP {response.status_code}"
+
+
+@st.cache_data(ttl=HEALTH_TTL_SECONDS, show_spinner=False)
+def check_backend_health() -> dict:
+    """Check if the backend is healthy. Cached for `HEALTH_TTL_SECONDS`."""
+    try:
+        response = get_session().get(f"{API_BASE_URL}/health", timeout=CONNECT_TIMEOUT)
+        if response.ok and response.json().get("status") == "healthy":
+            return {"status": "healthy", "data": response.json()}
+        elif response.ok:
+            return {"status": "error", "message": response.json().get("last_error") or "Model endpoint unreachable"}
+        else:
+            return {"status": "error", "message": "Backend returned an error"}
+    except requests.exceptions.RequestException as e:
+        return {"status": "error", "message": str(e)}
+
+
+def _stream_tokens(path: str, payload: dict) -> Iterator[str]:
+    """
+    POST to a server-sent-event endpoint and yield the visible text chunks.
+
+    Raises:
+        BackendError: On connection failures, error statuses, `error` events
+            and streams that end without a `done` event
+    """
+    try:
+        with get_session().post(
+            f"{API_BASE_URL}{path}",
+            json=payload,
+            stream=True,
+            timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)
+        ) as response:
+            if not response.ok:
+                raise BackendError(_error_detail(response), response.status_code)
+            event = None
+            for raw_line in response.iter_lines():
+                line = raw_line.decode("utf-8")
+                if line.startswith("event:"):
+                    event = line[len("event:"):].strip()
+                elif line.startswith("data:"):
+                    data = json.loads(line[len("data:"):].strip())
+                    if event == "token":
+                        yield data["content"]
+                    elif event == "error":
+                        raise BackendError(data.get("detail", "Generation failed"))
+                    elif event == "done":
+                        return
+            # The connection closed cleanly but the reply never finished (backend restart, proxy timeout)
+            raise BackendError("The reply was cut off before it finished; please try again")
+    except requests.exceptions.RequestException as e:
+        raise BackendError(str(e)) from e
+
+
+def stream_recipe(ingredients: List[str], additional_instructions: Optional[str] = None) -> Iterator[str]:
+    """Generate a recipe from ingredients, yielding it as it is written."""
+    payload = {
+        "ingredients": ingredients,
+        "additional_instructions": additional_instructions,
+        "temperature": 1.0,
+        "max_tokens": 1024
+    }
+    return _stream_tokens("/generate-recipe/stream", payload)
+
+
+def create_chat_session(conversation_history: Optional[List[dict]] = None) -> str:
+    """Start a server-side chat session, optionally seeded with prior turns, and return its id."""
+    try:
+        response = get_session().post(
+            f"{API_BASE_URL}/sessions",
+            json={"conversation_history": conversation_history},
+            timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)
+        )
+    except requests.exceptions.RequestException as e:
+        raise BackendError(str(e)) from e
+    if not response.ok:
+        raise BackendError(_error_detail(response), response.status_code)
+    return response.json()["session_id"]
+
+
+def stream_chat_message(message: str, session_id: str) -> Iterator[str]:
+    """
+    Send a chat message within a session, yielding the reply as it is written.
+
+    The backend reads the earlier turns from the session and appends this one.
+
+    Raises:
+        BackendError: With `status_code` 404 if the session has expired
+    """
+    payload = {
+        "message": message,
+        "session_id": session_id,
+        "temperature": 1.0
+    }
+    return _stream_tokens("/chat/stream", payload)
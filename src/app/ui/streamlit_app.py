@@ -5,13 +5,17 @@ A modern web interface for the Cook Assistant AI.
 """
 
 import streamlit as st
-import requests
-from typing import List, Optional
-import json
-import os
+from typing import Callable, Iterator
 
-# Configuration
-API_BASE_URL = os.getenv("BACKEND_URL", "http://localhost:8080")
+# Streamlit puts this script's directory on sys.path
+from backend_client import (
+    API_BASE_URL,
+    BackendError,
+    check_backend_health,
+    create_chat_session,
+    stream_chat_message,
+    stream_recipe,
+)
 
 # Page configuration
 st.set_page_config(
@@ -107,61 +111,48 @@ if 'chat_history' not in st.session_state:
     st.session_state.chat_history = []
 if 'conversation_history' not in st.session_state:
     st.session_state.conversation_history = []
+if 'chat_session_id' not in st.session_state:
+    st.session_state.chat_session_id = None
 if 'generated_recipe' not in st.session_state:
     st.session_state.generated_recipe = None
 
 # Helper functions
-def check_backend_health() -> dict:
-    """Check if the backend is healthy."""
-    try:
-        response = requests.get(f"{API_BASE_URL}/health", timeout=5)
-        if response.ok:
-            return {"status": "healthy", "data": response.json()}
-        else:
-            return {"status": "error", "message": "Backend returned an error"}
-    except requests.exceptions.RequestException as e:
-        return {"status": "error", "message": str(e)}
+def render_stream(placeholder, chunks: Iterator[str], render: Callable[[str], str]) -> str:
+    """Fill `placeholder` as chunks arrive and return the full text."""
+    text = ""
+    for chunk in chunks:
+        text += chunk
+        placeholder.markdown(render(text + "▌"), unsafe_allow_html=True)
+    placeholder.markdown(render(text), unsafe_allow_html=True)
+    return text
 
-def generate_recipe(ingredients: List[str], additional_instructions: Optional[str] = None) -> dict:
-    """Generate a recipe from ingredients."""
+def stream_chat_reply(message: str) -> Iterator[str]:
+    """Stream the reply through the backend chat session, starting a new one if it expired."""
+    if st.session_state.chat_session_id is None:
+        st.session_state.chat_session_id = create_chat_session(st.session_state.conversation_history)
     try:
-        payload = {
-            "ingredients": ingredients,
-            "additional_instructions": additional_instructions,
-            "temperature": 1.0,
-            "max_tokens": 1024
-        }
-        response = requests.post(
-            f"{API_BASE_URL}/generate-recipe",
-            json=payload,
-            timeout=60
-        )
-        if response.ok:
-            return {"status": "success", "data": response.json()}
-        else:
-            return {"status": "error", "message": response.json().get("detail", "Unknown error")}
-    except requests.exceptions.RequestException as e:
-        return {"status": "error", "message": str(e)}
+        yield from stream_chat_message(message, st.session_state.chat_session_id)
+    except BackendError as e:
+        if e.status_code != 404:
+            raise
+        # The session expired on the backend; seed a new one with the turns shown so far
+        st.session_state.chat_session_id = create_chat_session(st.session_state.conversation_history)
+        yield from stream_chat_message(message, st.session_state.chat_session_id)
 
-def send_chat_message(message: str, conversation_history: List[dict]) -> dict:
-    """Send a chat message to the assistant."""
-    try:
-        payload = {
-            "message": message,
-            "conversation_history": conversation_history,
-            "temperature": 1.0
-        }
-        response = requests.post(
-            f"{API_BASE_URL}/chat",
-            json=payload,
-            timeout=60
-        )
-        if response.ok:
-            return {"status": "success", "data": response.json()}
-        else:
-            return {"status": "error", "message": response.json().get("detail", "Unknown error")}
-    except requests.exceptions.RequestException as e:
-        return {"status": "error", "message": str(e)}
+def recipe_html(recipe: str) -> str:
+    return f"""
+            <div class="recipe-content">
+                {recipe}
+            </div>
+            """
+
+def assistant_message_html(content: str) -> str:
+    return f"""
+                <div class="chat-message assistant-message">
+                    <strong>👨‍🍳 Cook Assistant</strong><br><br>
+                    {content}
+                </div>
+                """
 
 # Header
 st.markdown("""
@@ -209,6 +200,7 @@ with st.sidebar:
     st.subheader("🔗 API Endpoints")
     st.code(API_BASE_URL, language=None)
     if st.button("🔄 Refresh Connection"):
+        check_backend_health.clear()
         st.rerun()
 
 # Main content - Tabs
@@ -262,18 +254,26 @@ with tab1:
         # Generate button
         col1, col2, col3 = st.columns([1, 2, 1])
         with col2:
-            if st.button("✨ Generate Recipe", type="primary", use_container_width=True):
-                with st.spinner("🔮 Generating your recipe..."):
-                    result = generate_recipe(
-                        st.session_state.ingredients,
-                        additional_instructions if additional_instructions else None
-                    )
-                    
-                    if result["status"] == "success":
-                        st.session_state.generated_recipe = result["data"]
-                        st.success("✅ Recipe generated successfully!")
-                    else:
-                        st.error(f"❌ Error: {result['message']}")
+            generate_clicked = st.button("✨ Generate Recipe", type="primary", use_container_width=True)
+        
+        if generate_clicked:
+            st.session_state.generated_recipe = None
+            ingredients = list(st.session_state.ingredients)
+            preview = st.empty()
+            try:
+                # Show the recipe as it is written
+                recipe = render_stream(
+                    preview,
+                    stream_recipe(ingredients, additional_instructions if additional_instructions else None),
+                    recipe_html
+                )
+            except BackendError as e:
+                preview.empty()
+                st.error(f"❌ Error: {e}")
+            else:
+                preview.empty()
+                st.session_state.generated_recipe = {"recipe": recipe, "ingredients_used": ingredients}
+                st.success("✅ Recipe generated successfully!")
         
         # Display recipe
         if st.session_state.generated_recipe:
@@ -287,11 +287,7 @@ with tab1:
             </div>
             """, unsafe_allow_html=True)
             
-            st.markdown(f"""
-            <div class="recipe-content">
-                {recipe_data['recipe']}
-            </div>
-            """, unsafe_allow_html=True)
+            st.markdown(recipe_html(recipe_data['recipe']), unsafe_allow_html=True)
             
             st.caption(f"**Ingredients used:** {', '.join(recipe_data['ingredients_used'])}")
             
@@ -334,12 +330,7 @@ with tab2:
                 </div>
                 """, unsafe_allow_html=True)
             else:
-                st.markdown(f"""
-                <div class="chat-message assistant-message">
-                    <strong>👨‍🍳 Cook Assistant</strong><br><br>
-                    {message['content']}
-                </div>
-                """, unsafe_allow_html=True)
+                st.markdown(assistant_message_html(message['content']), unsafe_allow_html=True)
     
     # Chat input
     st.divider()
@@ -365,32 +356,43 @@ with tab2:
             "content": chat_input
         })
         
-        # Send to backend
-        with st.spinner("🤔 Thinking..."):
-            result = send_chat_message(chat_input, st.session_state.conversation_history)
+        # Show the new turn right away and fill in the reply as it streams
+        with chat_container:
+            st.markdown(f"""
+            <div class="chat-message user-message">
+                <strong>👤 You</strong><br><br>
+                {chat_input}
+            </div>
+            """, unsafe_allow_html=True)
+            reply = st.empty()
+        
+        try:
+            assistant_response = render_stream(
+                reply,
+                stream_chat_reply(chat_input),
+                assistant_message_html
+            )
+        except BackendError as e:
+            reply.empty()
+            st.error(f"❌ Error: {e}")
+        else:
+            # Add to chat history
+            st.session_state.chat_history.append({
+                "role": "assistant",
+                "content": assistant_response
+            })
             
-            if result["status"] == "success":
-                assistant_response = result["data"]["response"]
-                
-                # Add to chat history
-                st.session_state.chat_history.append({
-                    "role": "assistant",
-                    "content": assistant_response
-                })
-                
-                # Update conversation history for context
-                st.session_state.conversation_history.append({
-                    "role": "user",
-                    "content": chat_input
-                })
-                st.session_state.conversation_history.append({
-                    "role": "assistant",
-                    "content": assistant_response
-                })
-                
-                st.rerun()
-            else:
-                st.error(f"❌ Error: {result['message']}")
+            # Update conversation history for context
+            st.session_state.conversation_history.append({
+                "role": "user",
+                "content": chat_input
+            })
+            st.session_state.conversation_history.append({
+                "role": "assistant",
+                "content": assistant_response
+            })
+            
+            st.rerun()
     
     # Clear chat button
     if st.session_state.chat_history:
@@ -400,6 +402,7 @@ with tab2:
             if st.button("🗑️ Clear Chat History", use_container_width=True):
                 st.session_state.chat_history = []
                 st.session_state.conversation_history = []
+                st.session_state.chat_session_id = None
                 st.rerun()
 
 # Footer
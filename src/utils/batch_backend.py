@@ -0,0 +1,158 @@
+"""
+OpenAI Batch API execution for the dataset curator calls.
+
+Each step of a curator task is rendered into batch JSONL files (one request
+per recipe, `custom_id` = recipe id), uploaded and submitted as batches,
+polled until they finish, and the results are mapped back by `custom_id`.
+Submitted batch ids are recorded in `<work_dir>/batches.json`, so re-running
+after an interruption waits for the batches already paid for instead of
+submitting them again.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+from typing import Any, Dict, List, Tuple
+
+from openai import AsyncOpenAI
+
+from src.utils.data_generators import chat_request_body
+
+ENDPOINT = "/v1/chat/completions"
+TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+class BatchRunner:
+    """
+    Runs sets of chat completion requests through the Batch API.
+
+    Args:
+        client: Client for the provider (or a local stand-in batch server)
+        model_name: Model every request is sent to
+        work_dir: Where batch input files and the batch id record are kept
+        completion_window: Batch completion window requested from the provider
+        poll_interval: Seconds between status checks
+        max_requests_per_batch: Requests per input file (the provider caps this)
+    """
+
+    def __init__(self, client: AsyncOpenAI, model_name: str, work_dir: str, completion_window: str = "24h",
+                 poll_interval: float = 30.0, max_requests_per_batch: int = 50000):
+        self.client = client
+        self.model_name = model_name
+        self.work_dir = work_dir
+        self.completion_window = completion_window
+        self.poll_interval = poll_interval
+        self.max_requests_per_batch = max_requests_per_batch
+        self._state_path = os.path.join(work_dir, "batches.json")
+        os.makedirs(work_dir, exist_ok=True)
+        if os.path.exists(self._state_path):
+            with open(self._state_path, "r") as f:
+                self._state = json.load(f)
+        else:
+            self._state = {}
+
+    def _save_state(self):
+        with open(self._state_path + ".tmp", "w") as f:
+            json.dump(self._state, f, indent=4)
+        os.replace(self._state_path + ".tmp", self._state_path)
+
+    def _write_input(self, name: str, requests: List[Tuple[str, Any, str]]) -> Tuple[str, str]:
+        """Write one batch input file; returns its path and content digest."""
+        path = os.path.join(self.work_dir, f"{name}.jsonl")
+        digest = hashlib.sha1()
+        with open(path, "wb") as f:
+            for custom_id, payload, system_prompt in requests:
+                line = json.dumps({
+                    "custom_id": custom_id,
+                    "method": "POST",
+                    "url": ENDPOINT,
+                    "body": chat_request_body(payload, system_prompt, self.model_name),
+                }, ensure_ascii=False).encode("utf-8") + b"\n"
+                digest.update(line)
+                f.write(line)
+        return path, digest.hexdigest()
+
+    async def _submit(self, name: str, path: str, digest: str) -> str:
+        entry = self._state.get(name)
+        if entry and entry["input_sha1"] == digest:
+            batch = await self.client.batches.retrieve(entry["batch_id"])
+            # Submit again if the batch as a whole failed (e.g. input validation) or the provider gave up on it
+            if batch.status not in ("failed", "expired", "cancelled"):
+                print(f"{name}: resuming batch {batch.id}")
+                return batch.id
+        with open(path, "rb") as f:
+            input_file = await self.client.files.create(file=f, purpose="batch")
+        batch = await self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=ENDPOINT,
+            completion_window=self.completion_window
+        )
+        self._state[name] = {"batch_id": batch.id, "input_sha1": digest}
+        self._save_state()
+        print(f"{name}: submitted batch {batch.id}")
+        return batch.id
+
+    async def _wait(self, name: str, batch_id: str):
+        last = None
+        while True:
+            batch = await self.client.batches.retrieve(batch_id)
+            counts = batch.request_counts
+            progress = (batch.status, counts.completed + counts.failed if counts else 0)
+            if progress != last:
+                total = counts.total if counts else "?"
+                print(f"{name}: {batch.status}, {progress[1]}/{total} requests done")
+                last = progress
+            if batch.status in TERMINAL_STATUSES:
+                return batch
+            await asyncio.sleep(self.poll_interval)
+
+    async def _results(self, name: str, batch) -> Dict[str, Any]:
+        """Parsed JSON answers of the batch's successful requests, by custom id."""
+        results = {}
+        if batch.output_file_id:
+            content = await self.client.files.content(batch.output_file_id)
+            for line in content.text.splitlines():
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                response = record.get("response") or {}
+                if response.get("status_code") != 200:
+                    continue
+                try:
+                    message = response["body"]["choices"][0]["message"]["content"]
+                    results[record["custom_id"]] = json.loads(message)
+                except (KeyError, IndexError, TypeError, ValueError) as e:
+                    print(f"\n{name}: unusable answer for {record.get('custom_id')}: {e}")
+        if batch.status != "completed":
+            print(f"\n{name}: batch {batch.id} ended {batch.status}; keeping {len(results)} results")
+        return results
+
+    async def _run_one(self, name: str, requests: List[Tuple[str, Any, str]]) -> Dict[str, Any]:
+        path, digest = self._write_input(name, requests)
+        batch_id = await self._submit(name, path, digest)
+        batch = await self._wait(name, batch_id)
+        results = await self._results(name, batch)
+        failed = len(requests) - len(results)
+        if failed:
+            print(f"\n{name}: {failed} of {len(requests)} requests failed")
+        return results
+
+    async def run(self, name: str, requests: Dict[str, Tuple[Any, str]]) -> Dict[str, Any]:
+        """
+        Run `{custom_id: (user content, system prompt)}` as batches.
+
+        Batches of one call are submitted and polled together; `name`
+        identifies them across runs, so use the same name for the same step.
+
+        Returns:
+            Parsed JSON answer per custom id; failed requests are left out
+        """
+        items = [(custom_id, payload, system_prompt) for custom_id, (payload, system_prompt) in requests.items()]
+        chunks = [items[i:i + self.max_requests_per_batch] for i in range(0, len(items), self.max_requests_per_batch)]
+        results: Dict[str, Any] = {}
+        for chunk_results in await asyncio.gather(
+            *(self._run_one(f"{name}-{i + 1}", chunk) for i, chunk in enumerate(chunks))
+        ):
+            results.update(chunk_results)
+        return results
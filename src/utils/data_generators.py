@@ -1,24 +1,73 @@
+import asyncio
 import json
+import httpx
 from openai import AsyncOpenAI
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
 import os
 from src.prompts.dataset_prompts import QA_PAIR_PROMPT, CONSTRAINT_GENERATOR_PROMPT, CONSTRAINT_ADAPTATION_PROMPT, RECIPE_SUMMARY_PROMPT
+from src.utils.rate_limiter import RateLimiter
 from dotenv import load_dotenv
 
 load_dotenv()
 
-async def generate(recipe: Dict[str, Any], system_prompt: str, model_name: str):
-    client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-    response = await client.chat.completions.create(
-        model=model_name,
-        messages=[
+# Shared quota of the dataset curator model's API key, across every task in the process
+rate_limiter = RateLimiter(
+    rpm=float(os.getenv("DATASET_CURATOR_RPM", "500")),
+    tpm=float(os.getenv("DATASET_CURATOR_TPM", "200000"))
+)
+
+_client: Optional[AsyncOpenAI] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+def get_client() -> AsyncOpenAI:
+    """
+    The process-wide OpenAI client, so every call reuses one connection pool.
+
+    Recreated when called from a new event loop, since the pool is bound to
+    the loop it was opened in.
+    """
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop:
+        max_connections = int(os.getenv("DATASET_CURATOR_MAX_CONNECTIONS", "100"))
+        _client = AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+                timeout=httpx.Timeout(120.0, connect=10.0)
+            )
+        )
+        _client_loop = loop
+    return _client
+
+async def close_client():
+    global _client, _client_loop
+    if _client is not None:
+        await _client.close()
+    _client, _client_loop = None, None
+
+def chat_request_body(recipe: Any, system_prompt: str, model_name: str) -> Dict[str, Any]:
+    """Chat completion request of one curator call, as sent live or written to a batch file."""
+    return {
+        "model": model_name,
+        "messages": [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": str(recipe)}
         ],
-        temperature=1,
-        response_format={"type": "json_object"},
+        "temperature": 1,
+        "response_format": {"type": "json_object"},
+    }
 
-    )
+async def generate(recipe: Dict[str, Any], system_prompt: str, model_name: str):
+    body = chat_request_body(recipe, system_prompt, model_name)
+    estimated_tokens = rate_limiter.estimate(system_prompt + body["messages"][1]["content"])
+    await rate_limiter.acquire(estimated_tokens)
+    usage = None
+    try:
+        response = await get_client().chat.completions.create(**body)
+        usage = response.usage
+    finally:
+        rate_limiter.settle(estimated_tokens, usage)
     result = json.loads(response.choices[0].message.content)
     return result
 
@@ -41,11 +90,19 @@ async def generate_ingredient_extraction_samples(recipe: Dict[str, Any]):
     {"role": "user", "content": prompt},
     {"role": "assistant", "content": ingredients_text}]
 
-async def constraint_generator_samples(recipe: Dict[str, Any]):
-    constraint_result = await generate(recipe, CONSTRAINT_GENERATOR_PROMPT, os.getenv('DATASET_CURATOR_MODEL'))
-    constraint_text = constraint_result['constraint']
-    adapted_recipe = await generate(constraint_text, CONSTRAINT_ADAPTATION_PROMPT.format(recipe=recipe), os.getenv('DATASET_CURATOR_MODEL'))
-    altered_recipe = adapted_recipe['altered recipe']
+# Curator tasks are chains of JSON-mode calls. Each step returns the (user content, system prompt)
+# of one call, given the recipe and the results of the earlier steps; the sample builder turns the
+# recipe and all results into a sample. Live generation and the batch backend share both.
+
+def constraint_step(recipe: Dict[str, Any], results: List[Dict[str, Any]]) -> Tuple[Any, str]:
+    return recipe, CONSTRAINT_GENERATOR_PROMPT
+
+def constraint_adaptation_step(recipe: Dict[str, Any], results: List[Dict[str, Any]]) -> Tuple[Any, str]:
+    return results[0]['constraint'], CONSTRAINT_ADAPTATION_PROMPT.format(recipe=recipe)
+
+def constraint_sample(recipe: Dict[str, Any], results: List[Dict[str, Any]]):
+    constraint_text = results[0]['constraint']
+    altered_recipe = results[1]['altered recipe']
     ingredients_list = ', '.join(altered_recipe['ingredients'])
     directions_list = '\n'.join(altered_recipe['directions'])
     system_prompt = "You are a helpful assistant that is expert in culinary cuisines, given the following constraint, create a recipe that is adapted to it. Make sure to keep the flavor profile similar to the provided recipe."
@@ -53,21 +110,48 @@ async def constraint_generator_samples(recipe: Dict[str, Any]):
     {"role": "user", "content": constraint_text},
     {"role": "assistant", "content": f"The ingredients for {altered_recipe['title']} are {ingredients_list} and here's the full recipe for it: \n{directions_list}"}]
 
-async def recipe_summary_samples(recipe: Dict[str, Any]):
+def recipe_summary_step(recipe: Dict[str, Any], results: List[Dict[str, Any]]) -> Tuple[Any, str]:
+    return recipe, RECIPE_SUMMARY_PROMPT
+
+def recipe_summary_sample(recipe: Dict[str, Any], results: List[Dict[str, Any]]):
     system_prompt = "Summarize the recipe in 1-2 sentences. Focus on the main cooking method and key ingredients."
-    summarized_recipe = await generate(recipe, RECIPE_SUMMARY_PROMPT, os.getenv('DATASET_CURATOR_MODEL'))
     return [{"role": "system", "content": system_prompt},
     {"role": "user", "content": str(recipe)},
-    {"role": "assistant", "content": summarized_recipe['summary']}]
+    {"role": "assistant", "content": results[0]['summary']}]
 
-async def generate_qa_pair_samples(recipe: Dict[str, Any]):
+def qa_pair_step(recipe: Dict[str, Any], results: List[Dict[str, Any]]) -> Tuple[Any, str]:
+    return recipe, QA_PAIR_PROMPT
+
+def qa_pair_sample(recipe: Dict[str, Any], results: List[Dict[str, Any]]):
     system_prompt = f"You are a helpful assistant that is expert in culinary cuisines, given the following recipe and question. Make sure to keep the answer in context of the recipe.\n# Recipe: {recipe}"
-    qa_pair = await generate(recipe, QA_PAIR_PROMPT, os.getenv('DATASET_CURATOR_MODEL'))
-    question, answer = qa_pair['question'], qa_pair['answer']
+    question, answer = results[0]['question'], results[0]['answer']
     return [{"role": "system", "content": system_prompt},
     {"role": "user", "content": question},
     {"role": "assistant", "content": answer}]
 
+# Task name -> (steps, sample builder)
+CURATOR_TASKS = {
+    "Constraint Generator": ([constraint_step, constraint_adaptation_step], constraint_sample),
+    "Recipe Summary": ([recipe_summary_step], recipe_summary_sample),
+    "QA Pair Generation": ([qa_pair_step], qa_pair_sample),
+}
+
+async def run_curator_steps(recipe: Dict[str, Any], steps, build_sample):
+    results = []
+    for step in steps:
+        payload, system_prompt = step(recipe, results)
+        results.append(await generate(payload, system_prompt, os.getenv('DATASET_CURATOR_MODEL')))
+    return build_sample(recipe, results)
+
+async def constraint_generator_samples(recipe: Dict[str, Any]):
+    return await run_curator_steps(recipe, *CURATOR_TASKS["Constraint Generator"])
+
+async def recipe_summary_samples(recipe: Dict[str, Any]):
+    return await run_curator_steps(recipe, *CURATOR_TASKS["Recipe Summary"])
+
+async def generate_qa_pair_samples(recipe: Dict[str, Any]):
+    return await run_curator_steps(recipe, *CURATOR_TASKS["QA Pair Generation"])
+
 
 
 
@@ -1,7 +1,15 @@
 import json
+import mmap
 import os
+import re
+from array import array
 from tqdm import tqdm
 
+# Whitespace and commas between the items of a JSON array
+ARRAY_SEPARATORS = re.compile(r"[\s,]*")
+# What may follow a bare number or literal inside a JSON array
+SCALAR_END = re.compile(r"[\s,\]]")
+
 def load_json(file_path):
     with open(file_path, 'r') as file:
         return json.load(file)
@@ -19,6 +27,55 @@ def save_jsonl(data, file_path):
         for ex in data:
             f.write(json.dumps(ex, ensure_ascii=False) + "\n")
         
+def iter_jsonl(file_path):
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def append_jsonl(record, file):
+    """Append one record to an open JSONL file and flush it, so it survives a crash."""
+    file.write(json.dumps(record, ensure_ascii=False) + "\n")
+    file.flush()
+
+def repair_jsonl(file_path):
+    """Cut a torn last line (a write interrupted by a crash) off an append-only JSONL file."""
+    if not os.path.exists(file_path):
+        return
+    with open(file_path, 'rb+') as f:
+        size = f.seek(0, os.SEEK_END)
+        if size == 0:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            return
+        # Find the end of the last complete line
+        end = size - 1
+        while end > 0:
+            start = max(0, end - (1 << 16))
+            f.seek(start)
+            newline = f.read(end - start).rfind(b"\n")
+            if newline >= 0:
+                end = start + newline + 1
+                break
+            end = start
+        f.truncate(end)
+
+def write_json_array(items, file_path):
+    """Write an iterable as a JSON array one item at a time, never holding it whole; returns the count."""
+    dir_path = os.path.dirname(file_path)
+    if dir_path:
+        os.makedirs(dir_path, exist_ok=True)
+    count = 0
+    with open(file_path, 'w', encoding='utf-8') as f:
+        f.write("[")
+        for item in items:
+            f.write(",\n" if count else "\n")
+            f.write(json.dumps(item, ensure_ascii=False))
+            count += 1
+        f.write("\n]\n" if count else "]\n")
+    return count
+
 def process_str_to_list(file_path, save_path):
     json_data = load_json(file_path)
     for item in tqdm(json_data, desc="Processing JSON data", total=len(json_data)):
@@ -30,4 +87,160 @@ def create_json_subset(file_path, save_path, num_items):
     json_data = load_json(file_path)
     json_data = json_data[:num_items]
     save_json(json_data, save_path)
-    return json_data
\ No newline at end of file
+    return json_data
+
+def iter_json_array(file_path, chunk_size=1 << 20):
+    """Yield the items of a top-level JSON array one by one, reading the file in chunks."""
+    decoder = json.JSONDecoder()
+    with open(file_path, 'r', encoding='utf-8') as file:
+        buffer, pos = "", 0
+
+        def fill():
+            # Drop what has been consumed and append the next chunk; False at EOF
+            nonlocal buffer, pos
+            chunk = file.read(chunk_size)
+            if not chunk:
+                return False
+            buffer, pos = buffer[pos:] + chunk, 0
+            return True
+
+        opened = False
+        while True:
+            if not opened:
+                pos = len(buffer) - len(buffer[pos:].lstrip())
+            else:
+                pos = ARRAY_SEPARATORS.match(buffer, pos).end()
+            if pos >= len(buffer):
+                if not fill():
+                    raise ValueError(f"{file_path}: unexpected end of JSON array")
+                continue
+            if not opened:
+                if buffer[pos] != '[':
+                    raise ValueError(f"{file_path} does not hold a JSON array")
+                opened, pos = True, pos + 1
+                continue
+            if buffer[pos] == ']':
+                return
+            scalar_end = None
+            if buffer[pos] not in '{["':
+                # A bare number or literal may continue in the next chunk ("1" then ".5e10");
+                # only decode it once the delimiter after it is buffered
+                scalar_end = SCALAR_END.search(buffer, pos)
+                if scalar_end is None:
+                    if not fill():
+                        raise ValueError(f"{file_path}: unexpected end of JSON array")
+                    continue
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # The item runs past the end of the buffer
+                if scalar_end is not None or not fill():
+                    raise
+                continue
+            if scalar_end is not None and end != scalar_end.start():
+                raise json.JSONDecodeError("Expecting ',' delimiter", buffer, end)
+            yield item
+            pos = end
+
+def corpus_index_path(jsonl_path):
+    return jsonl_path + ".idx"
+
+def convert_json_to_jsonl(json_path, jsonl_path, index_path=None):
+    """
+    Rewrite a JSON array file as JSONL with a byte-offset index, without loading it whole.
+
+    The index holds native int64 offsets: the start of each record, then the
+    end of the file. Both files are written to temporaries and renamed, so an
+    interrupted conversion never leaves a partial corpus behind.
+
+    Returns:
+        Number of records written
+    """
+    index_path = index_path or corpus_index_path(jsonl_path)
+    dir_path = os.path.dirname(jsonl_path)
+    if dir_path:
+        os.makedirs(dir_path, exist_ok=True)
+    offsets = array('q', [0])
+    with open(jsonl_path + ".tmp", 'wb') as f:
+        for item in tqdm(iter_json_array(json_path), desc=f"Indexing {os.path.basename(json_path)}"):
+            line = json.dumps(item, ensure_ascii=False).encode('utf-8') + b"\n"
+            f.write(line)
+            offsets.append(offsets[-1] + len(line))
+    with open(index_path + ".tmp", 'wb') as f:
+        offsets.tofile(f)
+    os.replace(jsonl_path + ".tmp", jsonl_path)
+    os.replace(index_path + ".tmp", index_path)
+    return len(offsets) - 1
+
+class CorpusReader:
+    """
+    Lazy, random access to a JSONL corpus through its byte-offset index.
+
+    The corpus and the index are memory-mapped, so opening is cheap and
+    `reader[i]` or `reader[start:stop]` parses only the records asked for.
+    Slices return lists; `iter(start, stop)` yields records one at a time.
+    """
+
+    def __init__(self, jsonl_path, index_path=None):
+        self.path = jsonl_path
+        index_path = index_path or corpus_index_path(jsonl_path)
+        self._file = open(jsonl_path, 'rb')
+        self._index_file = open(index_path, 'rb')
+        # mmap cannot map an empty file
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(jsonl_path) else b""
+        self._index = mmap.mmap(self._index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._offsets = memoryview(self._index).cast('q')
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step == 1:
+                return list(self.iter(start, stop))
+            return [self[i] for i in range(start, stop, step)]
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError("corpus index out of range")
+        return json.loads(self._data[self._offsets[key]:self._offsets[key + 1]])
+
+    def __iter__(self):
+        return self.iter()
+
+    def iter(self, start=0, stop=None, block=1024):
+        """Yield records `start` to `stop`, reading `block` consecutive lines per slice of the map."""
+        stop = len(self) if stop is None else min(stop, len(self))
+        for first in range(start, stop, block):
+            last = min(first + block, stop)
+            lines = self._data[self._offsets[first]:self._offsets[last]].split(b"\n")
+            for line in lines[:-1]:
+                yield json.loads(line)
+
+    def close(self):
+        self._offsets.release()
+        self._index.close()
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._file.close()
+        self._index_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def open_corpus(json_path, jsonl_path=None):
+    """
+    Open a JSON array corpus for lazy access, converting it to indexed JSONL first if needed.
+
+    The JSONL copy sits next to the source (`recipes.json` -> `recipes.jsonl`)
+    and is rebuilt only when it is missing or older than the source.
+    """
+    jsonl_path = jsonl_path or os.path.splitext(json_path)[0] + ".jsonl"
+    index_path = corpus_index_path(jsonl_path)
+    if not os.path.exists(index_path) or os.path.getmtime(index_path) < os.path.getmtime(json_path):
+        convert_json_to_jsonl(json_path, jsonl_path, index_path)
+    return CorpusReader(jsonl_path, index_path)
@@ -0,0 +1,137 @@
+import asyncio
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """
+    Refills at `per_minute / 60` units per second, holding at most `capacity`.
+
+    The level may go negative when a charge is corrected upward after the
+    fact; later acquisitions then wait for the debt to refill.
+    """
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` can be taken (0 if it can be now)."""
+        self._refill()
+        return max(0.0, (min(amount, self.capacity) - self.level) / self.rate)
+
+    def take(self, amount: float):
+        self._refill()
+        self.level -= amount
+
+    def give(self, amount: float):
+        self._refill()
+        self.level = min(self.capacity, self.level + amount)
+
+
+class RateLimiter:
+    """
+    Process-wide requests-per-minute and tokens-per-minute budget for an API quota.
+
+    Every call acquires one request and its estimated tokens before it is
+    sent, then settles the estimate against the usage the API reports.
+    Waiters are served in arrival order, so a large request is not starved
+    by small ones. Completion length is not known up front, so estimates use
+    the running mean of completions seen so far.
+
+    Args:
+        rpm: Requests per minute allowed (0 for no limit)
+        tpm: Tokens (prompt + completion) per minute allowed (0 for no limit)
+        burst_seconds: How many seconds' worth of quota may be spent at once
+        completion_tokens: Completion estimate before any response is seen
+    """
+
+    def __init__(self, rpm: float, tpm: float, burst_seconds: float = 10.0, completion_tokens: int = 256):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.requests = TokenBucket(rpm, capacity=max(1.0, rpm * burst_seconds / 60)) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm, capacity=max(1.0, tpm * burst_seconds / 60)) if tpm > 0 else None
+        self._lock = asyncio.Lock()
+        self._completion_mean = float(completion_tokens)
+        self._completions = 0
+        self.started: Optional[float] = None
+        self.sent = 0
+        self.tokens_used = 0
+        self.waited = 0.0
+
+    @staticmethod
+    def count_tokens(text: str) -> int:
+        # About four characters per token for English text with the OpenAI tokenizers
+        return len(text) // 4 + 1
+
+    def estimate(self, prompt: str) -> int:
+        """Estimated total tokens of a call whose messages contain `prompt`."""
+        return self.count_tokens(prompt) + int(self._completion_mean)
+
+    async def acquire(self, tokens: int):
+        """Wait until one request and `tokens` tokens fit in the budget, then spend them."""
+        async with self._lock:
+            if self.started is None:
+                self.started = time.monotonic()
+            while True:
+                delay = max(
+                    self.requests.wait_time(1) if self.requests else 0.0,
+                    self.tokens.wait_time(tokens) if self.tokens else 0.0
+                )
+                if delay <= 0:
+                    break
+                self.waited += delay
+                await asyncio.sleep(delay)
+            if self.requests:
+                self.requests.take(1)
+            if self.tokens:
+                self.tokens.take(tokens)
+            self.sent += 1
+
+    def settle(self, estimated: int, usage=None):
+        """Correct a call's token charge with its reported usage; without usage the estimate stands."""
+        if usage is None:
+            self.tokens_used += estimated
+            return
+        self.tokens_used += usage.total_tokens
+        if self.tokens:
+            self.tokens.give(estimated - usage.total_tokens)
+        self._completions += 1
+        self._completion_mean += (usage.completion_tokens - self._completion_mean) / min(self._completions, 100)
+
+    def stats(self) -> dict:
+        elapsed = time.monotonic() - self.started if self.started is not None else 0.0
+        minutes = elapsed / 60 if elapsed > 0 else None
+        requests_per_minute = self.sent / minutes if minutes else 0.0
+        tokens_per_minute = self.tokens_used / minutes if minutes else 0.0
+        return {
+            "elapsed_s": round(elapsed, 1),
+            "requests": self.sent,
+            "tokens": self.tokens_used,
+            "requests_per_minute": round(requests_per_minute, 1),
+            "tokens_per_minute": round(tokens_per_minute),
+            "rpm_utilization": round(requests_per_minute / self.rpm, 3) if self.rpm else None,
+            "tpm_utilization": round(tokens_per_minute / self.tpm, 3) if self.tpm else None,
+            "waited_s": round(self.waited, 1),
+        }
+
+    def report(self) -> str:
+        stats = self.stats()
+
+        def against(rate, limit, utilization) -> str:
+            if not limit:
+                return f"{rate}/unlimited"
+            return f"{rate}/{limit:.0f} ({utilization:.0%})"
+
+        return (
+            f"{stats['requests']} requests, {stats['tokens']} tokens in {stats['elapsed_s']}s: "
+            f"{against(stats['requests_per_minute'], self.rpm, stats['rpm_utilization'])} RPM, "
+            f"{against(stats['tokens_per_minute'], self.tpm, stats['tpm_utilization'])} TPM"
+        )
@@ -0,0 +1,89 @@
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable, Optional, Tuple
+
+# Marks the end of the input for a worker, and a worker's exit for the consumer
+_DONE = object()
+
+
+async def imap_bounded(func: Callable[[Any], Awaitable[Any]], items: Iterable[Any], workers: int = 10,
+                       buffer: Optional[int] = None, ordered: bool = False) -> AsyncIterator[Tuple[Any, Any]]:
+    """
+    Apply async `func` to each item with a fixed pool of workers, yielding `(item, result)`.
+
+    A producer pulls from `items` lazily into a bounded queue that `workers`
+    tasks consume, and results go through a bounded queue to the caller, so
+    the number of items held at once does not depend on the input size: when
+    the caller or the workers fall behind, the producer waits. An exception
+    from `func` stops the pool and is raised to the caller.
+
+    Args:
+        items: Any iterable, consumed only as fast as the workers go
+        workers: Items processed concurrently
+        buffer: Items queued ahead of the workers (default: `2 * workers`)
+        ordered: Yield results in input order; a slow item then holds back
+            up to `buffer + workers` finished ones behind it
+
+    Usage:
+        async with contextlib.aclosing(imap_bounded(fetch, urls, workers=20)) as results:
+            async for url, page in results:
+                ...
+    """
+    buffer = buffer or 2 * workers
+    inputs: asyncio.Queue = asyncio.Queue(maxsize=buffer)
+    outputs: asyncio.Queue = asyncio.Queue(maxsize=buffer)
+    # In ordered mode, caps items between the producer and the caller, including finished ones waiting their turn
+    window = asyncio.Semaphore(buffer + workers) if ordered else None
+
+    async def produce():
+        try:
+            for index, item in enumerate(items):
+                if window is not None:
+                    await window.acquire()
+                await inputs.put((index, item))
+        except Exception as e:
+            # Reading the input failed; hand the error to the caller
+            await outputs.put((None, None, e, True))
+            return
+        for _ in range(workers):
+            await inputs.put(_DONE)
+
+    async def work():
+        while True:
+            entry = await inputs.get()
+            if entry is _DONE:
+                await outputs.put(_DONE)
+                return
+            index, item = entry
+            try:
+                result = await func(item)
+            except Exception as e:
+                await outputs.put((index, item, e, True))
+                return
+            await outputs.put((index, item, result, False))
+
+    producer = asyncio.create_task(produce())
+    pool = [asyncio.create_task(work()) for _ in range(workers)]
+    finished = {}
+    next_index = 0
+    running = workers
+    try:
+        while running:
+            entry = await outputs.get()
+            if entry is _DONE:
+                running -= 1
+                continue
+            index, item, result, failed = entry
+            if failed:
+                raise result
+            if window is None:
+                yield item, result
+                continue
+            finished[index] = (item, result)
+            while next_index in finished:
+                yield finished.pop(next_index)
+                next_index += 1
+                window.release()
+    finally:
+        for task in [producer, *pool]:
+            task.cancel()
+        await asyncio.gather(producer, *pool, return_exceptions=True)